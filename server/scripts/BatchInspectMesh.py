@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from multiprocessing.pool import ThreadPool
+from multiprocessing.connection import Client
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from MeshCache import CACHE_DIRECTORY, file_hash, cache_entry, temporary_path, commit_entry, touch_entry
+
+# Batch inspection of a directory tree of mesh files. A pool of persistent Blender processes runs
+# BlenderInspectMesh.py as inspection workers (-p), each receiving one file at a time over a local
+# connection, so Blender starts once per worker instead of once per file. Files are scheduled largest
+# first, the long inspections start early and the small ones fill the gaps at the end. Reports are
+# cached by file content (MeshCache.py), files inspected before with the same options are skipped.
+# The result is a JSONL file with one record per file: status (inspected, cached, failed), timing,
+# the report or the failure reason. Workers that time out or crash are replaced.
+
+WORKER_KEY_VARIABLE = "COOK_INSPECTION_WORKER_KEY"
+
+MESH_EXTENSIONS = [".obj", ".ply", ".stl", ".x3d", ".dae", ".fbx", ".glb", ".gltf"]
+
+# part of the report cache key, changes whenever the report content changes
+REPORT_VERSION = 1
+
+# seconds to wait for a starting worker to accept connections
+STARTUP_SECONDS = 120
+
+# files a worker inspects before it is replaced, memory Blender doesn't give back stays bounded
+FILES_PER_WORKER = 200
+
+# lines of worker output kept with a failure
+FAILURE_LINES = 20
+
+# output lines flagged as issues, same filter as BlenderTool.ts
+ISSUE_WORDS = ["error", "warning", "invalid", "cannot", "fail", "missing", "can't", "unsupported"]
+
+class InspectionTimeout(Exception):
+    pass
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+class InspectorProcess:
+    def __init__(self, blender, options, log_path):
+        self.port = free_port()
+        self.log_path = log_path
+        self.log = open(log_path, "wb")
+        # output of the current inspection, written by the worker
+        self.output_path = os.path.splitext(log_path)[0] + ".out"
+        self.count = 0
+        script = os.path.join(os.path.dirname(os.path.realpath(__file__)), "BlenderInspectMesh.py")
+        self.process = subprocess.Popen([blender, "--background", "--python", script, "--", "-p", str(self.port)] + options,
+            stdout=self.log, stderr=subprocess.STDOUT)
+
+    def connect(self):
+        deadline = time.perf_counter() + STARTUP_SECONDS
+        while True:
+            try:
+                return Client(("localhost", self.port), authkey=os.environ[WORKER_KEY_VARIABLE].encode("utf-8"))
+            except ConnectionRefusedError:
+                if self.process.poll() is not None:
+                    raise EOFError("inspection worker exited with code %d" % self.process.returncode)
+                if time.perf_counter() > deadline:
+                    raise InspectionTimeout("inspection worker didn't start within %ds" % STARTUP_SECONDS)
+                time.sleep(0.2)
+
+    # result of the worker: report or error, seconds and printed lines
+    def inspect(self, path, timeout):
+        self.count += 1
+        with self.connect() as connection:
+            connection.send({ "input": path, "output": self.output_path })
+            if timeout > 0 and not connection.poll(timeout):
+                raise InspectionTimeout("inspection timed out after %ds" % timeout)
+            try:
+                return connection.recv()
+            except EOFError:
+                self.process.wait()
+                raise EOFError("inspection worker exited with code %d" % self.process.returncode)
+
+    def output_tail(self):
+        path = self.output_path if os.path.isfile(self.output_path) else self.log_path
+        self.log.flush()
+        with open(path, "rb") as f:
+            f.seek(max(os.path.getsize(path) - 8192, 0))
+            return f.read().decode("utf-8", "replace").splitlines()[-FAILURE_LINES:]
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
+
+# mesh files below a directory, largest first. cache directories are left out.
+def mesh_files(root, extensions):
+    files = []
+    for directory, subdirectories, names in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if name != CACHE_DIRECTORY)
+        for name in names:
+            if os.path.splitext(name)[1].lower() in extensions:
+                path = os.path.join(directory, name)
+                files.append((os.path.getsize(path), path))
+    files.sort(key=lambda item: (-item[0], item[1]))
+    return [path for _, path in files]
+
+# issue lines of the worker output, and materials marked as not found if the importer reported unlinked
+# materials (as BlenderTool.ts does for single inspections)
+def review_output(report, lines):
+    issues = [line for line in lines if any(word in line.lower() for word in ISSUE_WORDS)]
+    if any("Unlinked material" in line for line in lines):
+        report["scene"]["materials"] = [{ "name": material["name"], "error": "not found" } for material in report["scene"]["materials"]]
+    return issues
+
+class BatchInspection:
+    def __init__(self, args):
+        self.args = args
+        self.options = ["-g", str(args.geometry_only).lower(), "-w", str(args.workers)]
+        if args.cache_dir:
+            self.options += ["-c", args.cache_dir]
+        self.kind = "report%d%s" % (REPORT_VERSION, "-geometry" if args.geometry_only else "")
+        self.log_directory = tempfile.mkdtemp(prefix="inspection-")
+        self.local = threading.local()
+        self.workers = []
+        self.lock = threading.Lock()
+        os.environ.setdefault(WORKER_KEY_VARIABLE, os.urandom(16).hex())
+
+    # the pool thread's worker, replaced after FILES_PER_WORKER files
+    def worker(self):
+        worker = getattr(self.local, "worker", None)
+        if worker is not None and worker.count >= FILES_PER_WORKER:
+            self.retire(worker)
+            worker = None
+        if worker is None:
+            with self.lock:
+                log_path = os.path.join(self.log_directory, "worker-%d.log" % len(self.workers))
+                worker = InspectorProcess(self.args.blender, self.options, log_path)
+                self.workers.append(worker)
+            self.local.worker = worker
+        return worker
+
+    def retire(self, worker):
+        worker.close()
+        self.local.worker = None
+
+    def inspect_file(self, path):
+        start = time.perf_counter()
+        record = { "file": os.path.relpath(path, self.args.directory), "bytes": os.path.getsize(path) }
+        try:
+            record["hash"] = file_hash(path)
+            entry = cache_entry(path, self.kind, ".json", self.args.cache_dir, record["hash"])
+            if not self.args.force and os.path.isfile(entry):
+                with open(entry, "r") as f:
+                    record.update(json.load(f))
+                touch_entry(entry)
+                record["status"] = "cached"
+            else:
+                worker = self.worker()
+                try:
+                    result = worker.inspect(os.path.abspath(path), self.args.timeout)
+                except (InspectionTimeout, EOFError, OSError):
+                    record["output"] = worker.output_tail()
+                    self.retire(worker)
+                    raise
+                record["inspectionSeconds"] = result["seconds"]
+                if "error" in result:
+                    record["output"] = result["lines"][-FAILURE_LINES:]
+                    raise RuntimeError(result["error"])
+                cached = { "report": result["report"], "issues": review_output(result["report"], result["lines"]) }
+                temporary = temporary_path(entry)
+                with open(temporary, "w") as f:
+                    json.dump(cached, f)
+                commit_entry(temporary, entry)
+                record.update(cached)
+                record["status"] = "inspected"
+        except Exception as e:
+            record["status"] = "failed"
+            record["error"] = str(e) or type(e).__name__
+        record["seconds"] = time.perf_counter() - start
+        return record
+
+    def run(self):
+        start = time.perf_counter()
+        files = mesh_files(self.args.directory, self.args.extensions)
+        summary = { "numFiles": len(files), "inspected": 0, "cached": 0, "failed": 0 }
+        try:
+            with open(self.args.output, "w") as output, ThreadPool(max(1, min(self.args.processes, len(files)))) as pool:
+                # in submission order, so the largest files are started first
+                for record in pool.imap_unordered(self.inspect_file, files, chunksize=1):
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                    summary[record["status"]] += 1
+                    print("%s %s (%.1fs)%s" % (record["status"], record["file"], record["seconds"], ": " + record["error"] if "error" in record else ""))
+                    sys.stdout.flush()
+        finally:
+            for worker in self.workers:
+                worker.close()
+            shutil.rmtree(self.log_directory, ignore_errors=True)
+        summary["seconds"] = time.perf_counter() - start
+        return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the mesh files of a directory tree with a pool of Blender processes")
+    parser.add_argument("-d", "--directory", required=True, help="Root directory of the mesh files")
+    parser.add_argument("-o", "--output", required=True, help="JSONL report file, one record per mesh file")
+    parser.add_argument("-p", "--processes", required=False, default=0, type=int, help="Number of Blender processes (default: all cores)")
+    parser.add_argument("-b", "--blender", required=False, default="blender", help="Blender executable")
+    parser.add_argument("-t", "--timeout", required=False, default=600, type=int, help="Maximum inspection time per file in seconds, 0 for no limit")
+    parser.add_argument("-c", "--cache_dir", required=False, default=None, help="Directory of cached reports and decoded copies (no sidecars, see BlenderInspectMesh.py), default is a cache directory next to the output")
+    parser.add_argument("-e", "--extensions", required=False, default=MESH_EXTENSIONS, nargs="+", help="File extensions to inspect")
+    parser.add_argument("-g", "--geometry_only", required=False, default=False, action="store_true", help="Don't load image data (see BlenderInspectMesh.py)")
+    parser.add_argument("-w", "--workers", required=False, default=1, type=int, help="Analysis processes per inspection (see BlenderInspectMesh.py)")
+    parser.add_argument("-f", "--force", required=False, default=False, action="store_true", help="Inspect files with cached reports again")
+    args = parser.parse_args()
+
+    args.processes = args.processes or os.cpu_count() or 1
+    args.extensions = [extension.lower() if extension.startswith(".") else "." + extension.lower() for extension in args.extensions]
+    # one cache for the whole collection, instead of cache directories among the assets
+    args.cache_dir = os.path.abspath(args.cache_dir or os.path.join(os.path.dirname(os.path.abspath(args.output)), CACHE_DIRECTORY))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    summary = BatchInspection(args).run()
+    print("JSON=" + json.dumps(summary))
@@ -2,6 +2,13 @@ import bpy
 import json
 import os
 import sys
+import time
+import shutil
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from PlyIO import write_ply_header, face_records
 
 def importModel(file_path, file_extension):
     #import scene
@@ -26,6 +33,125 @@ def importModel(file_path, file_extension):
         print("Error: Unsupported file type: " + file_extension)
         sys.exit(1)
 
+#remove data no longer used by any object, e.g. meshes and images of parts already written
+def purgeOrphans():
+    if bpy.app.version >= (2, 93, 0):
+        bpy.ops.outliner.orphans_purge(do_recursive=True)
+    else:
+        for _ in range(3):
+            bpy.ops.outliner.orphans_purge()
+
+#import a part and join its mesh objects into one object named after the part, materials are kept as slots
+def importPart(file_path, name):
+    before = set(bpy.data.objects)
+    importModel(file_path, os.path.splitext(file_path)[1].lower())
+    objects = [obj for obj in bpy.data.objects if obj not in before]
+    meshes = [obj for obj in objects if obj.type == "MESH"]
+    if not meshes:
+        print("Warning: no meshes in " + file_path)
+        return None
+
+    # names of the imported objects besides the part, joining frees the joined mesh objects
+    others = [obj.name for obj in objects if obj != meshes[0]]
+    if len(meshes) > 1:
+        bpy.ops.object.select_all(action='DESELECT')
+        for obj in meshes:
+            obj.select_set(True)
+        bpy.context.view_layer.objects.active = meshes[0]
+        bpy.ops.object.join()
+
+    part = meshes[0]
+    # keep the imported hierarchy's transform but not the empties around it
+    matrix_world = part.matrix_world.copy()
+    part.parent = None
+    part.matrix_world = matrix_world
+    for other in others:
+        obj = bpy.data.objects.get(other)
+        if obj is not None:
+            bpy.data.objects.remove(obj)
+    part.name = name
+    part.data.name = name
+    return part
+
+#world space triangles of a part: positions, vertex normals and (n, 3) indices
+def partArrays(obj):
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+    positions = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", positions)
+    normals = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    if hasattr(mesh, "vertex_normals"):
+        mesh.vertex_normals.foreach_get("vector", normals)
+    else:
+        mesh.vertices.foreach_get("normal", normals)
+    triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", triangles)
+
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    positions = positions.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+    normals = normals.reshape(-1, 3) @ np.linalg.inv(matrix[:3, :3])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+    return positions, normals, triangles.reshape(-1, 3)
+
+#combine parts into a binary PLY file, one part in memory at a time. part names and face ranges are
+#written as header comments, materials don't exist in PLY.
+def combineToPly(parts, save_file):
+    vertex_dtype = np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4"), ("nx", "<f4"), ("ny", "<f4"), ("nz", "<f4")])
+    vertex_count, face_count, ranges = 0, 0, []
+    with open(save_file + ".vertices", "wb") as vertex_file, open(save_file + ".faces", "wb") as face_file:
+        for file_path, name in parts:
+            part = importPart(file_path, name)
+            if part is None:
+                continue
+            positions, normals, triangles = partArrays(part)
+            vertices = np.empty(positions.shape[0], dtype=vertex_dtype)
+            for index, axis in enumerate("xyz"):
+                vertices[axis] = positions[:, index]
+                vertices["n" + axis] = normals[:, index]
+            vertex_file.write(vertices.tobytes())
+            face_file.write(face_records(triangles + vertex_count).tobytes())
+            ranges.append((name, face_count, triangles.shape[0]))
+            vertex_count += positions.shape[0]
+            face_count += triangles.shape[0]
+
+            bpy.data.objects.remove(part)
+            purgeOrphans()
+
+    comments = ["part %s faces %d %d" % (name.replace(" ", "_"), start, count) for name, start, count in ranges]
+    with open(save_file, "wb") as f:
+        write_ply_header(f, vertex_dtype, vertex_count, face_count, comments)
+        for part in (save_file + ".vertices", save_file + ".faces"):
+            with open(part, "rb") as source:
+                shutil.copyfileobj(source, f)
+            os.remove(part)
+
+#combine any number of parts into one FBX, GLB or binary PLY file
+def combineParts(inputs, names, save_file):
+    start = time.perf_counter()
+    if len(names) < len(inputs):
+        names = names + [os.path.splitext(os.path.basename(path))[0] for path in inputs[len(names):]]
+    parts = list(zip(inputs, names))
+    output_extension = os.path.splitext(save_file)[1].lower()
+
+    if output_extension == ".ply":
+        combineToPly(parts, save_file)
+    else:
+        for file_path, name in parts:
+            importPart(file_path, name)
+            purgeOrphans()
+            print("Imported part %s in %.2fs" % (name, time.perf_counter() - start))
+
+        print("Saving file: " + save_file)
+        if output_extension == ".glb":
+            bpy.ops.export_scene.gltf(filepath=save_file, export_format="GLB", check_existing=False)
+        elif output_extension == ".fbx":
+            bpy.ops.export_scene.fbx(filepath=save_file, check_existing=False, path_mode="COPY", embed_textures=True)
+        else:
+            print("Error: Unsupported output file type: " + output_extension)
+            sys.exit(1)
+
+    print("Combined %d parts in %.2fs" % (len(parts), time.perf_counter() - start))
+
 # get rid of default objects
 bpy.ops.object.select_all(action='SELECT')
 bpy.ops.object.delete(use_global=False)
@@ -37,6 +163,17 @@ bpy.ops.outliner.orphans_purge()
 argv = sys.argv
 argv = argv[argv.index("--") + 1:]
 
+#list of parts: -i file1 file2 ... -n name1 name2 ... -o output
+if len(argv) > 0 and argv[0].startswith("-"):
+    parser = argparse.ArgumentParser(description="Combine meshes")
+    parser.add_argument("-i", "--inputs", required=True, nargs="+", help="Input mesh files")
+    parser.add_argument("-n", "--names", required=False, nargs="*", default=[], help="Part names (default: file names)")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.fbx, .glb or .ply)")
+    args = parser.parse_args(argv)
+
+    combineParts(args.inputs, args.names, args.output)
+    sys.exit(0)
+
 #get import file extension
 #import
 filename, file_extension = os.path.splitext(argv[0])
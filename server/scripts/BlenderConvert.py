@@ -3,6 +3,9 @@ import json
 import os
 import sys
 
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from BlenderMeshCache import import_mesh
+
 # get rid of default objects
 bpy.ops.object.select_all(action='SELECT')
 bpy.ops.object.delete(use_global=False)
@@ -19,12 +22,8 @@ filename, file_extension = os.path.splitext(argv[0])
 file_extension = file_extension.lower()
 
 #import scene
-if file_extension == '.obj':
-    bpy.ops.wm.obj_import(filepath=argv[0])
-elif file_extension == '.ply':
-    bpy.ops.import_mesh.ply(filepath=argv[0])
-elif file_extension == '.stl':
-    bpy.ops.import_mesh.stl(filepath=argv[0])
+if file_extension == '.obj' or file_extension == '.ply' or file_extension == '.stl':
+    import_mesh(argv[0], file_extension)
 elif file_extension == '.x3d':
     bpy.ops.import_scene.x3d(filepath=argv[0])
 elif file_extension == '.dae':
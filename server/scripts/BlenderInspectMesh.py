@@ -3,25 +3,185 @@ import json
 import os
 import sys
 import math
+import time
 import bmesh
 import struct
+import argparse
+import traceback
+import contextlib
+import importlib
+import urllib.parse
+import numpy as np
 from io_mesh_stl import stl_utils
 from mathutils import Vector, Euler, bvhtree
+from multiprocessing.connection import Listener
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from ImageHeaders import read_image_header, glb_image_headers, texture_totals
+from MeshAnalysis import uv_analysis, texel_density, quality_metrics, analyze_objects
+from MeshCache import file_hash, cache_entry, temporary_path, commit_entry
+from BlenderMeshCache import import_mesh
+from BatchInspectMesh import WORKER_KEY_VARIABLE
 
 channel_types = ['Base Color', 'Metallic', 'Specular', 'Roughness', 'Transmission', 'Emission', 'Alpha', 'Normal', 'Occlusion']
 channel_names = ['diffuse', 'metalness', 'specular', 'roughness', 'opacity', 'emissive', 'opacity', 'normal', 'occlusion']
 
+# BSDF inputs within this tolerance of their default count as unchanged
+DEFAULT_TOLERANCE = 1e-6
+
+# default values of the Principled BSDF inputs by identifier, read once per run
+bsdf_default_values = {}
+
+def convert(s):
+    if s.lower() == "true":
+        return True
+    else:
+        return False
+
 def round_small(value):
     return round(value,5)
 
-def find_channel(node, channels):
+# channel sockets reachable from a node's outputs, in order of first occurrence. results are memoized per
+# node (memo is per node tree), so nodes shared by several paths (mix, math, reroute) are walked once.
+def find_channel(node, memo):
+    if node.name in memo:
+        return memo[node.name]
+    # a node being walked (only possible in invalid, cyclic trees) contributes nothing further
+    memo[node.name] = []
+    channels = []
     for output in node.outputs:
         for link in output.links:
             if link.to_socket.name in channel_types:
-                channels.append(link.to_socket.name)
+                found = [link.to_socket.name]
             else:
-                find_channel(link.to_node, channels)
+                found = find_channel(link.to_node, memo)
+            channels.extend(name for name in found if name not in channels)
+    memo[node.name] = channels
+    return channels
+
+def socket_value(socket):
+    value = getattr(socket, "default_value", None)
+    if hasattr(value, '__len__') and not isinstance(value, str):
+        return tuple(value[:])
+    return value
+
+# default Principled BSDF input values, from a node in a temporary node group (no material is created)
+def bsdf_defaults():
+    if not bsdf_default_values:
+        group = bpy.data.node_groups.new("DefaultBSDF", 'ShaderNodeTree')
+        bsdf = group.nodes.new('ShaderNodeBsdfPrincipled')
+        for inp in bsdf.inputs:
+            bsdf_default_values[inp.identifier] = socket_value(inp)
+        bpy.data.node_groups.remove(group)
+    return bsdf_default_values
+
+def values_differ(value, default):
+    if isinstance(value, tuple) and isinstance(default, tuple):
+        return len(value) != len(default) or any(abs(a - b) > DEFAULT_TOLERANCE for a, b in zip(value, default))
+    if isinstance(value, (int, float)) and isinstance(default, (int, float)):
+        return abs(value - default) > DEFAULT_TOLERANCE
+    return value != default
+
+# report format of a value, vectors as comma separated components
+def format_value(value):
+    if isinstance(value, tuple):
+        return ", ".join(str(component) for component in value)
+    return str(value)
                 
+# header statistics of a texture image (no pixels are read): from the GLB buffer view of an embedded glTF
+# image, from packed data, or from the linked file
+def texture_statistics(image, image_name, glb_images):
+    header = glb_images.get(image.get("gltfImageIndex", -1))
+    if header is None and image.packed_file is not None:
+        header = read_image_header(image.packed_file.data)
+    elif header is None and "packedSize" not in image:
+        header = read_image_header(bpy.path.abspath(image_path(image)))
+    statistics = dict(header) if header is not None else {}
+    statistics["name"] = image_name
+    statistics["embedded"] = is_packed(image) or image.get("gltfImageIndex", -1) in glb_images
+    return statistics
+
+# placeholder images of the geometry only import carry the source path and packed size as properties
+def image_path(image):
+    return image.get("sourcePath", image.filepath)
+
+def is_packed(image):
+    return image.packed_file is not None or "packedSize" in image
+
+# stands in for the glTF importer's image creation: a 1x1 image named like the importer names it,
+# nothing is read or decoded
+def placeholder_gltf_image(gltf, img_idx, *args, **kwargs):
+    img = gltf.data.images[img_idx]
+    if img.blender_image_name is not None:
+        return
+    image = bpy.data.images.new(img.name or "Image_%d" % img_idx, 1, 1)
+    image["gltfImageIndex"] = img_idx
+    if img.uri is not None and not img.uri.startswith("data:"):
+        image["sourcePath"] = os.path.join(os.path.dirname(os.path.abspath(gltf.filename)), urllib.parse.unquote(img.uri))
+    elif img.buffer_view is not None:
+        image["packedSize"] = gltf.data.buffer_views[img.buffer_view].byte_length
+    else:
+        # base64 data uri
+        image["packedSize"] = len(img.uri.split(",", 1)[-1]) * 3 // 4
+    img.blender_image_name = image.name
+
+# the glTF importer's image class. None if the importer module isn't found (its location differs
+# between Blender versions).
+def gltf_image_class():
+    for module_name in ("io_scene_gltf2.blender.imp.gltf2_blender_image", "io_scene_gltf2.blender.imp.image"):
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        if hasattr(module, "BlenderImage"):
+            return module.BlenderImage
+    return None
+
+# replaces image loading of the glTF importer with placeholders. returns False if the importer isn't found.
+def defer_gltf_images():
+    image_class = gltf_image_class()
+    if image_class is None:
+        return False
+    image_class.create = staticmethod(placeholder_gltf_image)
+    return True
+
+# marks the images the glTF importer creates with their glTF image index, names aren't unique (the
+# Blender exporter names several images "tex")
+def tag_gltf_images():
+    image_class = gltf_image_class()
+    if image_class is None or getattr(image_class.create, "tagged", False):
+        return
+    create = image_class.create
+    def tagged_create(gltf, img_idx, *args, **kwargs):
+        result = create(gltf, img_idx, *args, **kwargs)
+        name = gltf.data.images[img_idx].blender_image_name
+        if name is not None and name in bpy.data.images:
+            bpy.data.images[name]["gltfImageIndex"] = img_idx
+        return result
+    tagged_create.tagged = True
+    image_class.create = staticmethod(tagged_create)
+
+# world space positions, triangle vertex indices and texture coordinates of the active UV layer per
+# triangle corner (None without UVs), pulled in bulk
+def mesh_arrays(obj):
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+    positions = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", positions)
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    positions = positions.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+    triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", triangles)
+
+    uvs = None
+    if mesh.uv_layers.active is not None:
+        loops = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("loops", loops)
+        loop_uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        mesh.uv_layers.active.data.foreach_get("uv", loop_uvs)
+        uvs = loop_uvs.reshape(-1, 2)[loops].astype(np.float64).reshape(-1, 3, 2)
+    return positions, triangles.reshape(-1, 3).astype(np.int64), uvs
+
 def is_manifold(object: bpy.types.Object, check_boundaries = True) -> bool:
     bpy.context.view_layer.objects.active = object
     bpy.ops.object.mode_set(mode='EDIT')
@@ -118,215 +278,40 @@ def is_ply_ascii(filepath) -> bool:
         
         return False
 
-def run():
-    mesh_count = 0
-    face_count = 0
-    vertex_count = 0
-    tri_count = 0
-    edge_count = 0
-
-    meshes=[]
-    materials=[]
+# channels of each material plus statistics of the textures they use. returns the scene materials, texture
+# statistics by image name, image names by material, and the linked and embedded texture names.
+def analyze_materials(materials, file_path, file_extension):
     textures=[]
     embedded_textures=[]
-    scene={}
-
-    isAscii = True
-    isDracoCompressed = False
-
-    bpy.ops.object.select_all(action='SELECT')
-    bpy.ops.object.delete(use_global=False)
-    bpy.ops.outliner.orphans_purge()
-    bpy.ops.outliner.orphans_purge()
-    bpy.ops.outliner.orphans_purge()
-
-    #get args
-    argv = sys.argv
-    argv = argv[argv.index("--") + 1:]
-
-    #get import file extension
-    filename, file_extension = os.path.splitext(argv[0])
-    file_extension = file_extension.lower()
-
-    #import scene
-    if file_extension == '.obj':
-        bpy.ops.wm.obj_import(filepath=argv[0])
-    elif file_extension == '.ply':
-        bpy.ops.import_mesh.ply(filepath=argv[0])
-        isAscii = is_ply_ascii(argv[0])
-    elif file_extension == '.stl':
-        bpy.ops.import_mesh.stl(filepath=argv[0])
-        with open(argv[0], 'rb') as data:
-            isAscii = stl_utils._is_ascii_file(data)
-    elif file_extension == '.x3d':
-        bpy.ops.import_scene.x3d(filepath=argv[0])
-    elif file_extension == '.dae':
-        bpy.ops.wm.collada_import(filepath=argv[0])
-    elif file_extension == '.fbx':
-        bpy.ops.import_scene.fbx(filepath=argv[0])
-        isAscii = False
-    elif file_extension == '.glb' or file_extension == '.gltf':
-        bpy.ops.import_scene.gltf(filepath=argv[0])
-        if file_extension == '.glb':
-            isAscii = False
-        with open(argv[0], 'rb') as data:
-            #read header to see if using compression
-            content = memoryview(data.read())
-            chunk_header = struct.unpack_from('<I4s', content, 12)
-            data_length = chunk_header[0]
-            data_type = chunk_header[1]
-            data_gltf = content[12 + 8: 12 + 8 + data_length]
-            gltf_string = data_gltf.tobytes().decode('utf-8')
-            if "KHR_draco_mesh_compression" in gltf_string:
-                isDracoCompressed = True
-    else:
-        print("Error: Unsupported file type: " + file_extension)
-        sys.exit(1)
-
-    if len(bpy.data.objects) > 0:
-        init_bbox_corners = [bpy.data.objects[0].matrix_world @ Vector(corner) for corner in bpy.data.objects[0].bound_box]
-        if file_extension == '.obj':
-            init_bbox_corners = [Euler((math.radians(-90.0), 0.0, 0.0)).to_matrix() @ Vector(corner) for corner in init_bbox_corners]
-        g_minx = g_maxx = init_bbox_corners[0].x
-        g_miny = g_maxy = init_bbox_corners[0].y
-        g_minz = g_maxz = init_bbox_corners[0].z
-    else:
-        g_minx = g_maxx = g_miny = g_maxy = g_minz = g_maxz = 0
-
-    for obj in bpy.data.objects:
-        if obj.type == 'MESH':
-
-            # compute triangle count
-            triangle_count = 0
-            for face in obj.data.polygons:
-                verts = face.vertices
-                tris = len(verts)-2
-                triangle_count += tris
-
-            # fill stats structure
-            statistics={}
-            statistics["numFaces"] = len(obj.data.polygons)
-            statistics["numTriangles"] = triangle_count
-            statistics["numVertices"] = len(obj.data.vertices)
-            statistics["numEdges"] = len(obj.data.edges)
-            statistics["numTexCoordChannels"] = len(obj.data.uv_layers.keys())
-            statistics["numColorChannels"] = len(obj.data.vertex_colors)
-            statistics["hasNormals"] = obj.data.has_custom_normals
-            #statistics["hasTangents"] = obj.data.loops[0].tangent is not None
-            statistics["hasTexCoords"] = obj.data.uv_layers.active is not None
-            statistics["hasVertexColors"] = len(obj.data.vertex_colors) > 0
-            statistics["hasBones"] = obj.find_armature() is not None
-            statistics["isTwoManifoldUnbounded"] = is_manifold(obj, True)
-            statistics["isTwoManifoldBounded"] = is_manifold(obj, False)
-            statistics["selfIntersecting"] = self_intersecting(obj)
-            statistics["isWatertight"] = statistics["isTwoManifoldUnbounded"] and not statistics["selfIntersecting"]
-
-            material_indices = []
-            
-            for mat in obj.data.materials.keys():
-                if mat not in materials:
-                    material_indices.append(len(materials))
-                    materials.append(mat)
-                else:
-                    material_indices.append(materials.index(mat))
-                    
-            statistics["materialIndex"] = material_indices
-                    
-            
-            bbox_corners = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]
-
-            if file_extension == '.obj':
-                bbox_corners = [Euler((math.radians(-90.0), 0.0, 0.0)).to_matrix() @ Vector(corner) for corner in bbox_corners]
-            
-            minx = maxx = bbox_corners[0].x
-            miny = maxy = bbox_corners[0].y
-            minz = maxz = bbox_corners[0].z
-            
-            for vec in bbox_corners:
-                minx = round_small(min(minx, vec.x))
-                maxx = round_small(max(maxx, vec.x))
-                miny = round_small(min(miny, vec.y))
-                maxy = round_small(max(maxy, vec.y))
-                minz = round_small(min(minz, vec.z))
-                maxz = round_small(max(maxz, vec.z))
-
-            bb_min = [minx, miny, minz]
-            bb_max = [maxx, maxy, maxz]
-            
-            bounds = {
-                "min" : bb_min,
-                "max" : bb_max
-            }
-            
-            g_minx = round_small(min(g_minx, minx))
-            g_maxx = round_small(max(g_maxx, maxx))
-            g_miny = round_small(min(g_miny, miny))
-            g_maxy = round_small(max(g_maxy, maxy))
-            g_minz = round_small(min(g_minz, minz))
-            g_maxz = round_small(max(g_maxz, maxz))
-            
-            geometry={}
-            geometry["boundingBox"] = bounds
-            geometry["center"] = [(minx+maxx)/2.0, (miny+maxy)/2.0, (minz+maxz)/2.0]
-            geometry["size"] = [maxx-minx, maxy-miny, maxz-minz]
-            
-            mesh = {
-                "geometry" : geometry,
-                "statistics" : statistics
-            }
-            
-            meshes.append(mesh)
-            mesh_count += 1
-            face_count += statistics["numFaces"]
-            vertex_count += statistics["numVertices"]
-            tri_count += statistics["numTriangles"]
-            edge_count += statistics["numEdges"]
-
-    scene_bounds = {
-        "min" : [g_minx, g_miny, g_minz],
-        "max" : [g_maxx, g_maxy, g_maxz]
-    }
-
-    scene_geometry={}
-    scene_geometry["boundingBox"] = scene_bounds
-    scene_geometry["center"] = [(g_minx+g_maxx)/2.0, (g_miny+g_maxy)/2.0, (g_minz+g_maxz)/2.0]
-    scene_geometry["size"] = [g_maxx-g_minx, g_maxy-g_miny, g_maxz-g_minz]
-
 
     # Gather default values
-    bsdf_defaults = []
-    tempmat = bpy.data.materials.new("Default")
-    tempmat.use_nodes = True
-    node_tree = tempmat.node_tree
-    temp_nodes = node_tree.nodes
-    bsdf = temp_nodes.get("Principled BSDF")
-    for temp_inp in bsdf.inputs:
-        bsdf_defaults.append(temp_inp.default_value)
-    bpy.data.materials.remove(tempmat)
+    defaults = bsdf_defaults()
 
+    # embedded glTF images by index, the imported images carry theirs (see tag_gltf_images)
+    glb_images = {}
+    if file_extension == '.glb':
+        glb_images = glb_image_headers(file_path)
+    texture_stats = {}
+    material_textures = {}
 
     scene_materials=[]
     for key in materials:
         g_material = bpy.data.materials[key]
         channels=[]
 
+        if g_material.node_tree is None:
+            scene_materials.append({ "name": key, "channels": channels })
+            continue
         nodes = g_material.node_tree.nodes
 
         # Walk through BSDF finding values that have changed from defaults
-        bsdf_node = nodes.get("Principled BSDF")
-        for idx, inp in enumerate(bsdf_node.inputs):
-            if(hasattr(inp.default_value, '__len__') and (not isinstance(inp.default_value, str))):
-                val1 = str(inp.default_value[:])
-                val2 = str(bsdf_defaults[idx][:])
-                compare = val1 == val2
-                val1 = val1[1:-1]
-            else:
-                val1 = str(inp.default_value)
-                compare = inp.default_value == bsdf_defaults[idx]
-            #print(inp.name)
-            #print(bsdf_defaults[idx])
-            #print(val1)
-            if(not compare):
+        bsdf_node = nodes.get("Principled BSDF") or next((node for node in nodes if node.type == 'BSDF_PRINCIPLED'), None)
+        for inp in (bsdf_node.inputs if bsdf_node is not None else []):
+            value = socket_value(inp)
+            if value is None or inp.identifier not in defaults:
+                continue
+            val1 = format_value(value)
+            if values_differ(value, defaults[inp.identifier]):
                 if inp.name in channel_types:
                     channel = {
                     "type" : channel_names[channel_types.index(inp.name)],
@@ -342,20 +327,23 @@ def run():
                         channels.append(channel)
 
         # Walk through texture nodes and assign/create channels
+        memo = {}
         for node in nodes:
-            if node.type == 'TEX_IMAGE':
-                out_channels = []
+            if node.type == 'TEX_IMAGE' and node.image is not None:
                 channel_name = ""
-                path, filename = os.path.split(node.image.filepath)
+                path, filename = os.path.split(image_path(node.image))
                 image_name = filename
-                if node.image.packed_file != None:
+                if is_packed(node.image):
                     image_name = "embedded*"+node.image.name
                     if image_name not in embedded_textures:
                         embedded_textures.append(image_name)
                 else:
                     if filename not in textures:
                         textures.append(filename)  
-                find_channel(node, out_channels)
+                if image_name not in texture_stats:
+                    texture_stats[image_name] = texture_statistics(node.image, image_name, glb_images)
+                material_textures.setdefault(key, []).append(image_name)
+                out_channels = find_channel(node, memo)
                 if len(out_channels) == 0:
                     channel = {
                     "type" : "unknown",
@@ -381,7 +369,230 @@ def run():
         }
         
         scene_materials.append(mat)
-        
+
+    return scene_materials, texture_stats, material_textures, textures, embedded_textures
+
+# texel density of a mesh for the resolutions of the textures its materials use
+def mesh_texel_density(layout, material_names, material_textures, texture_stats):
+    sizes = set()
+    for name in material_names:
+        for image_name in material_textures.get(name, []):
+            if "width" in texture_stats[image_name]:
+                sizes.add((texture_stats[image_name]["width"], texture_stats[image_name]["height"]))
+    return [texel_density(layout["uvDensity"], width, height) for width, height in sorted(sizes)]
+
+# report of a mesh object without topology analysis: element counts, attributes, materials and bounds
+def mesh_report(obj, file_extension, materials):
+    # compute triangle count
+    triangle_count = 0
+    for face in obj.data.polygons:
+        verts = face.vertices
+        tris = len(verts)-2
+        triangle_count += tris
+
+    # fill stats structure
+    statistics={}
+    statistics["numFaces"] = len(obj.data.polygons)
+    statistics["numTriangles"] = triangle_count
+    statistics["numVertices"] = len(obj.data.vertices)
+    statistics["numEdges"] = len(obj.data.edges)
+    statistics["numTexCoordChannels"] = len(obj.data.uv_layers.keys())
+    statistics["numColorChannels"] = len(obj.data.vertex_colors)
+    statistics["hasNormals"] = obj.data.has_custom_normals
+    #statistics["hasTangents"] = obj.data.loops[0].tangent is not None
+    statistics["hasTexCoords"] = obj.data.uv_layers.active is not None
+    statistics["hasVertexColors"] = len(obj.data.vertex_colors) > 0
+    statistics["hasBones"] = obj.find_armature() is not None
+    statistics["materialIndex"] = [materials.index(mat) for mat in obj.data.materials.keys()]
+
+    bbox_corners = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]
+
+    if file_extension == '.obj':
+        bbox_corners = [Euler((math.radians(-90.0), 0.0, 0.0)).to_matrix() @ Vector(corner) for corner in bbox_corners]
+    
+    minx = maxx = bbox_corners[0].x
+    miny = maxy = bbox_corners[0].y
+    minz = maxz = bbox_corners[0].z
+    
+    for vec in bbox_corners:
+        minx = round_small(min(minx, vec.x))
+        maxx = round_small(max(maxx, vec.x))
+        miny = round_small(min(miny, vec.y))
+        maxy = round_small(max(maxy, vec.y))
+        minz = round_small(min(minz, vec.z))
+        maxz = round_small(max(maxz, vec.z))
+
+    bounds = {
+        "min" : [minx, miny, minz],
+        "max" : [maxx, maxy, maxz]
+    }
+    
+    geometry={}
+    geometry["boundingBox"] = bounds
+    geometry["center"] = [(minx+maxx)/2.0, (miny+maxy)/2.0, (minz+maxz)/2.0]
+    geometry["size"] = [maxx-minx, maxy-miny, maxz-minz]
+    
+    return {
+        "geometry" : geometry,
+        "statistics" : statistics
+    }
+
+# topology with Blender's operators, quality and UV layout of a mesh object
+def blender_analysis(obj):
+    statistics={}
+    statistics["isTwoManifoldUnbounded"] = is_manifold(obj, True)
+    statistics["isTwoManifoldBounded"] = is_manifold(obj, False)
+    statistics["selfIntersecting"] = self_intersecting(obj)
+    statistics["isWatertight"] = statistics["isTwoManifoldUnbounded"] and not statistics["selfIntersecting"]
+
+    positions, triangles, uvs = mesh_arrays(obj)
+    statistics["quality"] = quality_metrics(positions, triangles)
+    if uvs is not None:
+        statistics["uvLayout"] = uv_analysis(positions, triangles, uvs)
+    return statistics
+
+# inspects a mesh file in an empty scene and returns the report. in stream mode the meshes are printed as
+# MESH= records when they are analyzed and left out of the report.
+def inspect(input_file, args):
+    mesh_count = 0
+    face_count = 0
+    vertex_count = 0
+    tri_count = 0
+    edge_count = 0
+
+    materials=[]
+    scene={}
+
+    isAscii = True
+    isDracoCompressed = False
+    decoded_file = None
+    # the file the scene comes from, a decoded copy instead of a Draco compressed input
+    imported_file = input_file
+
+    #get import file extension
+    filename, file_extension = os.path.splitext(input_file)
+    file_extension = file_extension.lower()
+
+    #import scene. batch workers (-p) share one cache directory with the inspection reports, each file is
+    #inspected once: no sidecars, whose eviction would remove cached reports.
+    use_cache = args.port is None
+    if file_extension == '.obj':
+        import_mesh(input_file, file_extension, use_cache=use_cache, cache_dir=args.cache_dir)
+    elif file_extension == '.ply':
+        import_mesh(input_file, file_extension, use_cache=use_cache, cache_dir=args.cache_dir)
+        isAscii = is_ply_ascii(input_file)
+    elif file_extension == '.stl':
+        import_mesh(input_file, file_extension, use_cache=use_cache, cache_dir=args.cache_dir)
+        with open(input_file, 'rb') as data:
+            isAscii = stl_utils._is_ascii_file(data)
+    elif file_extension == '.x3d':
+        bpy.ops.import_scene.x3d(filepath=input_file)
+    elif file_extension == '.dae':
+        bpy.ops.wm.collada_import(filepath=input_file)
+    elif file_extension == '.fbx':
+        # images are loaded lazily, the recursive search for missing ones is what takes time
+        bpy.ops.import_scene.fbx(filepath=input_file, use_image_search=not args.geometry_only)
+        isAscii = False
+    elif file_extension == '.glb' or file_extension == '.gltf':
+        if file_extension == '.glb':
+            isAscii = False
+            with open(input_file, 'rb') as data:
+                #read header to see if using compression
+                content = memoryview(data.read())
+                chunk_header = struct.unpack_from('<I4s', content, 12)
+                data_length = chunk_header[0]
+                data_type = chunk_header[1]
+                data_gltf = content[12 + 8: 12 + 8 + data_length]
+                gltf_string = data_gltf.tobytes().decode('utf-8')
+                if "KHR_draco_mesh_compression" in gltf_string:
+                    isDracoCompressed = True
+        deferred = args.geometry_only and defer_gltf_images()
+        if args.geometry_only and not deferred:
+            print("Geometry only import not available with this glTF importer, loading images")
+        if not deferred:
+            tag_gltf_images()
+        # draco geometry is decoded once per content, later runs import the decoded copy
+        if isDracoCompressed:
+            decoded_file = cache_entry(input_file, "decoded", ".glb", args.cache_dir, file_hash(input_file))
+        if decoded_file and os.path.isfile(decoded_file):
+            imported_file = decoded_file
+            bpy.ops.import_scene.gltf(filepath=decoded_file)
+        else:
+            bpy.ops.import_scene.gltf(filepath=input_file)
+    else:
+        raise ValueError("Error: Unsupported file type: " + file_extension)
+
+    if len(bpy.data.objects) > 0:
+        init_bbox_corners = [bpy.data.objects[0].matrix_world @ Vector(corner) for corner in bpy.data.objects[0].bound_box]
+        if file_extension == '.obj':
+            init_bbox_corners = [Euler((math.radians(-90.0), 0.0, 0.0)).to_matrix() @ Vector(corner) for corner in init_bbox_corners]
+        g_minx = g_maxx = init_bbox_corners[0].x
+        g_miny = g_maxy = init_bbox_corners[0].y
+        g_minz = g_maxz = init_bbox_corners[0].z
+    else:
+        g_minx = g_maxx = g_miny = g_maxy = g_minz = g_maxz = 0
+
+    # materials in order of first use, analyzed before the meshes so mesh records are complete when written
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH':
+            for mat in obj.data.materials.keys():
+                if mat not in materials:
+                    materials.append(mat)
+    scene_materials, texture_stats, material_textures, textures, embedded_textures = analyze_materials(materials, imported_file, os.path.splitext(imported_file)[1].lower())
+
+    mesh_objects = [obj for obj in bpy.data.objects if obj.type == 'MESH']
+    meshes = [mesh_report(obj, file_extension, materials) for obj in mesh_objects]
+    for mesh in meshes:
+        bounds = mesh["geometry"]["boundingBox"]
+        g_minx = round_small(min(g_minx, bounds["min"][0]))
+        g_maxx = round_small(max(g_maxx, bounds["max"][0]))
+        g_miny = round_small(min(g_miny, bounds["min"][1]))
+        g_maxy = round_small(max(g_maxy, bounds["max"][1]))
+        g_minz = round_small(min(g_minz, bounds["min"][2]))
+        g_maxz = round_small(max(g_maxz, bounds["max"][2]))
+
+    # topology, quality and UV layout, either here with Blender's operators or by a pool of processes
+    # working on the exported arrays
+    workers = args.workers or os.cpu_count() or 1
+    if workers == 1:
+        results = ({ "index": index, "statistics": blender_analysis(obj) } for index, obj in enumerate(mesh_objects))
+    else:
+        jobs = []
+        for index, obj in enumerate(mesh_objects):
+            positions, triangles, uvs = mesh_arrays(obj)
+            loose = np.empty(len(obj.data.edges), dtype=bool)
+            obj.data.edges.foreach_get("is_loose", loose)
+            jobs.append({ "index": index, "positions": positions, "triangles": triangles, "uvs": uvs, "looseEdges": int(np.count_nonzero(loose)) })
+        results = analyze_objects(jobs, workers)
+
+    for result in results:
+        mesh = meshes[result["index"]]
+        statistics = mesh["statistics"]
+        statistics.update(result["statistics"])
+        if statistics.get("uvLayout") is not None:
+            statistics["uvLayout"]["texelDensity"] = mesh_texel_density(statistics["uvLayout"], mesh_objects[result["index"]].data.materials.keys(), material_textures, texture_stats)
+
+        # streamed records aren't kept, memory stays flat for scenes with many meshes
+        if args.stream:
+            print("MESH="+json.dumps({ "index": result["index"], "mesh": mesh }))
+            sys.stdout.flush()
+            meshes[result["index"]] = None
+        mesh_count += 1
+        face_count += statistics["numFaces"]
+        vertex_count += statistics["numVertices"]
+        tri_count += statistics["numTriangles"]
+        edge_count += statistics["numEdges"]
+
+    scene_bounds = {
+        "min" : [g_minx, g_miny, g_minz],
+        "max" : [g_maxx, g_maxy, g_maxz]
+    }
+
+    scene_geometry={}
+    scene_geometry["boundingBox"] = scene_bounds
+    scene_geometry["center"] = [(g_minx+g_maxx)/2.0, (g_miny+g_maxy)/2.0, (g_minz+g_maxz)/2.0]
+    scene_geometry["size"] = [g_maxx-g_minx, g_maxy-g_miny, g_maxz-g_minz]
+
     scene_statistics =  {
         "numAnimations": len(bpy.data.actions),
         "numCameras": len(bpy.data.cameras),
@@ -395,8 +606,10 @@ def run():
         "numVertices": vertex_count,
         "numEdges": edge_count,
         "fileEncoding": "ASCII" if isAscii else "BINARY",
-        "isDracoCompressed": isDracoCompressed
+        "isDracoCompressed": isDracoCompressed,
+        "textures": list(texture_stats.values())
     }
+    scene_statistics.update(texture_totals(scene_statistics["textures"]))
 
     scene = {
         "geometry" : scene_geometry,
@@ -404,20 +617,112 @@ def run():
         "statistics" : scene_statistics
     }
 
+    # the input stays as it is, the decoded copy is a separate file for later steps. without images
+    # the copy would be incomplete, it is left to a full inspection.
+    if decoded_file and not os.path.isfile(decoded_file) and not args.geometry_only:
+        temporary = temporary_path(decoded_file)
+        bpy.ops.export_scene.gltf(filepath=temporary, export_format='GLB', check_existing=False)
+        commit_entry(temporary, decoded_file)
+
     report = {
-        "meshes": meshes,
         "scene": scene,
         "type": "report"
     }
+    if decoded_file and os.path.isfile(decoded_file):
+        report["decodedMeshFile"] = os.path.relpath(decoded_file, os.path.dirname(os.path.abspath(input_file)))
+
+    if args.stream:
+        report["numMeshes"] = mesh_count
+    else:
+        report["meshes"] = meshes
+    return report
+
+def clear_scene():
+    bpy.ops.object.select_all(action='SELECT')
+    bpy.ops.object.delete(use_global=False)
+    bpy.ops.outliner.orphans_purge()
+    bpy.ops.outliner.orphans_purge()
+    bpy.ops.outliner.orphans_purge()
+
+# redirects the process output to a file, including what the importers print from native code
+@contextlib.contextmanager
+def captured_output(path):
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(path, "wb") as f:
+        os.dup2(f.fileno(), 1)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+
+# long-running inspection worker for BatchInspectMesh.py: receives jobs over a local connection, one at a
+# time, and sends back the report or the error with the output printed while inspecting. the scene is reloaded empty before
+# each file.
+def serve(args):
+    authkey = os.environ.get(WORKER_KEY_VARIABLE, "").encode("utf-8")
+    with Listener(("localhost", args.port), authkey=authkey) as listener:
+        print("Inspection worker listening on port %d" % args.port)
+        sys.stdout.flush()
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                print(e)
+                continue
+            with connection:
+                try:
+                    job = connection.recv()
+                except EOFError:
+                    continue
+                start = time.perf_counter()
+                result = {}
+                with captured_output(job["output"]):
+                    try:
+                        bpy.ops.wm.read_homefile(use_empty=True)
+                        clear_scene()
+                        result["report"] = inspect(job["input"], args)
+                    except Exception as e:
+                        result["error"] = str(e) or traceback.format_exc()
+                result["seconds"] = time.perf_counter() - start
+                with open(job["output"], "rb") as f:
+                    result["lines"] = f.read().decode("utf-8", "replace").splitlines()
+                try:
+                    connection.send(result)
+                except OSError:
+                    # runner went away (timed out)
+                    pass
+
+def run():
+    clear_scene()
 
-    print("JSON="+json.dumps(report))
+    #get args
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:]
 
-    # If we have a draco compressed glb, re-save uncompressed for now
-    if file_extension == '.glb' and isDracoCompressed == True:
-        path = bpy.data.filepath
-        dir = os.path.dirname(path)
-        save_file = os.path.join(dir, argv[0])
-        bpy.ops.export_scene.gltf(filepath=save_file, check_existing=False)
+    parser = argparse.ArgumentParser(description="Inspect a mesh file")
+    parser.add_argument("input", nargs="?", default=None, help="Input mesh file")
+    parser.add_argument("-s", "--stream", required=False, default=False, type=convert, help="Print a MESH= record per mesh as soon as it is analyzed and a SCENE= record at the end, instead of one JSON= report")
+    parser.add_argument("-c", "--cache_dir", required=False, default=None, help="Directory of Draco decoded copies and mesh sidecars, default is a cache directory next to the input")
+    parser.add_argument("-g", "--geometry_only", required=False, default=False, type=convert, help="Don't load image data, only names, paths and packed sizes of the images")
+    parser.add_argument("-w", "--workers", required=False, default=1, type=int, help="Processes analyzing mesh topology on exported arrays, 0 uses all cores. With 1, meshes are analyzed in Blender")
+    parser.add_argument("-p", "--port", required=False, default=None, type=int, help="Run as a worker of BatchInspectMesh.py, listening on this port (localhost)")
+    args = parser.parse_args(argv)
+
+    if args.port is not None:
+        args.stream = False
+        serve(args)
+        return
+    if args.input is None:
+        parser.error("an input file is required")
+
+    report = inspect(args.input, args)
+    if args.stream:
+        print("SCENE="+json.dumps(report))
+    else:
+        print("JSON="+json.dumps(report))
 
 try:
     run()
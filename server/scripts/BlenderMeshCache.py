@@ -0,0 +1,241 @@
+import bpy
+import os
+import sys
+import hashlib
+import numpy as np
+from mathutils import Matrix
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from MeshCache import file_hash, cache_entry, cache_directory, write_sidecar, read_sidecar, evict_entries, MAX_CACHE_BYTES
+
+# Mesh import through a sidecar cache (MeshCache.py). The first import of an OBJ, PLY or STL file runs
+# Blender's importer and saves the resulting mesh objects as flat arrays: vertex positions, polygon loops,
+# UVs and custom normals per loop, color attributes, smooth flags and material indices, plus the object
+# transforms and a snapshot of each material (Principled BSDF values and the image textures linked to
+# it). Later imports of the same content with the same Blender version build the objects from the memory
+# mapped arrays with foreach_set, without parsing the text file again. For OBJ files the key also covers
+# the content of the material libraries, a rewritten MTL file gets a new sidecar.
+
+# formats whose import is cached, other formats hold more than the sidecar keeps (animation, cameras, ...)
+CACHED_FORMATS = [ '.obj', '.ply', '.stl' ]
+
+# part of the cache key, changes whenever the sidecar content changes
+SIDECAR_CONTENT_VERSION = 1
+
+# bytes at the start of an OBJ file searched for material library references
+MTLLIB_SEARCH_BYTES = 65536
+
+def blender_import(file_path, file_extension):
+    if file_extension == '.obj':
+        bpy.ops.wm.obj_import(filepath=file_path)
+    elif file_extension == '.ply':
+        bpy.ops.import_mesh.ply(filepath=file_path)
+    elif file_extension == '.stl':
+        bpy.ops.import_mesh.stl(filepath=file_path)
+
+def importer_version():
+    return "%d.%d.%d-%d" % (bpy.app.version + (SIDECAR_CONTENT_VERSION,))
+
+def attribute_array(collection, attribute, count, width, dtype):
+    values = np.empty(count * width, dtype=dtype)
+    collection.foreach_get(attribute, values)
+    return values.reshape(-1, width) if width > 1 else values
+
+# Principled BSDF input values and the image textures linked to its inputs, directly or through a
+# normal map node
+def material_snapshot(material):
+    snapshot = { "name": material.name, "inputs": {}, "images": [] }
+    if material.node_tree is None:
+        return snapshot
+    bsdf = next((node for node in material.node_tree.nodes if node.type == 'BSDF_PRINCIPLED'), None)
+    if bsdf is None:
+        return snapshot
+    for inp in bsdf.inputs:
+        if not inp.is_linked and hasattr(inp, "default_value"):
+            value = inp.default_value
+            snapshot["inputs"][inp.identifier] = float(value) if isinstance(value, (int, float)) else [float(v) for v in value]
+    for link in material.node_tree.links:
+        if link.to_node != bsdf:
+            continue
+        node, normal_map = link.from_node, False
+        if node.type == 'NORMAL_MAP' and node.inputs["Color"].is_linked:
+            node, normal_map = node.inputs["Color"].links[0].from_node, True
+        if node.type == 'TEX_IMAGE' and node.image is not None:
+            snapshot["images"].append({
+                "input": link.to_socket.identifier,
+                "output": link.from_socket.name if not normal_map else "Color",
+                "path": bpy.path.abspath(node.image.filepath),
+                "colorspace": node.image.colorspace_settings.name,
+                "normalMap": normal_map
+            })
+    return snapshot
+
+# image of a texture file, a placeholder with the file's path if it is missing (as the importers do)
+def load_image(path):
+    try:
+        return bpy.data.images.load(path, check_existing=True)
+    except RuntimeError:
+        print("Cannot load image: '%s'" % path)
+        image = bpy.data.images.new(os.path.basename(path), 1, 1)
+        image.source = 'FILE'
+        image.filepath = path
+        return image
+
+def build_material(snapshot):
+    material = bpy.data.materials.new(snapshot["name"])
+    material.use_nodes = True
+    nodes, links = material.node_tree.nodes, material.node_tree.links
+    bsdf = next((node for node in nodes if node.type == 'BSDF_PRINCIPLED'), None)
+    if bsdf is None:
+        return material
+    for inp in bsdf.inputs:
+        if inp.identifier in snapshot["inputs"] and hasattr(inp, "default_value"):
+            inp.default_value = snapshot["inputs"][inp.identifier]
+    for texture in snapshot["images"]:
+        node = nodes.new('ShaderNodeTexImage')
+        node.image = load_image(texture["path"])
+        node.image.colorspace_settings.name = texture["colorspace"]
+        target = next(inp for inp in bsdf.inputs if inp.identifier == texture["input"])
+        if texture["normalMap"]:
+            normal_map = nodes.new('ShaderNodeNormalMap')
+            links.new(node.outputs["Color"], normal_map.inputs["Color"])
+            links.new(normal_map.outputs["Normal"], target)
+        else:
+            links.new(node.outputs[texture["output"]], target)
+    return material
+
+# arrays and description of the mesh objects in the scene
+def scene_sidecar():
+    arrays = {}
+    objects = []
+    for index, obj in enumerate(obj for obj in bpy.data.objects if obj.type == 'MESH'):
+        mesh = obj.data
+        prefix = "%d/" % index
+        arrays[prefix + "positions"] = attribute_array(mesh.vertices, "co", len(mesh.vertices), 3, np.float32)
+        arrays[prefix + "loops"] = attribute_array(mesh.loops, "vertex_index", len(mesh.loops), 1, np.int32)
+        arrays[prefix + "loopStart"] = attribute_array(mesh.polygons, "loop_start", len(mesh.polygons), 1, np.int32)
+        arrays[prefix + "loopTotal"] = attribute_array(mesh.polygons, "loop_total", len(mesh.polygons), 1, np.int32)
+        arrays[prefix + "smooth"] = attribute_array(mesh.polygons, "use_smooth", len(mesh.polygons), 1, bool)
+        arrays[prefix + "materialIndex"] = attribute_array(mesh.polygons, "material_index", len(mesh.polygons), 1, np.int32)
+        loose = attribute_array(mesh.edges, "is_loose", len(mesh.edges), 1, bool)
+        arrays[prefix + "looseEdges"] = attribute_array(mesh.edges, "vertices", len(mesh.edges), 2, np.int32)[loose]
+
+        uv_layers = []
+        for layer in mesh.uv_layers:
+            arrays[prefix + "uv/" + layer.name] = attribute_array(layer.data, "uv", len(mesh.loops), 2, np.float32)
+            uv_layers.append(layer.name)
+        if mesh.has_custom_normals:
+            # loop normals are computed on demand since Blender 4.1
+            if hasattr(mesh, "calc_normals_split"):
+                mesh.calc_normals_split()
+            arrays[prefix + "normals"] = attribute_array(mesh.loops, "normal", len(mesh.loops), 3, np.float32)
+        colors = []
+        for attribute in mesh.color_attributes:
+            count = len(mesh.vertices) if attribute.domain == 'POINT' else len(mesh.loops)
+            arrays[prefix + "color/" + attribute.name] = attribute_array(attribute.data, "color", count, 4, np.float32)
+            colors.append({ "name": attribute.name, "domain": attribute.domain, "type": attribute.data_type })
+
+        objects.append({
+            "name": obj.name,
+            "mesh": mesh.name,
+            "matrix": [list(row) for row in obj.matrix_world],
+            "uvLayers": uv_layers,
+            "activeUV": mesh.uv_layers.active.name if mesh.uv_layers.active is not None else None,
+            "colors": colors,
+            "materials": [slot.material.name if slot.material is not None else None for slot in obj.material_slots]
+        })
+    materials = [material_snapshot(material) for material in bpy.data.materials if material.users > 0]
+    return arrays, { "objects": objects, "materials": materials }
+
+# material libraries referenced at the start of an OBJ file
+def material_libraries(file_path):
+    with open(file_path, "rb") as f:
+        lines = f.read(MTLLIB_SEARCH_BYTES).split(b"\n")
+    return [line[6:].strip().decode("utf-8", "replace") for line in lines if line.startswith(b"mtllib")]
+
+# hash of the content an import depends on: the mesh file and, for OBJ files, its material libraries.
+# textures are loaded from their files when the scene is built.
+def source_digest(file_path, file_extension):
+    digest = file_hash(file_path)
+    if file_extension != '.obj':
+        return digest
+    combined = hashlib.sha256(digest.encode("ascii"))
+    for library in material_libraries(file_path):
+        path = os.path.join(os.path.dirname(file_path), library)
+        combined.update(("%s:%s;" % (library, file_hash(path) if os.path.isfile(path) else "missing")).encode("utf-8"))
+    return combined.hexdigest()
+
+# objects built from a sidecar are selected and the last one is active, like after an import
+def build_scene(arrays, info):
+    materials = { snapshot["name"]: build_material(snapshot) for snapshot in info["materials"] }
+    for obj in bpy.context.view_layer.objects:
+        obj.select_set(False)
+    for index, description in enumerate(info["objects"]):
+        prefix = "%d/" % index
+        positions, loops = arrays[prefix + "positions"], arrays[prefix + "loops"]
+        mesh = bpy.data.meshes.new(description["mesh"])
+        mesh.vertices.add(positions.shape[0])
+        mesh.vertices.foreach_set("co", positions.ravel())
+        mesh.loops.add(loops.size)
+        mesh.loops.foreach_set("vertex_index", loops)
+        mesh.polygons.add(arrays[prefix + "loopStart"].size)
+        mesh.polygons.foreach_set("loop_start", arrays[prefix + "loopStart"])
+        mesh.polygons.foreach_set("loop_total", arrays[prefix + "loopTotal"])
+        mesh.polygons.foreach_set("use_smooth", arrays[prefix + "smooth"])
+        mesh.polygons.foreach_set("material_index", arrays[prefix + "materialIndex"])
+        mesh.update(calc_edges=True)
+
+        loose = arrays[prefix + "looseEdges"]
+        if loose.shape[0] > 0:
+            first = len(mesh.edges)
+            mesh.edges.add(loose.shape[0])
+            values = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+            mesh.edges.foreach_get("vertices", values)
+            values[first * 2:] = loose.ravel()
+            mesh.edges.foreach_set("vertices", values)
+
+        for name in description["uvLayers"]:
+            mesh.uv_layers.new(name=name).data.foreach_set("uv", arrays[prefix + "uv/" + name].ravel())
+        if description["activeUV"] is not None:
+            mesh.uv_layers.active = mesh.uv_layers[description["activeUV"]]
+        for color in description["colors"]:
+            attribute = mesh.color_attributes.new(color["name"], color["type"], color["domain"])
+            attribute.data.foreach_set("color", arrays[prefix + "color/" + color["name"]].ravel())
+        for name in description["materials"]:
+            mesh.materials.append(materials.get(name))
+        mesh.update()
+        if prefix + "normals" in arrays:
+            if hasattr(mesh, "use_auto_smooth"):
+                mesh.use_auto_smooth = True
+            mesh.normals_split_custom_set(np.asarray(arrays[prefix + "normals"]).tolist())
+
+        obj = bpy.data.objects.new(description["name"], mesh)
+        obj.matrix_world = Matrix(description["matrix"])
+        bpy.context.scene.collection.objects.link(obj)
+        obj.select_set(True)
+        bpy.context.view_layer.objects.active = obj
+
+# imports a mesh file, through the sidecar cache for the cached formats. returns True if the scene was
+# built from a sidecar.
+def import_mesh(file_path, file_extension, use_cache=True, cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+    if not use_cache or file_extension not in CACHED_FORMATS or "color_attributes" not in bpy.types.Mesh.bl_rna.properties:
+        blender_import(file_path, file_extension)
+        return False
+
+    entry = cache_entry(file_path, "mesh-" + importer_version(), ".mesh", cache_dir, source_digest(file_path, file_extension))
+    sidecar = read_sidecar(entry)
+    if sidecar is not None:
+        # repeat the importer's message about missing libraries, the tools look for it
+        for library in sidecar[1].get("materialLibraries", []):
+            if not os.path.isfile(os.path.join(os.path.dirname(file_path), library)):
+                print("OBJ import: cannot read from MTL file: '%s'" % library)
+        build_scene(*sidecar)
+        return True
+
+    blender_import(file_path, file_extension)
+    arrays, info = scene_sidecar()
+    if file_extension == '.obj':
+        info["materialLibraries"] = material_libraries(file_path)
+    write_sidecar(entry, arrays, info)
+    evict_entries(cache_directory(file_path, cache_dir), max_bytes, keep=entry)
+    return False
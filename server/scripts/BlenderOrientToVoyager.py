@@ -2,15 +2,183 @@ import bpy
 import sys
 import os
 import json
+import time
 import bmesh
 import math
+import bisect
 import mathutils
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from BlenderMeshCache import import_mesh
+
+#Blender suffix of duplicate object names, e.g. "part.001"
+DUPLICATE_SUFFIX_LENGTH = 4
+
+#unit scale factors to meters
+UNIT_SCALE = { 'mm': 0.001, 'cm': 0.01, 'in': 0.0254, 'ft': 0.3048, 'm': 1.0 }
+
+#index of the SVX nodes with a model, for matching scene objects to models by name.
+#tiers: exact name, exact name without a Blender duplicate suffix, object name contained in a node name.
+class NodeIndex:
+        def __init__(self, nodes):
+                self.exact = {}
+                self.names = []
+                self.models = []
+                for node in nodes:
+                        if 'model' not in node:
+                                continue
+                        self.exact.setdefault(node['name'], []).append(node['model'])
+                        self.names.append(node['name'])
+                        self.models.append(node['model'])
+                #all names in one string, substring matches are found with one search each
+                self.joined = "\n".join(self.names)
+                self.starts = []
+                start = 0
+                for name in self.names:
+                        self.starts.append(start)
+                        start += len(name) + 1
+                self.ambiguous = []
+                self.unmatched = []
+                self.tiers = { "exact": 0, "suffix": 0, "substring": 0 }
+
+        #models of the nodes whose names contain the given name, in node order
+        def find_substring(self, name):
+                models = []
+                position = self.joined.find(name) if name else -1
+                while position >= 0:
+                        node = bisect.bisect_right(self.starts, position) - 1
+                        if position + len(name) <= self.starts[node] + len(self.names[node]):
+                                models.append(self.models[node])
+                        position = self.joined.find(name, position + 1)
+                return models
+
+        #model index for an object name, -1 if no node matches. ambiguous matches use the first node.
+        def match(self, name):
+                base = name[:-DUPLICATE_SUFFIX_LENGTH] if len(name) > DUPLICATE_SUFFIX_LENGTH and name[-DUPLICATE_SUFFIX_LENGTH] == "." and name[-3:].isdigit() else None
+                for tier, models in (("exact", self.exact.get(name)), ("suffix", self.exact.get(base) if base else None), ("substring", None)):
+                        if tier == "substring":
+                                models = self.find_substring(name)
+                        if models:
+                                self.tiers[tier] += 1
+                                if len(set(models)) > 1:
+                                        self.ambiguous.append(name)
+                                        print("Ambiguous node match for object '%s' (models %s), using model %d" % (name, sorted(set(models)), models[0]))
+                                return models[0]
+                self.unmatched.append(name)
+                print("No node found for object '%s'" % name)
+                return -1
+
+        def report(self):
+                print("Matched objects: %d exact, %d without duplicate suffix, %d by substring, %d ambiguous, %d unmatched" % (
+                        self.tiers["exact"], self.tiers["suffix"], self.tiers["substring"], len(self.ambiguous), len(self.unmatched)))
+
+#write the data of packed images next to the output file, so exporters referencing image files find them.
+#the stored file data is written as is, without decoding or unpacking the images.
+def write_packed_images(directory):
+        for image in bpy.data.images:
+                if image.packed_file is None or image.users == 0:
+                        continue
+                name = bpy.path.basename(image.filepath) or (image.name + "." + image.file_format.lower())
+                path = os.path.join(directory, name)
+                with open(path, "wb") as f:
+                        f.write(image.packed_file.data)
+                image.filepath = path
+
+#compose the model's orientation into one matrix, in the order: OBJ axis fix, rotation, translation, scale, axis restore
+def orientation_matrix(model, is_obj, scale_factor=None):
+        matrix = mathutils.Matrix.Identity(4)
+        if is_obj:
+                matrix = mathutils.Euler((math.radians(-90.0), 0.0, 0.0)).to_matrix().to_4x4() @ matrix # change coordinate system
+        if 'rotation' in model:
+                rotation = model['rotation']
+                matrix = mathutils.Quaternion((rotation[3], rotation[0], rotation[1], rotation[2])).to_matrix().to_4x4() @ matrix
+        if 'translation' in model:
+                translation = model['translation']
+                matrix = mathutils.Matrix.Translation((translation[0], translation[1], translation[2])) @ matrix
+        if scale_factor is not None:
+                matrix = mathutils.Matrix.Scale(scale_factor, 4) @ matrix
+        if is_obj:
+                matrix = mathutils.Euler((math.radians(90.0), 0.0, 0.0)).to_matrix().to_4x4() @ matrix # return to original coordinate system
+        return matrix
+
+#corner normals of a mesh as an (n, 3) array
+def corner_normals(mesh):
+        normals = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+        if hasattr(mesh, "corner_normals"):
+                mesh.corner_normals.foreach_get("vector", normals)
+        else:
+                mesh.calc_normals_split()
+                mesh.loops.foreach_get("normal", normals)
+        return normals.reshape(-1, 3)
+
+#transform the mesh vertices in place with a single matrix, given in the space of matrix_world (like bmesh.ops.transform)
+def transform_mesh(mesh, matrix, matrix_world):
+        local = np.array(matrix_world.inverted() @ matrix @ matrix_world, dtype=np.float64)
+
+        #custom normals are set again after the vertices moved, transformed by the inverse-transpose
+        normals = corner_normals(mesh) if mesh.has_custom_normals else None
+
+        positions = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", positions)
+        positions = positions.reshape(-1, 3) @ local[:3, :3].T + local[:3, 3]
+        mesh.vertices.foreach_set("co", positions.astype(np.float32).ravel())
+
+        if normals is not None:
+                normals = normals @ np.linalg.inv(local[:3, :3])
+                normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+                mesh.normals_split_custom_set(normals)
+
+        mesh.update()
+
+#reference transform with bmesh, one pass per step
+def transform_bmesh(mesh, model, is_obj, scale_factor, matrix_world):
+        bm = bmesh.new()
+        bm.from_mesh(mesh)
+        if is_obj:
+                bmesh.ops.transform(bm, matrix=mathutils.Euler((math.radians(-90.0), 0.0, 0.0)).to_matrix(), space=matrix_world, verts=bm.verts)
+        if 'rotation' in model:
+                rotation = model['rotation']
+                bmesh.ops.transform(bm, matrix=mathutils.Quaternion((rotation[3], rotation[0], rotation[1], rotation[2])).to_matrix(), space=matrix_world, verts=bm.verts)
+        if 'translation' in model:
+                translation = model['translation']
+                bmesh.ops.transform(bm, matrix=mathutils.Matrix.Translation((translation[0], translation[1], translation[2])), space=matrix_world, verts=bm.verts)
+        if scale_factor is not None:
+                bmesh.ops.scale(bm, vec=mathutils.Vector((scale_factor, scale_factor, scale_factor)), space=matrix_world, verts=bm.verts)
+        if is_obj:
+                bmesh.ops.transform(bm, matrix=mathutils.Euler((math.radians(90.0), 0.0, 0.0)).to_matrix(), space=matrix_world, verts=bm.verts)
+        bm.to_mesh(mesh)
+        bm.free()
+
+#compare bmesh and single matrix transforms on a grid mesh
+def benchmark(vertex_count):
+        sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+        from GLBWriter import grid_mesh, create_blender_mesh
+
+        positions, normals, uvs, indices = grid_mesh(2 * vertex_count)
+        obj = create_blender_mesh(positions, uvs, indices)
+        model = { 'rotation': [0.1, 0.2, 0.3, 0.927], 'translation': [1.0, -2.0, 0.5] }
+        results = { "numVertices": len(obj.data.vertices) }
+
+        start = time.perf_counter()
+        transform_bmesh(obj.data, model, True, 0.001, obj.matrix_world)
+        results["bmesh"] = time.perf_counter() - start
+        reference = np.empty(len(obj.data.vertices) * 3, dtype=np.float32)
+        obj.data.vertices.foreach_get("co", reference)
+
+        obj.data.vertices.foreach_set("co", np.stack((positions[:, 0], -positions[:, 2], positions[:, 1]), axis=1).ravel())
+        start = time.perf_counter()
+        transform_mesh(obj.data, orientation_matrix(model, True, 0.001), obj.matrix_world)
+        results["matrix"] = time.perf_counter() - start
+        fused = np.empty(len(obj.data.vertices) * 3, dtype=np.float32)
+        obj.data.vertices.foreach_get("co", fused)
+
+        results["speedup"] = results["bmesh"] / max(results["matrix"], 1e-9)
+        results["maxDifference"] = float(np.abs(fused - reference).max())
+        print("JSON=" + json.dumps(results))
 
 def run():
-        do_translate = False
-        do_rotate = False
         do_scale = False
-        scale_factor = 1.0
 
         bpy.ops.object.select_all(action='SELECT')
         bpy.ops.object.delete(use_global=False)
@@ -27,10 +195,8 @@ def run():
         file_extension = file_extension.lower()
 
         #import scene to be reoriented
-        if file_extension == '.obj':
-                bpy.ops.wm.obj_import(filepath=argv[0])
-        elif file_extension == '.ply':
-                bpy.ops.import_mesh.ply(filepath=argv[0])
+        if file_extension == '.obj' or file_extension == '.ply':
+                import_mesh(argv[0], file_extension)
         elif file_extension == '.fbx':
                 bpy.ops.import_scene.fbx(filepath=argv[0])
                 
@@ -44,68 +210,32 @@ def run():
         models = data['models']
         nodes = data['nodes']
         is_multi = True if len(models) > 1 else False
+        node_index = NodeIndex(nodes) if is_multi else None
 
-        if is_multi:
-                bpy.ops.file.unpack_all(method="WRITE_ORIGINAL")
-        
         for object in bpy.data.objects:
                 model_idx = -1
                 if object.type == "MESH":
                         if is_multi:
-                                for idx, node in enumerate(nodes):
-                                        if object.name in node['name']:
-                                                model_idx = node['model']
-                                                break
+                                model_idx = node_index.match(object.name)
                         else:
                                 model_idx = 0
-                                
-                        if model_idx > -1:                
+
+                        if model_idx > -1:
                                 model = models[model_idx]
 
-                                if 'rotation' in model:
-                                        rotation = model['rotation']
-                                        do_rotate = True
-                                if 'translation' in model:      
-                                        translation = model['translation']
-                                        do_translate = True
-                                        
                                 #set internal scale info
+                                scale_factor = None
                                 if argv[3].lower() in ('yes', 'true', 't', 'y', '1'):
                                         do_scale = True
-                                        file_unit = model['units']
-                                        if file_unit == 'mm':
-                                                scale_factor = 0.001
-                                        elif file_unit == 'cm':
-                                                scale_factor = 0.01
-                                        elif file_unit == 'in':
-                                                scale_factor = 0.0254
-                                        elif file_unit == 'ft':
-                                                scale_factor = 0.3048
-                                        elif file_unit == 'm':
-                                                scale_factor = 1.0
-                                
-                                me = object.data
-                                bm = bmesh.new()   
-                                bm.from_mesh(me)  
-
-                                matrix_world = object.matrix_world 
-                                
-                                # transform
-                                if file_extension == '.obj':
-                                        bmesh.ops.transform(bm, matrix=mathutils.Euler((math.radians(-90.0), 0.0, 0.0)).to_matrix(), space=matrix_world, verts=bm.verts) # change coordinate system
-                                if do_rotate:
-                                        bmesh.ops.transform(bm, matrix=mathutils.Quaternion((rotation[3], rotation[0], rotation[1], rotation[2])).to_matrix(), space=matrix_world, verts=bm.verts)
-                                if do_translate: 
-                                        bmesh.ops.transform(bm, matrix=mathutils.Matrix.Translation((translation[0], translation[1], translation[2])), space=matrix_world, verts=bm.verts)
-                                if do_scale:
-                                        bmesh.ops.scale(bm, vec=mathutils.Vector((scale_factor, scale_factor, scale_factor)), space=matrix_world, verts=bm.verts)
-                                if file_extension == '.obj':
-                                        bmesh.ops.transform(bm, matrix=mathutils.Euler((math.radians(90.0), 0.0, 0.0)).to_matrix(), space=matrix_world, verts=bm.verts) # return to original coordinate system
-                                        
-                                # write to mesh
-                                bm.to_mesh(me)
-                                bm.free()  
-                        
+                                        scale_factor = UNIT_SCALE.get(model['units'], 1.0)
+
+                                # transform all vertices at once
+                                matrix = orientation_matrix(model, file_extension == '.obj', scale_factor)
+                                transform_mesh(object.data, matrix, object.matrix_world)
+
+        if is_multi:
+                node_index.report()
+
         identifier = '_oriented'
         if do_scale:
                 identifier = '_std'
@@ -122,6 +252,8 @@ def run():
         save_file = os.path.join(dir, mod_filename)
         if file_extension == '.obj':
                 save_file = save_file.replace(".fbx",".obj")
+                #FBX embeds packed images directly, OBJ materials need image files
+                write_packed_images(os.path.dirname(os.path.abspath(save_file)))
                 bpy.ops.wm.obj_export(filepath=save_file, check_existing=False, export_materials=True, path_mode='COPY')
         elif file_extension == '.ply':
                 bpy.ops.export_mesh.ply(filepath=save_file)
@@ -129,7 +261,12 @@ def run():
                 bpy.ops.export_scene.fbx(filepath=save_file, check_existing=False, path_mode="COPY", embed_textures=True)
 
 try:
-    run()
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+    if argv and argv[0] == "--benchmark":
+        benchmark(int(argv[1]) if len(argv) > 1 else 2000000)
+    else:
+        run()
 except Exception as e:
         print(e)
         sys.exit(1)
@@ -2,6 +2,196 @@ import bpy
 import json
 import os
 import sys
+import math
+import time
+import argparse
+import mathutils
+import numpy as np
+
+# camera field of view for preview views
+PREVIEW_FOV = math.radians(40.0)
+
+def convert(s):
+    if s.lower() == "true":
+        return True
+    else:
+        return False
+
+def importModel(file_path, file_extension):
+    #import scene
+    if file_extension == '.obj':
+        bpy.ops.wm.obj_import(filepath=file_path)
+    elif file_extension == '.ply':
+        bpy.ops.import_mesh.ply(filepath=file_path)
+    elif file_extension == '.stl':
+        bpy.ops.import_mesh.stl(filepath=file_path)
+    elif file_extension == '.x3d':
+        bpy.ops.import_scene.x3d(filepath=file_path)
+    elif file_extension == '.dae':
+        bpy.ops.wm.collada_import(filepath=file_path)
+    elif file_extension == '.fbx':
+        bpy.ops.import_scene.fbx(filepath=file_path)
+    elif file_extension == '.glb' or file_extension == '.gltf':
+        bpy.ops.import_scene.gltf(filepath=file_path)
+    else:
+        print("Error: Unsupported file type: " + file_extension)
+        sys.exit(1)
+
+#view directions (from the object to the camera): turntable views around Z at the given elevation, then top and bottom
+def previewViews(count, elevation, top_bottom):
+    views = []
+    for index in range(count):
+        angle = 2.0 * math.pi * index / count
+        views.append(("view_%02d" % index, mathutils.Vector((math.sin(angle) * math.cos(elevation), -math.cos(angle) * math.cos(elevation), math.sin(elevation)))))
+    if top_bottom:
+        views.append(("top", mathutils.Vector((0.0, 0.0, 1.0))))
+        views.append(("bottom", mathutils.Vector((0.0, 0.0, -1.0))))
+    return views
+
+#render engine and settings for fast previews: Workbench with studio light, or Eevee without effects and a headlight
+def setupPreviewRender(scene, engine, resolution):
+    scene.render.resolution_x = resolution
+    scene.render.resolution_y = resolution
+    scene.render.resolution_percentage = 100
+    scene.render.film_transparent = True
+    scene.render.image_settings.file_format = 'PNG'
+    scene.render.image_settings.color_mode = 'RGBA'
+
+    if engine == "eevee":
+        engines = bpy.types.RenderSettings.bl_rna.properties['engine'].enum_items.keys()
+        scene.render.engine = 'BLENDER_EEVEE_NEXT' if 'BLENDER_EEVEE_NEXT' in engines else 'BLENDER_EEVEE'
+        scene.eevee.taa_render_samples = 4
+        for effect in ("use_gtao", "use_bloom", "use_ssr", "use_motion_blur", "use_volumetric_lights", "use_soft_shadows", "use_shadows", "use_raytracing"):
+            if hasattr(scene.eevee, effect):
+                setattr(scene.eevee, effect, False)
+        light = bpy.data.objects.new("PreviewLight", bpy.data.lights.new("PreviewLight", type='SUN'))
+        scene.collection.objects.link(light)
+        return light
+
+    scene.render.engine = 'BLENDER_WORKBENCH'
+    scene.display.shading.light = 'STUDIO'
+    scene.display.shading.color_type = 'TEXTURE'
+    scene.display.render_aa = 'FXAA'
+    return None
+
+#center and radius of the bounding sphere of all mesh objects
+def boundingSphere():
+    corners = [obj.matrix_world @ mathutils.Vector(corner) for obj in bpy.data.objects if obj.type == 'MESH' for corner in obj.bound_box]
+    if not corners:
+        return mathutils.Vector((0.0, 0.0, 0.0)), 1.0
+    lower = mathutils.Vector([min(c[i] for c in corners) for i in range(3)])
+    upper = mathutils.Vector([max(c[i] for c in corners) for i in range(3)])
+    return (lower + upper) * 0.5, max((upper - lower).length * 0.5, 1e-6)
+
+#combine view images into one sprite sheet, one row per list of files. the sheet is as wide as the longest row.
+def writeSpriteSheet(rows, save_file):
+    images = []
+    for files in rows:
+        images.append([])
+        for file in files:
+            image = bpy.data.images.load(file)
+            pixels = np.empty(image.size[0] * image.size[1] * 4, dtype=np.float32)
+            image.pixels.foreach_get(pixels)
+            # blender images start with the bottom row
+            images[-1].append(pixels.reshape(image.size[1], image.size[0], 4)[::-1])
+            bpy.data.images.remove(image)
+
+    height, width = images[0][0].shape[:2]
+    columns = max(len(row) for row in images)
+    sheet = np.zeros((len(images) * height, columns * width, 4), dtype=np.float32)
+    for row, row_images in enumerate(images):
+        for column, pixels in enumerate(row_images):
+            sheet[row * height:(row + 1) * height, column * width:(column + 1) * width] = pixels
+
+    image = bpy.data.images.new("sprites", columns * width, len(images) * height, alpha=True)
+    image.pixels.foreach_set(sheet[::-1].ravel())
+    image.filepath_raw = save_file
+    image.file_format = 'PNG'
+    image.save()
+    bpy.data.images.remove(image)
+
+#render all views of one model, returns timings
+def renderPreview(file_path, args, camera, light):
+    start = time.perf_counter()
+    report = { "file": file_path, "views": [] }
+
+    importModel(file_path, os.path.splitext(file_path)[1].lower())
+    report["importSeconds"] = time.perf_counter() - start
+
+    scene = bpy.context.scene
+    center, radius = boundingSphere()
+    distance = radius / math.sin(PREVIEW_FOV * 0.5) * 1.05
+    camera.data.clip_start = max(distance - 2.0 * radius, distance * 0.001)
+    camera.data.clip_end = distance + 2.0 * radius
+
+    base = os.path.splitext(os.path.basename(file_path))[0]
+    directory = args.output_dir or os.path.dirname(file_path)
+    files = []
+    for name, direction in previewViews(args.views, math.radians(args.elevation), args.top_bottom):
+        view_start = time.perf_counter()
+        camera.location = center + direction * distance
+        camera.rotation_euler = (-direction).to_track_quat('-Z', 'Y').to_euler()
+        if light is not None:
+            light.rotation_euler = camera.rotation_euler
+        scene.render.filepath = os.path.join(directory, "%s_%s.png" % (base, name))
+        bpy.ops.render.render(write_still=True)
+        files.append(scene.render.filepath)
+        seconds = time.perf_counter() - view_start
+        report["views"].append({ "name": name, "file": scene.render.filepath, "seconds": seconds })
+        print("Rendered %s %s in %.2fs" % (base, name, seconds))
+
+    if args.sprite_sheet and files:
+        sprite_start = time.perf_counter()
+        report["spriteSheet"] = os.path.join(directory, base + "_sprites.png")
+        # turntable views in the first row, top and bottom in their own
+        rows = [row for row in (files[:args.views], files[args.views:]) if row]
+        writeSpriteSheet(rows, report["spriteSheet"])
+        report["spriteSeconds"] = time.perf_counter() - sprite_start
+
+    # remove the model, the session continues with the next one
+    for obj in list(bpy.data.objects):
+        if obj != camera and obj != light:
+            bpy.data.objects.remove(obj)
+    bpy.ops.outliner.orphans_purge(do_recursive=True)
+
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+#preview session: renders the views of each input model in one Blender launch
+def runPreviewSession(args):
+    bpy.ops.object.select_all(action='SELECT')
+    bpy.ops.object.delete(use_global=False)
+    bpy.ops.outliner.orphans_purge(do_recursive=True)
+
+    scene = bpy.context.scene
+    camera = bpy.data.objects.new("PreviewCamera", bpy.data.cameras.new("PreviewCamera"))
+    camera.data.angle = PREVIEW_FOV
+    scene.collection.objects.link(camera)
+    scene.camera = camera
+    light = setupPreviewRender(scene, args.engine, args.resolution)
+
+    reports = [renderPreview(file_path, args, camera, light) for file_path in args.inputs]
+    print("PREVIEW=" + json.dumps(reports))
+
+#get args
+argv = sys.argv
+argv = argv[argv.index("--") + 1:]
+
+#preview session: -i file1 file2 ... with view, engine and resolution options
+if len(argv) > 0 and argv[0].startswith("-"):
+    parser = argparse.ArgumentParser(description="Render preview views")
+    parser.add_argument("-i", "--inputs", required=True, nargs="+", help="Input mesh files")
+    parser.add_argument("-o", "--output_dir", required=False, help="Output directory (default: directory of each input)")
+    parser.add_argument("-v", "--views", required=False, default=8, type=int, help="Number of turntable views")
+    parser.add_argument("-el", "--elevation", required=False, default=20.0, type=float, help="Turntable camera elevation in degrees")
+    parser.add_argument("-tb", "--top_bottom", required=False, default=True, type=convert, help="Render top and bottom views")
+    parser.add_argument("-e", "--engine", required=False, default="workbench", choices=["workbench", "eevee"], help="Render engine")
+    parser.add_argument("-r", "--resolution", required=False, default=512, type=int, help="Image width and height")
+    parser.add_argument("-ss", "--sprite_sheet", required=False, default=True, type=convert, help="Write a sprite sheet of all views")
+    args = parser.parse_args(argv)
+
+    runPreviewSession(args)
+    sys.exit(0)
 
 # get rid of default mesh objects
 for ob in bpy.context.scene.objects:
@@ -14,32 +204,12 @@ bpy.ops.outliner.orphans_purge()
 bpy.ops.outliner.orphans_purge()
 bpy.ops.outliner.orphans_purge()
 
-#get args
-argv = sys.argv
-argv = argv[argv.index("--") + 1:]
-
 #get import file extension
 filename, file_extension = os.path.splitext(argv[0])
 file_extension = file_extension.lower()
 
 #import scene
-if file_extension == '.obj':
-    bpy.ops.wm.obj_import(filepath=argv[0])
-elif file_extension == '.ply':
-    bpy.ops.import_mesh.ply(filepath=argv[0])
-elif file_extension == '.stl':
-    bpy.ops.import_mesh.stl(filepath=argv[0])
-elif file_extension == '.x3d':
-    bpy.ops.import_scene.x3d(filepath=argv[0])
-elif file_extension == '.dae':
-    bpy.ops.wm.collada_import(filepath=argv[0])
-elif file_extension == '.fbx':
-    bpy.ops.import_scene.fbx(filepath=argv[0])
-elif file_extension == '.glb' or file_extension == '.gltf':
-    bpy.ops.import_scene.gltf(filepath=argv[0])
-else:
-    print("Error: Unsupported file type: " + file_extension)
-    sys.exit(1)
+importModel(argv[0], file_extension)
 
 if len(bpy.data.objects) > 0:
     bpy.context.scene.camera = bpy.context.scene.objects.get('Camera')
@@ -2,7 +2,30 @@ import bpy
 import json
 import os
 import sys
+import time
 import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import GLBWriter
+import MeshCleanup
+import MeshOptimizer
+from BlenderMeshCache import import_mesh
+
+#texture channels that hold color data and are filtered in linear space
+color_types = ['Base Color', 'Emission']
+
+#foreach_get/set property, components and array type of the mesh attribute data types
+attribute_types = {
+    'FLOAT': ('value', 1, np.float32),
+    'INT': ('value', 1, np.int32),
+    'INT8': ('value', 1, np.int32),
+    'BOOLEAN': ('value', 1, bool),
+    'FLOAT2': ('vector', 2, np.float32),
+    'FLOAT_VECTOR': ('vector', 3, np.float32),
+    'FLOAT_COLOR': ('color', 4, np.float32),
+    'BYTE_COLOR': ('color', 4, np.float32)
+}
 
 def convert(s):
     if s.lower() == "true":
@@ -10,6 +33,372 @@ def convert(s):
     else:
         return False
 
+#read the pixels (rows x columns x channels) of a loaded image
+def read_pixels(image):
+    width, height = image.size
+    pixels = np.empty(width * height * image.channels, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    return pixels.reshape(height, width, image.channels)
+
+#decode an image file once and keep its pixels for reuse
+def load_pixels(path, pixel_cache):
+    if path not in pixel_cache:
+        image = bpy.data.images.load(path)
+        pixel_cache[path] = read_pixels(image)
+        bpy.data.images.remove(image)
+    return pixel_cache[path]
+
+#fit image dimensions into a maximum size, keeping the aspect ratio (never upscales)
+def fit_size(width, height, max_size):
+    if max_size <= 0 or max(width, height) <= max_size:
+        return width, height
+    scale = max_size / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+#Lanczos-3 sample positions and weights for resampling one axis
+def resample_weights(src_size, dst_size, support=3.0):
+    scale = src_size / dst_size
+    filter_scale = max(scale, 1.0)
+    radius = support * filter_scale
+    centers = (np.arange(dst_size) + 0.5) * scale - 0.5
+    taps = int(np.ceil(radius)) * 2 + 1
+    first = np.floor(centers - radius).astype(np.int64) + 1
+    indices = first[:, None] + np.arange(taps)[None, :]
+    x = (indices - centers[:, None]) / filter_scale
+    weights = np.sinc(x) * np.sinc(x / support)
+    weights[np.abs(x) >= support] = 0.0
+    weights /= weights.sum(axis=1, keepdims=True)
+    return np.clip(indices, 0, src_size - 1), weights.astype(np.float32)
+
+#resample one image axis, gathering each filter tap as a whole slab
+def resample_axis(pixels, size, axis):
+    indices, weights = resample_weights(pixels.shape[axis], size)
+    shape = [1] * pixels.ndim
+    shape[axis] = size
+    result = None
+    for tap in range(indices.shape[1]):
+        samples = np.take(pixels, indices[:, tap], axis=axis)
+        samples *= weights[:, tap].reshape(shape)
+        if result is None:
+            result = samples
+        else:
+            result += samples
+    return result
+
+#separable Lanczos-3 resampling, columns first so the second pass runs on the smaller image
+def resample(pixels, width, height):
+    if pixels.shape[1] != width:
+        pixels = resample_axis(pixels, width, 1)
+    if pixels.shape[0] != height:
+        pixels = resample_axis(pixels, height, 0)
+    return np.clip(pixels, 0.0, 1.0)
+
+def srgb_to_linear(pixels):
+    rgb = pixels[..., :3]
+    pixels[..., :3] = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    return pixels
+
+def linear_to_srgb(pixels):
+    rgb = pixels[..., :3]
+    pixels[..., :3] = np.where(rgb <= 0.0031308, rgb * 12.92, 1.055 * rgb ** (1.0 / 2.4) - 0.055)
+    return pixels
+
+#create an in-memory (packed) image from a pixel array, no disk round trip
+def create_image(name, pixels, is_data):
+    height, width, channels = pixels.shape
+    if channels < 4:
+        rgba = np.ones((height, width, 4), dtype=np.float32)
+        rgba[..., :3] = pixels[..., :3] if channels >= 3 else pixels[..., :1]
+        pixels = rgba
+    image = bpy.data.images.new(name, width=width, height=height, alpha=True, float_buffer=False)
+    image.pixels.foreach_set(np.ascontiguousarray(pixels, dtype=np.float32).ravel())
+    if is_data:
+        image.colorspace_settings.name = 'Non-Color'
+    image.pack()
+    return image
+
+#load a texture, downsampling it to the maximum texture size if needed
+def load_texture(tex_type, path, max_size):
+    image = bpy.data.images.load(path)
+    width, height = image.size
+    dst_width, dst_height = fit_size(width, height, max_size)
+    if (dst_width, dst_height) == (width, height):
+        return image
+    pixels = read_pixels(image)
+    bpy.data.images.remove(image)
+
+    if tex_type in color_types:
+        pixels = linear_to_srgb(resample(srgb_to_linear(pixels), dst_width, dst_height))
+    elif tex_type == 'Normal':
+        pixels = resample(pixels, dst_width, dst_height)
+        normals = pixels[..., :3] * 2.0 - 1.0
+        normals /= np.maximum(np.linalg.norm(normals, axis=2, keepdims=True), 1e-8)
+        pixels[..., :3] = normals * 0.5 + 0.5
+    else:
+        pixels = resample(pixels, dst_width, dst_height)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    return create_image(name, pixels, tex_type not in color_types)
+
+#pack occlusion (R), roughness (G) and metallic (B) into a single glTF ORM texture.
+#each source is a (path, channel) tuple or a constant value if no map is given.
+def pack_orm(name, sources, max_size):
+    pixel_cache = {}
+    width = height = 0
+    for source in sources:
+        if isinstance(source, tuple):
+            pixels = load_pixels(source[0], pixel_cache)
+            width = max(width, pixels.shape[1])
+            height = max(height, pixels.shape[0])
+    width, height = fit_size(width, height, max_size)
+
+    orm = np.ones((height, width, 4), dtype=np.float32)
+    for idx, source in enumerate(sources):
+        if isinstance(source, tuple):
+            path, channel = source
+            pixels = load_pixels(path, pixel_cache)
+            channel = min(channel, pixels.shape[2] - 1)
+            orm[..., idx] = resample(pixels[..., channel:channel + 1], width, height)[..., 0]
+        else:
+            orm[..., idx] = source
+
+    return create_image(name, orm, True)
+
+#encoded image data for embedding by the native writer, None if the image can't be embedded as is
+def image_data(image, data_cache):
+    if image.name not in data_cache:
+        data = None
+        if image.packed_file is not None:
+            data = bytes(image.packed_file.data)
+        else:
+            path = bpy.path.abspath(image.filepath_raw)
+            if os.path.splitext(path)[1].lower() in ('.jpg', '.jpeg', '.png'):
+                with open(path, 'rb') as f:
+                    data = f.read()
+        if data is not None and GLBWriter.image_mime_type(data) is None:
+            data = None
+        data_cache[image.name] = data
+    return data_cache[image.name]
+
+#flatten a mesh object into glTF vertex arrays (Y up), one vertex per unique position/normal/uv corner
+def mesh_arrays(obj):
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+    if hasattr(mesh, 'calc_normals_split'):
+        mesh.calc_normals_split()
+
+    loop_count = len(mesh.loops)
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    loop_vertices = np.empty(loop_count, dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_vertices)
+    loop_normals = np.empty(loop_count * 3, dtype=np.float32)
+    mesh.loops.foreach_get('normal', loop_normals)
+    triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get('loops', triangles)
+
+    columns = [loop_vertices.view(np.float32)[:, None], loop_normals.reshape(-1, 3)]
+    uv_layer = mesh.uv_layers.active
+    if uv_layer is not None:
+        loop_uvs = np.empty(loop_count * 2, dtype=np.float32)
+        uv_layer.data.foreach_get('uv', loop_uvs)
+        columns.append(loop_uvs.reshape(-1, 2))
+
+    #merge corners with identical attributes, keeping first-occurrence order
+    keys = np.ascontiguousarray(np.hstack(columns))
+    keys = keys.view(np.dtype((np.void, keys.shape[1] * keys.itemsize))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    remap = np.empty_like(order)
+    remap[order] = np.arange(order.size)
+    corners = first[order]
+    indices = remap[inverse.ravel()][triangles].astype(np.uint32)
+
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    positions = co.reshape(-1, 3)[loop_vertices[corners]] @ matrix[:3, :3].T + matrix[:3, 3]
+    normals = loop_normals.reshape(-1, 3)[corners] @ np.linalg.inv(matrix[:3, :3])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+
+    #Blender Z up to glTF Y up
+    positions = np.stack((positions[:, 0], positions[:, 2], -positions[:, 1]), axis=1).astype(np.float32)
+    normals = np.stack((normals[:, 0], normals[:, 2], -normals[:, 1]), axis=1).astype(np.float32)
+    uvs = None
+    if uv_layer is not None:
+        uvs = loop_uvs.reshape(-1, 2)[corners]
+        uvs[:, 1] = 1.0 - uvs[:, 1]
+
+    return positions, normals, uvs, indices
+
+def print_optimization(report):
+    before = report["before"]
+    after = report["after"]
+    print("Vertex cache optimization: ACMR %.3f -> %.3f, ATVR %.3f -> %.3f, %d triangles in %.2fs" % \
+        (before["acmr"], after["acmr"], before["atvr"], after["atvr"], report["numTriangles"], report["seconds"]))
+
+def triangle_vertices(mesh):
+    mesh.calc_loop_triangles()
+    triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get('vertices', triangles)
+    return triangles.reshape(-1, 3)
+
+#weld vertices and remove degenerate and duplicate faces, rebuilding the mesh data from arrays.
+#point, corner and face attributes (UV maps, colors, material indices) are carried over, custom
+#split normals are not (the asset is shaded smooth afterwards).
+def clean_mesh(obj, weld_distance, keep_seams):
+    start = time.perf_counter()
+    mesh = obj.data
+    vertex_count = len(mesh.vertices)
+    loop_count = len(mesh.loops)
+    face_count = len(mesh.polygons)
+    if face_count == 0:
+        return
+
+    co = np.empty(vertex_count * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    co = co.reshape(-1, 3)
+    loop_vertices = np.empty(loop_count, dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_vertices)
+    loop_start = np.empty(face_count, dtype=np.int32)
+    mesh.polygons.foreach_get('loop_start', loop_start)
+    loop_total = np.empty(face_count, dtype=np.int32)
+    mesh.polygons.foreach_get('loop_total', loop_total)
+
+    #to keep UV seams open, vertices only weld if the texture coordinates of their first corners match
+    keys = None
+    uv_layer = mesh.uv_layers.active
+    if keep_seams and uv_layer is not None:
+        loop_uvs = np.empty(loop_count * 2, dtype=np.float32)
+        uv_layer.data.foreach_get('uv', loop_uvs)
+        first = np.full(vertex_count, loop_count, dtype=np.int64)
+        np.minimum.at(first, loop_vertices, np.arange(loop_count))
+        keys = np.vstack((loop_uvs.reshape(-1, 2), np.zeros((1, 2), dtype=np.float32)))[first]
+
+    remap = MeshCleanup.weld_vertices(co, weld_distance, keys)
+    corners = remap[loop_vertices]
+    keep_loop, keep_face, report = MeshCleanup.clean_faces(corners, loop_start, loop_total, co)
+    used = np.unique(corners[keep_loop])
+    index = np.full(vertex_count, -1, dtype=np.int64)
+    index[used] = np.arange(used.size)
+    sizes = np.bincount(np.repeat(np.arange(face_count), loop_total)[keep_loop], minlength=face_count)[keep_face]
+
+    rebuild_mesh(obj, co[used], index[corners[keep_loop]], sizes, { 'POINT': used, 'CORNER': keep_loop, 'FACE': keep_face })
+
+    print("Mesh cleanup: %d -> %d vertices, %d -> %d faces (%d degenerate, %d duplicate removed) in %.2fs" % \
+        (vertex_count, used.size, face_count, sizes.size, report["degenerateFaces"], report["duplicateFaces"], time.perf_counter() - start))
+
+#replace the mesh data of an object with a mesh built from arrays: vertex positions, corner vertex
+#indices and face sizes. point, corner and face attributes are taken from the old mesh by the index
+#arrays or masks in selection, custom split normals only if given (per new corner).
+def rebuild_mesh(obj, co, loop_vertices, sizes, selection, normals=None):
+    mesh = obj.data
+    uv_layer = mesh.uv_layers.active
+    cleaned = bpy.data.meshes.new(mesh.name)
+    cleaned.vertices.add(co.shape[0])
+    cleaned.vertices.foreach_set('co', co.ravel())
+    cleaned.loops.add(int(sizes.sum()))
+    cleaned.loops.foreach_set('vertex_index', loop_vertices.astype(np.int32))
+    cleaned.polygons.add(sizes.size)
+    cleaned.polygons.foreach_set('loop_start', (np.cumsum(sizes) - sizes).astype(np.int32))
+    cleaned.polygons.foreach_set('loop_total', sizes.astype(np.int32))
+
+    for attribute in mesh.attributes:
+        if attribute.name.startswith('.') or attribute.name == 'position' or attribute.domain not in selection \
+            or attribute.data_type not in attribute_types:
+            continue
+        prop, components, dtype = attribute_types[attribute.data_type]
+        values = np.empty(len(attribute.data) * components, dtype=dtype)
+        attribute.data.foreach_get(prop, values)
+        values = values.reshape(-1, components)[selection[attribute.domain]]
+        target = cleaned.attributes.get(attribute.name)
+        if target is None:
+            target = cleaned.attributes.new(attribute.name, attribute.data_type, attribute.domain)
+        target.data.foreach_set(prop, values.ravel())
+    if uv_layer is not None and uv_layer.name in cleaned.uv_layers:
+        cleaned.uv_layers.active = cleaned.uv_layers[uv_layer.name]
+    active_color = mesh.color_attributes.active_color
+    if active_color is not None and active_color.name in cleaned.color_attributes:
+        cleaned.color_attributes.active_color = cleaned.color_attributes[active_color.name]
+    for material in mesh.materials:
+        cleaned.materials.append(material)
+
+    cleaned.update(calc_edges=True)
+    cleaned.validate(clean_customdata=False)
+    if normals is not None:
+        #custom normals need auto smooth before Blender 4.1
+        if hasattr(cleaned, 'use_auto_smooth'):
+            cleaned.use_auto_smooth = True
+        cleaned.normals_split_custom_set(normals.reshape(-1, 3).tolist())
+    obj.data = cleaned
+    name = mesh.name
+    bpy.data.meshes.remove(mesh)
+    cleaned.name = name
+
+#reorder the faces of a mesh object for vertex cache locality. the glTF exporter keeps the face
+#order but renumbers vertices itself, so only the triangle order is optimized on this path. the face
+#and corner arrays are permuted and the mesh is rebuilt from them (see rebuild_mesh).
+def optimize_faces(obj):
+    start = time.perf_counter()
+    mesh = obj.data
+    vertex_count = len(mesh.vertices)
+    triangles = triangle_vertices(mesh)
+    report = { "numTriangles": triangles.shape[0], "numVertices": vertex_count }
+    report["before"] = MeshOptimizer.analyze_vertex_cache(triangles, vertex_count)
+
+    face_count = len(mesh.polygons)
+    loop_count = len(mesh.loops)
+    centers = np.empty(face_count * 3, dtype=np.float32)
+    mesh.polygons.foreach_get('center', centers)
+    order = np.argsort(MeshOptimizer.hilbert_codes(centers.reshape(-1, 3)), kind='stable')
+    co = np.empty(vertex_count * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    loop_vertices = np.empty(loop_count, dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_vertices)
+    loop_start = np.empty(face_count, dtype=np.int32)
+    mesh.polygons.foreach_get('loop_start', loop_start)
+    loop_total = np.empty(face_count, dtype=np.int32)
+    mesh.polygons.foreach_get('loop_total', loop_total)
+
+    #corners of the reordered faces: each face's run of loops, moved to its new start
+    sizes = loop_total[order]
+    loop_order = np.repeat(loop_start[order] - (np.cumsum(sizes) - sizes), sizes) + np.arange(loop_count)
+    normals = None
+    if mesh.has_custom_normals:
+        if hasattr(mesh, 'calc_normals_split'):
+            mesh.calc_normals_split()
+        normals = np.empty(loop_count * 3, dtype=np.float32)
+        mesh.loops.foreach_get('normal', normals)
+        normals = normals.reshape(-1, 3)[loop_order]
+
+    rebuild_mesh(obj, co.reshape(-1, 3), loop_vertices[loop_order], sizes, \
+        { 'POINT': np.arange(vertex_count), 'CORNER': loop_order, 'FACE': order }, normals)
+
+    report["after"] = MeshOptimizer.analyze_vertex_cache(triangle_vertices(obj.data), vertex_count)
+    report["seconds"] = time.perf_counter() - start
+    print_optimization(report)
+
+#write a single mesh, single material GLB without the Blender glTF exporter.
+#returns False if the scene or material can't be handled, so the caller can fall back.
+def export_native(save_file, material, texture_images, optimize, compression=None):
+    meshes = [obj for obj in bpy.data.objects if obj.type == 'MESH']
+    if len(meshes) != 1:
+        return False
+
+    data_cache = {}
+    for slot, image in texture_images.items():
+        if image is not None:
+            data = image_data(image, data_cache)
+            if data is None:
+                print("Native writer can't embed image " + image.name + ", using glTF exporter")
+                return False
+            material[slot] = data
+
+    positions, normals, uvs, indices = mesh_arrays(meshes[0])
+    if optimize:
+        indices, positions, (normals, uvs), report = MeshOptimizer.optimize_mesh(indices, positions, (normals, uvs))
+        print_optimization(report)
+    GLBWriter.write_glb(save_file, positions, indices, normals, uvs, material, meshes[0].name, compression)
+    return True
+
 def run():
     # get rid of default objects
     bpy.ops.object.select_all(action='SELECT')
@@ -33,11 +422,20 @@ def run():
     parser.add_argument("-om", "--occlusion", required=False, help="Occlusion filepath")
     parser.add_argument("-em", "--emissive", required=False, help="Emissive filepath")
     parser.add_argument("-mrm", "--metalrough", required=False, help="MetalRough filepath")
+    parser.add_argument("-rm", "--roughness", required=False, help="Roughness filepath")
+    parser.add_argument("-mm", "--metallic", required=False, help="Metallic filepath")
+    parser.add_argument("-ts", "--texture_size", required=False, default=0, type=int, help="Maximum texture size")
     parser.add_argument("-nm", "--normal", required=False, help="Normal filepath")
     parser.add_argument("-os", "--object_space", required=False, default=False, help="Object space normals")
     parser.add_argument("-uc", "--use_compression", required=False, default=False, help="Use compression")
     parser.add_argument("-cl", "--compression_level", required=False, default=10, type=int, help="Compression level")
+    parser.add_argument("-cm", "--compression_method", required=False, default="draco", help="Compression method (draco, quantize, meshopt)")
     parser.add_argument("-ab", "--alpha_blend", required=False, default=False, help="Blend alpha channel")
+    parser.add_argument("-nw", "--native_writer", required=False, default=False, help="Use native GLB writer")
+    parser.add_argument("-vc", "--optimize_vertex_cache", required=False, default=False, help="Optimize triangle and vertex order")
+    parser.add_argument("-cu", "--clean_mesh", required=False, default=False, help="Weld vertices and remove degenerate faces")
+    parser.add_argument("-wd", "--weld_distance", required=False, default=0.0, type=float, help="Weld distance")
+    parser.add_argument("-ks", "--keep_seams", required=False, default=False, help="Don't weld across UV seams")
     args = parser.parse_known_args(argv)[0]
 
     #parse arguments to format needed by Blender
@@ -50,6 +448,15 @@ def run():
             output_format = 'GLTF_EMBEDDED'
     do_compress = convert(args.use_compression)
     do_blend = convert(args.alpha_blend)
+    #quantization and meshopt compression are only available with the native writer
+    compression_method = args.compression_method.lower()
+    native_compression = compression_method if do_compress and compression_method != 'draco' else None
+    if native_compression is not None and native_compression not in GLBWriter.COMPRESSION_METHODS:
+        print("Unknown compression method: " + args.compression_method)
+        sys.exit(1)
+    do_native = output_format == 'GLB' and (convert(args.native_writer) or native_compression is not None) \
+        and (do_compress is False or native_compression is not None)
+    do_optimize = convert(args.optimize_vertex_cache)
     is_obj_space = convert(args.object_space)
     image_format = 'JPEG' if do_blend is False else 'AUTO'
     textures = []
@@ -65,12 +472,8 @@ def run():
     file_extension = file_extension.lower()
 
     #import scene
-    if file_extension == '.obj':
-        bpy.ops.wm.obj_import(filepath=args.input)
-    elif file_extension == '.ply':
-        bpy.ops.import_mesh.ply(filepath=args.input)
-    elif file_extension == '.stl':
-        bpy.ops.import_mesh.stl(filepath=args.input)
+    if file_extension == '.obj' or file_extension == '.ply' or file_extension == '.stl':
+        import_mesh(args.input, file_extension)
     elif file_extension == '.x3d':
         bpy.ops.import_scene.x3d(filepath=args.input)
     elif file_extension == '.dae':
@@ -83,13 +486,50 @@ def run():
         print("Error: Unsupported file type: " + file_extension)
         sys.exit(1)
 
+    if convert(args.clean_mesh):
+        for mesh_obj in bpy.data.objects:
+            if mesh_obj.type == 'MESH':
+                clean_mesh(mesh_obj, args.weld_distance, convert(args.keep_seams))
+
+    try: #check for provided output filename
+        mod_filename, file_extension = os.path.splitext(args.output)
+    except IndexError:
+        mod_filename = filename
+
+    #load occlusion and metal/roughness maps, packing separate channel maps into one ORM texture
+    occ_image = None
+    mr_image = None
+    if args.roughness is not None or args.metallic is not None:
+        occ_source = (args.occlusion, 0) if args.occlusion is not None else 1.0
+        if args.roughness is not None:
+            rough_source = (args.roughness, 0)
+        else:
+            rough_source = (args.metalrough, 1) if args.metalrough is not None else args.rough_factor
+        if args.metallic is not None:
+            metal_source = (args.metallic, 0)
+        else:
+            metal_source = (args.metalrough, 2) if args.metalrough is not None else args.metal_factor
+        mr_image = pack_orm(os.path.basename(mod_filename) + "-orm", (occ_source, rough_source, metal_source), args.texture_size)
+        if args.occlusion is not None:
+            occ_image = mr_image
+    else:
+        if args.occlusion is not None:
+            occ_image = load_texture('Occlusion', args.occlusion, args.texture_size)
+        if args.metalrough is not None:
+            if args.metalrough != args.occlusion:
+                mr_image = load_texture('Metallic', args.metalrough, args.texture_size)
+            else:
+                mr_image = occ_image
+
     #assign material attributes
     mat = bpy.data.materials.new(name="glTFMaterial")
     mat.use_nodes = True
     bsdf = mat.node_tree.nodes["Principled BSDF"]
+    texture_images = {}
     for tex_type, tex_path in textures:
         tex_image = mat.node_tree.nodes.new('ShaderNodeTexImage')
-        tex_image.image = bpy.data.images.load(tex_path)
+        tex_image.image = load_texture(tex_type, tex_path, args.texture_size)
+        texture_images[tex_type] = tex_image.image
         if tex_type != "Normal":
             mat.node_tree.links.new(bsdf.inputs[tex_type], tex_image.outputs['Color'])
         else:
@@ -104,23 +544,23 @@ def run():
             mat.node_tree.links.new(normal_map_node.outputs['Normal'], bsdf.inputs['Normal'])
 
     #occlusion is not natively supported, so add special settings node
-    if args.occlusion is not None:
+    if occ_image is not None:
         settings_node = mat.node_tree.nodes.new('ShaderNodeGroup')
         gltf_node_group = bpy.data.node_groups.new('glTF Material Output', 'ShaderNodeTree')
         gltf_node_group.inputs.new("NodeSocketFloat", "Occlusion")
         settings_node.node_tree = gltf_node_group
         occ_tex_image = mat.node_tree.nodes.new('ShaderNodeTexImage')
-        occ_tex_image.image = bpy.data.images.load(args.occlusion)
+        occ_tex_image.image = occ_image
         occ_tex_image.image.colorspace_settings.name = "Non-Color"
         separate_node = mat.node_tree.nodes.new('ShaderNodeSeparateColor')
         mat.node_tree.links.new(separate_node.inputs[0], occ_tex_image.outputs['Color'])
         mat.node_tree.links.new(settings_node.inputs["Occlusion"], separate_node.outputs['Red'])
 
     #handle metal/roughness map
-    if args.metalrough is not None:
-        if args.metalrough != args.occlusion:
+    if mr_image is not None:
+        if mr_image != occ_image:
             mr_tex_image = mat.node_tree.nodes.new('ShaderNodeTexImage')
-            mr_tex_image.image = bpy.data.images.load(args.metalrough)
+            mr_tex_image.image = mr_image
             mr_tex_image.image.colorspace_settings.name = "Non-Color"
         else:
             mr_tex_image = occ_tex_image
@@ -144,16 +584,33 @@ def run():
     obj = bpy.context.active_object
     obj.active_material = mat
 
-    try: #check for provided output filename
-        mod_filename, file_extension = os.path.splitext(args.output)
-    except IndexError:
-        mod_filename = filename
-        
     print("Exporting file: " + mod_filename)
     if len(bpy.data.objects) > 0:
         path = bpy.data.filepath
         dir = os.path.dirname(path)
         save_file = os.path.join(dir, mod_filename + args.format)
+        if do_native:
+            material = {
+                "name": mat.name,
+                "metallicFactor": args.metal_factor,
+                "roughnessFactor": args.rough_factor,
+                "alphaMode": mat.blend_method
+            }
+            native_images = {
+                "baseColorTexture": texture_images.get('Base Color'),
+                "emissiveTexture": texture_images.get('Emission'),
+                "normalTexture": texture_images.get('Normal'),
+                "occlusionTexture": occ_image,
+                "metallicRoughnessTexture": mr_image
+            }
+            if export_native(save_file, material, native_images, do_optimize, native_compression):
+                return
+            if native_compression is not None:
+                print("Native writer not available for this scene, using Draco compression")
+        if do_optimize:
+            for mesh_obj in bpy.data.objects:
+                if mesh_obj.type == 'MESH':
+                    optimize_faces(mesh_obj)
         bpy.ops.export_scene.gltf(filepath=save_file, check_existing=False, export_materials="EXPORT", \
             export_format=output_format, export_draco_mesh_compression_enable=do_compress, export_draco_mesh_compression_level=args.compression_level, \
             export_image_format=image_format)
@@ -0,0 +1,510 @@
+import sys
+import os
+import json
+import time
+import gzip
+import struct
+import argparse
+import numpy as np
+
+import MeshoptEncoder
+
+# Minimal glTF 2.0 binary (GLB) writer for the single mesh, single PBR material case.
+# All attribute data is written straight from contiguous NumPy arrays, so there is no
+# per-vertex Python work. Works inside Blender (BlenderWebAsset.py) and standalone.
+# Geometry can optionally be quantized (KHR_mesh_quantization) and the vertex and index
+# buffers encoded with the meshoptimizer codecs (EXT_meshopt_compression).
+
+GLB_MAGIC = 0x46546C67
+GLB_VERSION = 2
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+COMPONENT_TYPES = {
+    np.dtype(np.int8): 5120,
+    np.dtype(np.uint8): 5121,
+    np.dtype(np.int16): 5122,
+    np.dtype(np.uint16): 5123,
+    np.dtype(np.uint32): 5125,
+    np.dtype(np.float32): 5126
+}
+ACCESSOR_TYPES = { 1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4" }
+
+QUANTIZATION_EXTENSION = "KHR_mesh_quantization"
+MESHOPT_EXTENSION = "EXT_meshopt_compression"
+
+# geometry compression methods of write_glb (None writes plain float attributes)
+COMPRESSION_METHODS = [None, "quantize", "meshopt"]
+
+# same position precision as the Blender exporter's Draco default
+POSITION_BITS = 14
+
+# material texture slots, same channel conventions as BlenderWebAsset.py:
+# occlusion in red, roughness in green, metallic in blue (occlusion may share the metal/rough image)
+TEXTURE_SLOTS = ['baseColorTexture', 'metallicRoughnessTexture', 'occlusionTexture', 'normalTexture', 'emissiveTexture']
+
+def align4(n):
+    return (n + 3) & ~3
+
+def image_mime_type(data):
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return "image/png"
+    if data[:2] == b'\xff\xd8':
+        return "image/jpeg"
+    return None
+
+class GLBBuilder:
+    def __init__(self):
+        self.gltf = {
+            "asset": { "version": "2.0", "generator": "Cook GLBWriter" },
+            "buffers": [],
+            "bufferViews": [],
+            "accessors": []
+        }
+        self.chunks = []
+        self.byte_length = 0
+        # with meshopt compression, the uncompressed layout lives in a fallback buffer without data
+        self.meshopt = False
+        self.fallback_length = 0
+
+    def use_extension(self, name, required=True):
+        if name not in self.gltf.setdefault("extensionsUsed", []):
+            self.gltf["extensionsUsed"].append(name)
+        if required and name not in self.gltf.setdefault("extensionsRequired", []):
+            self.gltf["extensionsRequired"].append(name)
+
+    def add_buffer_view(self, data, target=None, byte_stride=None):
+        view = memoryview(data).cast('B')
+        offset = self.byte_length
+        self.chunks.append((offset, view))
+        self.byte_length = align4(offset + view.nbytes)
+        buffer_view = { "buffer": 0, "byteOffset": offset, "byteLength": view.nbytes }
+        if target is not None:
+            buffer_view["target"] = target
+        if byte_stride is not None:
+            buffer_view["byteStride"] = byte_stride
+        self.gltf["bufferViews"].append(buffer_view)
+        return len(self.gltf["bufferViews"]) - 1
+
+    # buffer view stored with the meshoptimizer codecs: attributes (count x byte_stride) with the
+    # vertex codec, indices with the index sequence codec
+    def add_meshopt_buffer_view(self, data, target, byte_stride):
+        data = np.ascontiguousarray(data)
+        count = data.shape[0]
+        if target == ELEMENT_ARRAY_BUFFER:
+            mode = "INDICES"
+            encoded = MeshoptEncoder.encode_index_sequence(data)
+        else:
+            mode = "ATTRIBUTES"
+            encoded = MeshoptEncoder.encode_vertex_buffer(data, byte_stride)
+
+        offset = self.byte_length
+        self.chunks.append((offset, memoryview(encoded)))
+        self.byte_length = align4(offset + len(encoded))
+        fallback_offset = self.fallback_length
+        self.fallback_length = align4(fallback_offset + data.nbytes)
+
+        buffer_view = { "buffer": 1, "byteOffset": fallback_offset, "byteLength": data.nbytes, "target": target }
+        if mode == "ATTRIBUTES":
+            buffer_view["byteStride"] = byte_stride
+        buffer_view["extensions"] = { MESHOPT_EXTENSION: {
+            "buffer": 0,
+            "byteOffset": offset,
+            "byteLength": len(encoded),
+            "byteStride": byte_stride,
+            "count": count,
+            "mode": mode
+        }}
+        self.gltf["bufferViews"].append(buffer_view)
+        return len(self.gltf["bufferViews"]) - 1
+
+    # byte_stride pads each element, quantized attributes must start on 4 byte boundaries
+    def add_accessor(self, array, target=ARRAY_BUFFER, with_bounds=False, normalized=False, byte_stride=None):
+        array = np.ascontiguousarray(array)
+        if array.dtype.byteorder == '>':
+            array = array.astype(array.dtype.newbyteorder('<'))
+        components = 1 if array.ndim == 1 else array.shape[1]
+        element_size = array.itemsize * components
+        data = array
+        if byte_stride is not None and byte_stride != element_size:
+            data = np.zeros((array.shape[0], byte_stride), dtype=np.uint8)
+            data[:, :element_size] = array.reshape(array.shape[0], components).view(np.uint8)
+
+        if self.meshopt:
+            buffer_view = self.add_meshopt_buffer_view(data, target, byte_stride or element_size)
+        else:
+            buffer_view = self.add_buffer_view(data, target, byte_stride)
+        accessor = {
+            "bufferView": buffer_view,
+            "componentType": COMPONENT_TYPES[array.dtype],
+            "count": int(array.shape[0]),
+            "type": ACCESSOR_TYPES[components]
+        }
+        if normalized:
+            accessor["normalized"] = True
+        if with_bounds and array.shape[0] > 0:
+            bounds = array.reshape(array.shape[0], components)
+            accessor["min"] = bounds.min(axis=0).tolist()
+            accessor["max"] = bounds.max(axis=0).tolist()
+        self.gltf["accessors"].append(accessor)
+        return len(self.gltf["accessors"]) - 1
+
+    def add_image(self, data, name=None):
+        mime_type = image_mime_type(data)
+        if mime_type is None:
+            raise ValueError("unsupported image format for GLB embedding: " + str(name))
+        image = { "bufferView": self.add_buffer_view(data), "mimeType": mime_type }
+        if name:
+            image["name"] = name
+        self.gltf.setdefault("images", []).append(image)
+        self.gltf.setdefault("textures", []).append({ "source": len(self.gltf["images"]) - 1 })
+        return len(self.gltf["textures"]) - 1
+
+    def write(self, path):
+        self.gltf["buffers"] = [{ "byteLength": self.byte_length }]
+        if self.fallback_length > 0:
+            self.gltf["buffers"].append({ "byteLength": self.fallback_length, "extensions": { MESHOPT_EXTENSION: { "fallback": True }}})
+        json_data = json.dumps(self.gltf, separators=(',', ':')).encode('utf-8')
+        json_length = align4(len(json_data))
+        total_length = 12 + 8 + json_length + 8 + self.byte_length
+
+        with open(path, 'wb') as f:
+            f.write(struct.pack('<III', GLB_MAGIC, GLB_VERSION, total_length))
+            f.write(struct.pack('<II', json_length, CHUNK_JSON))
+            f.write(json_data + b' ' * (json_length - len(json_data)))
+            f.write(struct.pack('<II', self.byte_length, CHUNK_BIN))
+            position = 0
+            for offset, view in self.chunks:
+                if offset > position:
+                    f.write(b'\0' * (offset - position))
+                f.write(view)
+                position = offset + view.nbytes
+            f.write(b'\0' * (self.byte_length - position))
+
+        return total_length
+
+# material: dict with optional entries
+#   name, baseColorFactor, metallicFactor, roughnessFactor, emissiveFactor, alphaMode, doubleSided,
+#   and for each entry in TEXTURE_SLOTS encoded image bytes (PNG/JPEG). Identical image objects are stored once.
+def build_material(builder, material):
+    pbr = {}
+    result = { "name": material.get("name", "material"), "pbrMetallicRoughness": pbr }
+    textures = {}
+
+    def texture_index(slot):
+        data = material.get(slot)
+        if data is None:
+            return None
+        key = id(data)
+        if key not in textures:
+            textures[key] = builder.add_image(data, material.get("name", "material") + "_" + slot)
+        return textures[key]
+
+    if "baseColorFactor" in material:
+        pbr["baseColorFactor"] = list(material["baseColorFactor"])
+    pbr["metallicFactor"] = material.get("metallicFactor", 1.0)
+    pbr["roughnessFactor"] = material.get("roughnessFactor", 1.0)
+
+    idx = texture_index("baseColorTexture")
+    if idx is not None:
+        pbr["baseColorTexture"] = { "index": idx }
+    idx = texture_index("metallicRoughnessTexture")
+    if idx is not None:
+        pbr["metallicRoughnessTexture"] = { "index": idx }
+        pbr["metallicFactor"] = 1.0
+        pbr["roughnessFactor"] = 1.0
+    idx = texture_index("occlusionTexture")
+    if idx is not None:
+        result["occlusionTexture"] = { "index": idx }
+    idx = texture_index("normalTexture")
+    if idx is not None:
+        result["normalTexture"] = { "index": idx }
+    idx = texture_index("emissiveTexture")
+    if idx is not None:
+        result["emissiveTexture"] = { "index": idx }
+        result["emissiveFactor"] = list(material.get("emissiveFactor", (1.0, 1.0, 1.0)))
+    elif "emissiveFactor" in material:
+        result["emissiveFactor"] = list(material["emissiveFactor"])
+
+    if material.get("alphaMode", "OPAQUE") != "OPAQUE":
+        result["alphaMode"] = material["alphaMode"]
+    if material.get("doubleSided", False):
+        result["doubleSided"] = True
+
+    if textures:
+        builder.gltf.setdefault("samplers", []).append({ "magFilter": 9729, "minFilter": 9987, "wrapS": 10497, "wrapT": 10497 })
+        for texture in builder.gltf["textures"]:
+            texture["sampler"] = len(builder.gltf["samplers"]) - 1
+
+    builder.gltf.setdefault("materials", []).append(result)
+    return len(builder.gltf["materials"]) - 1
+
+# KHR_mesh_quantization attribute formats: positions as integers on a grid with the given number of
+# bits (the dequantization scale and offset go on the node), normals as normalized bytes and texture
+# coordinates as normalized shorts if they are within [0, 1]. returns the arrays and the node transform.
+def quantize_attributes(positions, normals=None, uvs=None, position_bits=POSITION_BITS):
+    lower = positions.min(axis=0).astype(np.float64) if positions.shape[0] > 0 else np.zeros(3)
+    extent = float((positions.max(axis=0) - lower).max()) if positions.shape[0] > 0 else 0.0
+    extent = max(extent, 1e-30)
+    # one scale for all axes, so the node transform doesn't affect normals
+    scale = ((1 << position_bits) - 1) / extent
+    positions = np.round((positions - lower) * scale).astype(np.uint16)
+    node = { "translation": lower.tolist(), "scale": [1.0 / scale] * 3 }
+
+    if normals is not None:
+        normals = np.round(np.clip(normals, -1.0, 1.0) * 127.0).astype(np.int8)
+    if uvs is not None and uvs.shape[0] > 0 and uvs.min() >= 0.0 and uvs.max() <= 1.0:
+        uvs = np.round(uvs * 65535.0).astype(np.uint16)
+
+    return positions, normals, uvs, node
+
+# Write a single mesh GLB file. positions (N x 3), normals (N x 3) and uvs (N x 2) are float arrays
+# in glTF conventions (Y up, V pointing down), indices is a flat or (M x 3) triangle index array.
+# compression is one of COMPRESSION_METHODS: "quantize" stores quantized attributes,
+# "meshopt" additionally encodes the vertex and index buffers with the meshoptimizer codecs.
+def write_glb(path, positions, indices, normals=None, uvs=None, material=None, name="mesh", compression=None):
+    if compression not in COMPRESSION_METHODS:
+        raise ValueError("unknown compression method: " + str(compression))
+    builder = GLBBuilder()
+    node = { "name": name, "mesh": 0 }
+
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+    indices = np.asarray(indices).reshape(-1)
+    index_type = np.uint16 if positions.shape[0] <= 0xFFFF else np.uint32
+    if normals is not None:
+        normals = np.asarray(normals, dtype=np.float32).reshape(-1, 3)
+    if uvs is not None:
+        uvs = np.asarray(uvs, dtype=np.float32).reshape(-1, 2)
+
+    if compression is None:
+        attributes = { "POSITION": builder.add_accessor(positions, with_bounds=True) }
+        if normals is not None:
+            attributes["NORMAL"] = builder.add_accessor(normals)
+        if uvs is not None:
+            attributes["TEXCOORD_0"] = builder.add_accessor(uvs)
+    else:
+        builder.use_extension(QUANTIZATION_EXTENSION)
+        if compression == "meshopt":
+            builder.use_extension(MESHOPT_EXTENSION)
+            builder.meshopt = True
+        positions, normals, uvs, transform = quantize_attributes(positions, normals, uvs)
+        node.update(transform)
+        attributes = { "POSITION": builder.add_accessor(positions, with_bounds=True, byte_stride=8) }
+        if normals is not None:
+            attributes["NORMAL"] = builder.add_accessor(normals, normalized=True, byte_stride=4)
+        if uvs is not None:
+            attributes["TEXCOORD_0"] = builder.add_accessor(uvs, normalized=uvs.dtype == np.uint16)
+
+    primitive = {
+        "attributes": attributes,
+        "indices": builder.add_accessor(indices.astype(index_type, copy=False), target=ELEMENT_ARRAY_BUFFER),
+        "mode": 4
+    }
+    if material is not None:
+        primitive["material"] = build_material(builder, material)
+
+    builder.gltf["meshes"] = [{ "name": name, "primitives": [primitive] }]
+    builder.gltf["nodes"] = [node]
+    builder.gltf["scenes"] = [{ "nodes": [0] }]
+    builder.gltf["scene"] = 0
+
+    return builder.write(path)
+
+# read the JSON and binary chunks of a GLB file
+def read_glb(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, length = struct.unpack_from('<III', data, 0)
+    if magic != GLB_MAGIC:
+        raise ValueError("not a GLB file: " + path)
+    json_length, chunk_type = struct.unpack_from('<II', data, 12)
+    gltf = json.loads(data[20:20 + json_length].decode('utf-8'))
+    binary = b''
+    if 20 + json_length < length:
+        bin_length, chunk_type = struct.unpack_from('<II', data, 20 + json_length)
+        binary = data[28 + json_length:28 + json_length + bin_length]
+    return gltf, binary
+
+# regular grid test mesh with roughly the requested number of triangles
+def grid_mesh(triangle_count):
+    size = max(2, int(np.sqrt(triangle_count / 2)) + 1)
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, size, dtype=np.float32), np.linspace(0.0, 1.0, size, dtype=np.float32))
+    uvs = np.stack((u.ravel(), v.ravel()), axis=1)
+    positions = np.stack((uvs[:, 0], 0.05 * np.sin(uvs[:, 0] * 40.0) * np.cos(uvs[:, 1] * 40.0), uvs[:, 1]), axis=1).astype(np.float32)
+    normals = np.zeros_like(positions)
+    normals[:, 1] = 1.0
+
+    quad = np.arange(size * size, dtype=np.uint32).reshape(size, size)[:-1, :-1].ravel()
+    indices = np.stack((quad, quad + size, quad + 1, quad + 1, quad + size, quad + size + 1), axis=1)
+    return positions, normals, uvs, indices.reshape(-1, 3)
+
+# build the test mesh in Blender (glTF Y up -> Blender Z up), selected and active
+def create_blender_mesh(positions, uvs, indices):
+    import bpy
+
+    mesh = bpy.data.meshes.new("benchmark")
+    mesh.vertices.add(positions.shape[0])
+    mesh.vertices.foreach_set("co", np.stack((positions[:, 0], -positions[:, 2], positions[:, 1]), axis=1).ravel())
+    mesh.loops.add(indices.size)
+    mesh.loops.foreach_set("vertex_index", indices.ravel().astype(np.int32))
+    mesh.polygons.add(indices.shape[0])
+    mesh.polygons.foreach_set("loop_start", np.arange(0, indices.size, 3, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(indices.shape[0], 3, dtype=np.int32))
+    uv_layer = mesh.uv_layers.new(name="UVMap")
+    loop_uvs = uvs[indices.ravel()].copy()
+    loop_uvs[:, 1] = 1.0 - loop_uvs[:, 1]
+    uv_layer.data.foreach_set("uv", loop_uvs.ravel())
+    mesh.update()
+    mesh.validate()
+    obj = bpy.data.objects.new("benchmark", mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    bpy.ops.object.select_all(action='DESELECT')
+    obj.select_set(True)
+    bpy.context.view_layer.objects.active = obj
+    bpy.ops.object.shade_smooth()
+    return obj
+
+def benchmark(triangle_count, output_dir, repeat):
+    positions, normals, uvs, indices = grid_mesh(triangle_count)
+    results = {
+        "numVertices": int(positions.shape[0]),
+        "numTriangles": int(indices.shape[0])
+    }
+
+    path = os.path.join(output_dir, "_benchmark_native.glb")
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        write_glb(path, positions, indices, normals, uvs, { "name": "benchmark", "roughnessFactor": 0.6, "metallicFactor": 0.0 })
+        timings.append(time.perf_counter() - start)
+    results["native"] = { "seconds": min(timings), "bytes": os.path.getsize(path) }
+    os.remove(path)
+
+    try:
+        import bpy
+    except ImportError:
+        bpy = None
+
+    if bpy is not None:
+        create_blender_mesh(positions, uvs, indices)
+        path = os.path.join(output_dir, "_benchmark_blender.glb")
+        timings = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            bpy.ops.export_scene.gltf(filepath=path, check_existing=False, export_format='GLB', use_selection=True)
+            timings.append(time.perf_counter() - start)
+        results["blender"] = { "seconds": min(timings), "bytes": os.path.getsize(path) }
+        results["speedup"] = results["blender"]["seconds"] / max(results["native"]["seconds"], 1e-9)
+        os.remove(path)
+
+    return results
+
+# decode all meshopt compressed buffer views of a GLB file with the meshoptimizer module
+def decode_meshopt(path, meshoptimizer):
+    gltf, binary = read_glb(path)
+    for buffer_view in gltf["bufferViews"]:
+        extension = buffer_view.get("extensions", {}).get(MESHOPT_EXTENSION)
+        if extension is None:
+            continue
+        data = binary[extension["byteOffset"]:extension["byteOffset"] + extension["byteLength"]]
+        if extension["mode"] == "INDICES":
+            meshoptimizer.decode_index_sequence(extension["count"], extension["byteStride"], data)
+        else:
+            meshoptimizer.decode_vertex_buffer(extension["count"], extension["byteStride"], data)
+
+def best_time(function, repeat):
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+# Compare the geometry compression methods: encode time, file size (raw and gzipped, as served)
+# and decode time. Decoding is timed with the meshoptimizer and DracoPy modules if they are installed;
+# inside Blender the Draco path of the stock glTF exporter is timed as well (its import time includes scene setup).
+def compression_benchmark(triangle_count, output_dir, repeat):
+    positions, normals, uvs, indices = grid_mesh(triangle_count)
+    results = {
+        "numVertices": int(positions.shape[0]),
+        "numTriangles": int(indices.shape[0])
+    }
+
+    try:
+        import meshoptimizer
+    except ImportError:
+        meshoptimizer = None
+    try:
+        import DracoPy
+    except ImportError:
+        DracoPy = None
+    try:
+        import bpy
+    except ImportError:
+        bpy = None
+
+    for compression in COMPRESSION_METHODS:
+        key = compression or "none"
+        path = os.path.join(output_dir, "_benchmark_" + key + ".glb")
+        seconds = best_time(lambda: write_glb(path, positions, indices, normals, uvs, compression=compression), repeat)
+        with open(path, 'rb') as f:
+            data = f.read()
+        result = { "encodeSeconds": seconds, "bytes": len(data), "gzipBytes": len(gzip.compress(data)) }
+        if compression == "meshopt" and meshoptimizer is not None:
+            result["decodeSeconds"] = best_time(lambda: decode_meshopt(path, meshoptimizer), repeat)
+        results[key] = result
+        os.remove(path)
+
+    # Draco with the Blender exporter defaults (14 bit positions, 10 bit normals, 12 bit texture coordinates)
+    if DracoPy is not None:
+        encoded = []
+        seconds = best_time(lambda: encoded.append(DracoPy.encode(positions, indices, quantization_bits=14, compression_level=6,
+            tex_coord=uvs.astype(np.float64), normals=normals.astype(np.float64), tex_coord_quantization_bits=12, normal_quantization_bits=10)), repeat)
+        data = encoded[-1]
+        results["draco"] = {
+            "encodeSeconds": seconds,
+            "bytes": len(data),
+            "gzipBytes": len(gzip.compress(data)),
+            "decodeSeconds": best_time(lambda: DracoPy.decode(data), repeat)
+        }
+
+    if bpy is not None:
+        obj = create_blender_mesh(positions, uvs, indices)
+        path = os.path.join(output_dir, "_benchmark_blender_draco.glb")
+        seconds = best_time(lambda: bpy.ops.export_scene.gltf(filepath=path, check_existing=False, export_format='GLB',
+            use_selection=True, export_draco_mesh_compression_enable=True, export_draco_mesh_compression_level=6), repeat)
+        with open(path, 'rb') as f:
+            data = f.read()
+        bpy.data.objects.remove(obj)
+        start = time.perf_counter()
+        bpy.ops.import_scene.gltf(filepath=path)
+        results["blenderDraco"] = {
+            "encodeSeconds": seconds,
+            "bytes": len(data),
+            "gzipBytes": len(gzip.compress(data)),
+            "importSeconds": time.perf_counter() - start
+        }
+        os.remove(path)
+
+    return results
+
+if __name__ == "__main__":
+    # inside Blender, script arguments follow "--"
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
+
+    # standalone use runs the benchmark, within Blender it also times the stock glTF exporter
+    parser = argparse.ArgumentParser(description="Native single-mesh GLB writer and geometry compression benchmark")
+    parser.add_argument("-t", "--triangles", required=False, default=2000000, type=int, help="Benchmark triangle count")
+    parser.add_argument("-r", "--repeat", required=False, default=3, type=int, help="Benchmark repetitions")
+    parser.add_argument("-d", "--directory", required=False, default=".", help="Directory for benchmark files")
+    parser.add_argument("-c", "--compression", required=False, default=False, action="store_true", help="Benchmark geometry compression methods")
+    args = parser.parse_known_args(argv)[0]
+
+    if args.compression:
+        print("JSON=" + json.dumps(compression_benchmark(args.triangles, args.directory, args.repeat)))
+    else:
+        print("JSON=" + json.dumps(benchmark(args.triangles, args.directory, args.repeat)))
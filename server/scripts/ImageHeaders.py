@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import struct
+import argparse
+
+# Image dimensions, channels and bit depth from JPEG, PNG, TIFF and OpenEXR headers, without decoding
+# pixels. Works on files and on in-memory data (packed Blender images, GLB buffer views), reading only
+# as many bytes as the header needs. Used by BlenderInspectMesh.py for texture statistics.
+
+# bytes read from the start of a file at first, more only if a JPEG frame header comes later
+HEADER_BYTES = 65536
+
+# viewers upload textures as RGBA with a full mipmap chain (4/3 of the base level)
+GPU_CHANNELS = 4
+MIPMAP_FACTOR = 4.0 / 3.0
+
+PNG_CHANNELS = { 0: 1, 2: 3, 3: 3, 4: 2, 6: 4 }
+
+# bits per channel of OpenEXR pixel types: uint, half, float
+EXR_PIXEL_BITS = { 0: 32, 1: 16, 2: 32 }
+
+def png_header(data):
+    if len(data) < 29 or data[12:16] != b"IHDR":
+        return None
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", data[16:26])
+    # palette images are decoded to 8 bit RGB
+    return { "format": "png", "width": width, "height": height, "channels": PNG_CHANNELS.get(color_type, 4),
+        "bitDepth": 8 if color_type == 3 else bit_depth }
+
+# frame header (SOFn) of a JPEG stream. returns None if it isn't within the data.
+def jpeg_header(data):
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker in (0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7):
+            position += 2
+            continue
+        length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        # SOF0 - SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if position + 10 > len(data):
+                return None
+            precision, height, width, components = struct.unpack(">BHHB", data[position + 4:position + 10])
+            return { "format": "jpeg", "width": width, "height": height, "channels": components, "bitDepth": precision }
+        if marker == 0xDA:
+            return None
+        position += 2 + length
+    return None
+
+# first image file directory of a TIFF file
+def tiff_header(data):
+    endian = "<" if data[:2] == b"II" else ">"
+    if len(data) < 8:
+        return None
+    offset = struct.unpack(endian + "I", data[4:8])[0]
+    if offset + 2 > len(data):
+        return None
+    count = struct.unpack(endian + "H", data[offset:offset + 2])[0]
+    sizes = { 1: 1, 3: 2, 4: 4 }
+    formats = { 1: "B", 3: "H", 4: "I" }
+    tags = {}
+    for index in range(count):
+        entry = offset + 2 + index * 12
+        if entry + 12 > len(data):
+            break
+        tag, kind, values = struct.unpack(endian + "HHI", data[entry:entry + 8])
+        if kind not in sizes:
+            continue
+        # values that don't fit into the entry are stored elsewhere, only the first one is needed
+        position = entry + 8 if sizes[kind] * values <= 4 else struct.unpack(endian + "I", data[entry + 8:entry + 12])[0]
+        if position + sizes[kind] <= len(data):
+            tags[tag] = struct.unpack(endian + formats[kind], data[position:position + sizes[kind]])[0]
+    if 256 not in tags or 257 not in tags:
+        return None
+    return { "format": "tiff", "width": tags[256], "height": tags[257], "channels": tags.get(277, 1), "bitDepth": tags.get(258, 1) }
+
+# dataWindow and channel list attributes of an OpenEXR header
+def exr_header(data):
+    position = 8
+    channels, bits, window = 0, 0, None
+    while position < len(data):
+        end = data.find(b"\0", position)
+        if end < 0 or end == position:
+            break
+        name = data[position:end]
+        type_end = data.find(b"\0", end + 1)
+        if type_end < 0 or type_end + 5 > len(data):
+            break
+        size = struct.unpack("<i", data[type_end + 1:type_end + 5])[0]
+        value = data[type_end + 5:type_end + 5 + size]
+        if name == b"dataWindow" and len(value) == 16:
+            window = struct.unpack("<iiii", value)
+        elif name == b"channels":
+            # channel names with pixel type, linearity and sampling, terminated by an empty name
+            offset = 0
+            while offset < len(value) and value[offset] != 0:
+                name_end = value.find(b"\0", offset)
+                pixel_type = struct.unpack("<i", value[name_end + 1:name_end + 5])[0]
+                bits = max(bits, EXR_PIXEL_BITS.get(pixel_type, 16))
+                channels += 1
+                offset = name_end + 17
+        position = type_end + 5 + size
+    if window is None:
+        return None
+    return { "format": "exr", "width": window[2] - window[0] + 1, "height": window[3] - window[1] + 1, "channels": channels, "bitDepth": bits or 16 }
+
+def parse_header(data):
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return png_header(data)
+    if data[:2] == b"\xff\xd8":
+        return jpeg_header(data)
+    if data[:4] in (b"II*\0", b"MM\0*"):
+        return tiff_header(data)
+    if data[:4] == b"\x76\x2f\x31\x01":
+        return exr_header(data)
+    return None
+
+# header of an image given as encoded bytes or a file path, with decoded and GPU memory estimates.
+# returns None for unknown formats, missing files or truncated headers.
+def read_image_header(source, encoded_size=None):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+        header = parse_header(data)
+        encoded_size = len(data) if encoded_size is None else encoded_size
+    else:
+        if not os.path.isfile(source):
+            return None
+        encoded_size = os.path.getsize(source)
+        with open(source, "rb") as f:
+            data = f.read(HEADER_BYTES)
+            header = parse_header(data)
+            # JPEG frame headers can follow large EXIF or ICC segments
+            if header is None and data[:2] == b"\xff\xd8" and encoded_size > len(data):
+                header = parse_header(data + f.read())
+    if header is None:
+        return None
+    return image_memory(header, encoded_size)
+
+def image_memory(header, encoded_size):
+    pixels = header["width"] * header["height"]
+    bytes_per_channel = max(header["bitDepth"], 8) // 8
+    header["encodedBytes"] = encoded_size
+    header["decodedBytes"] = pixels * header["channels"] * header["bitDepth"] // 8
+    header["gpuBytes"] = int(pixels * GPU_CHANNELS * bytes_per_channel * MIPMAP_FACTOR)
+    return header
+
+# headers of the images stored in GLB buffer views, by image index. only the header bytes of each
+# view are read from the file.
+def glb_image_headers(path):
+    with open(path, "rb") as f:
+        magic, version, length = struct.unpack("<III", f.read(12))
+        if magic != 0x46546C67:
+            return {}
+        json_length, chunk_type = struct.unpack("<II", f.read(8))
+        gltf = json.loads(f.read(json_length).decode("utf-8"))
+        binary_start = 20 + json_length + 8
+
+        headers = {}
+        for index, image in enumerate(gltf.get("images", [])):
+            if "bufferView" not in image:
+                continue
+            view = gltf["bufferViews"][image["bufferView"]]
+            f.seek(binary_start + view.get("byteOffset", 0))
+            data = f.read(min(view["byteLength"], HEADER_BYTES))
+            header = parse_header(data)
+            if header is None and data[:2] == b"\xff\xd8" and view["byteLength"] > len(data):
+                header = parse_header(data + f.read(view["byteLength"] - len(data)))
+            if header is not None:
+                header = image_memory(header, view["byteLength"])
+                header["name"] = image.get("name")
+                headers[index] = header
+    return headers
+
+#scene totals of texture statistics
+def texture_totals(textures):
+    return {
+        "textureEncodedBytes": sum(texture.get("encodedBytes", 0) for texture in textures),
+        "textureDecodedBytes": sum(texture.get("decodedBytes", 0) for texture in textures),
+        "textureGPUBytes": sum(texture.get("gpuBytes", 0) for texture in textures)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print image header statistics")
+    parser.add_argument("-i", "--inputs", required=True, nargs="+", help="Image or GLB files")
+    args = parser.parse_args(sys.argv[1:])
+
+    textures = []
+    for path in args.inputs:
+        if path.lower().endswith(".glb"):
+            textures.extend(glb_image_headers(path).values())
+        else:
+            header = read_image_header(path)
+            if header is not None:
+                header["name"] = os.path.basename(path)
+                textures.append(header)
+    report = texture_totals(textures)
+    report["textures"] = textures
+    print("JSON=" + json.dumps(report))
@@ -0,0 +1,407 @@
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from MeshRasterizer import covered_pixels
+from MeshCleanup import DEGENERATE_RATIO, weld_vertices, connected_components
+
+# Mesh analysis for the inspection report, on whole arrays: positions (n, 3), triangles (m, 3) and per
+# corner texture coordinates (m, 3, 2) as pulled from Blender with foreach_get (BlenderInspectMesh.py).
+# UV layout: the 0-1 square is rasterized at a low resolution, counting the triangles covering each cell
+# for coverage and overlap. Islands are connected components of UV vertices (mesh vertex plus texture
+# coordinate), found by repeatedly hooking components onto their lowest neighbor.
+# Quality: degenerate faces, duplicate vertices (MeshCleanup's spatial hash), edge counts per unique edge
+# for boundaries and non-manifold edges, histograms of triangle aspect ratio and edge length, surface area
+# and, for closed meshes, volume.
+# Topology: the non-manifold checks of Blender's select_non_manifold (multi-face, inconsistently wound and
+# boundary edges, vertices joining several face fans) and a self intersection test like BVHTree.overlap,
+# with a uniform grid for candidate pairs. These run without Blender, so objects can be analyzed in a
+# process pool (analyze_objects).
+
+# resolution of the UV coverage raster
+COVERAGE_RESOLUTION = 256
+
+# offset of the coverage samples from the cell centers, in cells
+COVERAGE_SAMPLE_OFFSET = (0.0123457, 0.0234568)
+
+# texture coordinates are matched on this grid when splitting vertices into UV vertices
+UV_QUANTIZATION = 2.0 ** -20
+
+# percentiles of texel density distributions (weighted by surface area)
+DENSITY_PERCENTILES = [5, 25, 50, 75, 95]
+
+# vertices closer than this fraction of the bounding box diagonal count as duplicates
+DUPLICATE_DISTANCE_RATIO = 1e-6
+
+# bin edges of the aspect ratio histogram (1 is an equilateral triangle)
+ASPECT_RATIO_BINS = [1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 100.0, np.inf]
+
+# bin edges of the edge length histogram, relative to the median edge length
+EDGE_LENGTH_BINS = [0.0, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 10.0, np.inf]
+
+# triangles intersect if their intersection segment is longer than this (BVHTree epsilon of the inspection)
+INTERSECTION_EPSILON = 1e-6
+
+# candidate triangle pairs tested at a time, and grid entries per triangle before the cells are enlarged
+INTERSECTION_CHUNK = 1 << 20
+GRID_ENTRIES_PER_TRIANGLE = 8
+
+# grid cell size relative to the mean bounding box size of the triangles
+GRID_CELL_SIZE = 1.0
+
+def triangle_areas(corners):
+    if corners.shape[-1] == 2:
+        edges1, edges2 = corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]
+        return 0.5 * (edges1[:, 0] * edges2[:, 1] - edges1[:, 1] * edges2[:, 0])
+    return 0.5 * np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1)
+
+#number of triangles covering each cell of a raster over the 0-1 UV square. cells are sampled slightly off
+#center, so shared edges of grid aligned layouts don't pass exactly through samples and count twice.
+def coverage_raster(uvs, resolution=COVERAGE_RESOLUTION):
+    counts = np.zeros(resolution * resolution, dtype=np.int64)
+    x, y = uvs[:, :, 0] * resolution + COVERAGE_SAMPLE_OFFSET[0], uvs[:, :, 1] * resolution + COVERAGE_SAMPLE_OFFSET[1]
+    for faces, px, py, w0, w1 in covered_pixels(x, y, resolution, resolution):
+        counts += np.bincount(py * resolution + px, minlength=counts.size)
+    return counts.reshape(resolution, resolution)
+
+#UV vertex id of each corner: corners share an id if they share the mesh vertex and texture coordinate
+def uv_vertices(triangles, uvs):
+    quantized = np.round(uvs.reshape(-1, 2) / UV_QUANTIZATION).astype(np.int64)
+    quantized -= quantized.min(axis=0)
+    vertices = triangles.ravel()
+    # one sort key if vertex index and both coordinates fit into 63 bits, else sort by all three
+    bits = [int(value).bit_length() for value in (vertices.max(), quantized[:, 0].max(), quantized[:, 1].max())]
+    change = np.ones(vertices.size, dtype=bool)
+    if sum(bits) <= 63:
+        keys = (vertices << (bits[1] + bits[2])) | (quantized[:, 0] << bits[2]) | quantized[:, 1]
+        order = np.argsort(keys)
+        change[1:] = np.diff(keys[order]) != 0
+    else:
+        order = np.lexsort((quantized[:, 1], quantized[:, 0], vertices))
+        change[1:] = (np.diff(vertices[order]) != 0) | (np.diff(quantized[order, 0]) != 0) | (np.diff(quantized[order, 1]) != 0)
+    ids = np.empty(order.size, dtype=np.int64)
+    ids[order] = np.cumsum(change) - 1
+    return ids.reshape(-1, 3), int(np.count_nonzero(change))
+
+#area weighted percentiles of values
+def weighted_percentiles(values, weights, percentiles):
+    if values.size == 0 or weights.sum() <= 0:
+        return [0.0] * len(percentiles)
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    positions = np.searchsorted(cumulative, np.array(percentiles) / 100.0 * cumulative[-1])
+    return [float(values[order[min(p, order.size - 1)]]) for p in positions]
+
+#texel density (texels per scene unit) for a texture size, scaled from the distribution for a 1x1 texture
+def texel_density(uv_density, width, height):
+    scale = np.sqrt(width * height)
+    return {
+        "resolution": [width, height],
+        "mean": uv_density["mean"] * scale,
+        "percentiles": [value * scale for value in uv_density["percentiles"]]
+    }
+
+#UV layout statistics: coverage and overlap of the 0-1 square, islands, flipped and degenerate triangles,
+#texture coordinates outside 0-1 and the distribution of UV density (sqrt of UV area per surface area)
+def uv_analysis(positions, triangles, uvs, resolution=COVERAGE_RESOLUTION):
+    if triangles.shape[0] == 0:
+        return None
+    uv_area = triangle_areas(uvs)
+    surface_area = triangle_areas(positions[triangles])
+    degenerate = np.abs(uv_area) <= 1e-12
+    outside = ((uvs < 0.0) | (uvs > 1.0)).any(axis=(1, 2))
+
+    counts = coverage_raster(uvs, resolution)
+    covered = np.count_nonzero(counts)
+
+    ids, uv_vertex_count = uv_vertices(triangles, uvs)
+    labels = connected_components(uv_vertex_count, np.concatenate((ids[:, 0], ids[:, 1])), np.concatenate((ids[:, 1], ids[:, 2])))
+
+    valid = (surface_area > 0) & ~degenerate
+    density = np.sqrt(np.abs(uv_area[valid]) / surface_area[valid])
+    total_area = surface_area[valid].sum()
+    return {
+        "coverage": float(covered) / counts.size,
+        "overlap": float(np.count_nonzero(counts > 1)) / covered if covered else 0.0,
+        "numIslands": int(labels.max() + 1) if labels.size else 0,
+        "numFlippedTriangles": int(np.count_nonzero((uv_area < 0) & ~degenerate)),
+        "numDegenerateTriangles": int(np.count_nonzero(degenerate)),
+        "outOfRangeFraction": float(np.count_nonzero(outside)) / triangles.shape[0],
+        "uvArea": float(np.abs(uv_area).sum()),
+        "uvDensity": {
+            "mean": float((density * surface_area[valid]).sum() / total_area) if total_area > 0 else 0.0,
+            "percentiles": weighted_percentiles(density, surface_area[valid], DENSITY_PERCENTILES)
+        }
+    }
+
+#unique edges as sorted vertex pairs, with the number of triangles using each
+def unique_edges(triangles):
+    edges = np.sort(np.concatenate((triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]])), axis=1)
+    keys = edges[:, 0] * (int(triangles.max()) + 1) + edges[:, 1]
+    keys, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    return edges[first], counts
+
+def histogram(values, bins):
+    return { "bins": [float(edge) for edge in bins[:-1]], "counts": np.histogram(values, bins=bins)[0].tolist() }
+
+#geometric quality: degenerate faces, duplicate vertices, boundary and non-manifold edges, aspect ratio and
+#edge length histograms, surface area and (closed meshes only) volume
+def quality_metrics(positions, triangles):
+    if triangles.shape[0] == 0:
+        return None
+    corners = positions[triangles]
+    # (elementwise over the three edges, reducing short rows is slow)
+    l0, l1, l2 = [np.sqrt(((corners[:, (index + 1) % 3] - corners[:, index]) ** 2).sum(axis=1)) for index in range(3)]
+    longest = np.maximum(np.maximum(l0, l1), l2)
+    areas = triangle_areas(corners)
+    degenerate = areas <= DEGENERATE_RATIO * longest * longest
+    # longest edge times perimeter relative to the area, normalized to 1 for equilateral triangles
+    aspect = (longest * (l0 + l1 + l2))[~degenerate] / (4.0 * np.sqrt(3.0) * areas[~degenerate])
+
+    diagonal = float(np.linalg.norm(positions.max(axis=0) - positions.min(axis=0)))
+    remap = weld_vertices(positions, diagonal * DUPLICATE_DISTANCE_RATIO)
+    used = np.zeros(positions.shape[0], dtype=bool)
+    used[triangles.ravel()] = True
+
+    edges, counts = unique_edges(triangles)
+    edge_lengths = np.linalg.norm(positions[edges[:, 1]] - positions[edges[:, 0]], axis=1)
+    median = float(np.median(edge_lengths))
+    boundary = int(np.count_nonzero(counts == 1))
+    non_manifold = int(np.count_nonzero(counts > 2))
+
+    metrics = {
+        "numDegenerateFaces": int(np.count_nonzero(degenerate)),
+        "numZeroAreaFaces": int(np.count_nonzero(areas == 0.0)),
+        "numDuplicateVertices": int(np.count_nonzero(remap != np.arange(remap.size))),
+        "numUnusedVertices": int(np.count_nonzero(~used)),
+        "numBoundaryEdges": boundary,
+        "numNonManifoldEdges": non_manifold,
+        "aspectRatio": histogram(aspect, ASPECT_RATIO_BINS),
+        "edgeLength": {
+            "min": float(edge_lengths.min()),
+            "max": float(edge_lengths.max()),
+            "mean": float(edge_lengths.mean()),
+            "median": median,
+            "histogram": histogram(edge_lengths / median if median > 0 else edge_lengths, EDGE_LENGTH_BINS)
+        },
+        "surfaceArea": float(areas.sum()),
+        "volume": None
+    }
+    if boundary == 0 and non_manifold == 0:
+        # divergence theorem, sums signed tetrahedra from the origin
+        signed = np.einsum("ij,ij->i", corners[:, 0], np.cross(corners[:, 1], corners[:, 2])).sum() / 6.0
+        metrics["volume"] = abs(float(signed))
+    metrics["isClean"] = metrics["numDegenerateFaces"] == 0 and metrics["numDuplicateVertices"] == 0 and non_manifold == 0
+    return metrics
+
+#non-manifold edges and vertices as selected by Blender's select_non_manifold. returns whether the mesh
+#has non-manifold elements other than boundaries, and whether it has boundary edges. loose_edges is the
+#number of edges without faces (wire edges), which aren't part of the triangles.
+def non_manifold(triangles, loose_edges=0):
+    count = triangles.shape[0]
+    if count == 0:
+        return loose_edges > 0, False
+    # directed edges j of all triangles, row j * count + face
+    starts = triangles.T.ravel()
+    ends = triangles[:, [1, 2, 0]].T.ravel()
+    keys = np.minimum(starts, ends) * (int(triangles.max()) + 1) + np.maximum(starts, ends)
+    order = np.argsort(keys, kind="stable")
+    change = np.ones(order.size, dtype=bool)
+    change[1:] = np.diff(keys[order]) != 0
+    group_starts = np.flatnonzero(change)
+    sizes = np.diff(np.append(group_starts, order.size))
+    has_boundary = bool((sizes == 1).any())
+    if loose_edges > 0 or (sizes > 2).any():
+        return True, has_boundary
+
+    # edges shared by two faces must be traversed in opposite directions
+    first, second = order[group_starts[sizes == 2]], order[group_starts[sizes == 2] + 1]
+    if (starts[first] == starts[second]).any():
+        return True, has_boundary
+
+    # corners (face * 3 + j) around a vertex are joined across shared edges, every vertex must end up
+    # with a single fan
+    first_face, first_edge = first % count, first // count
+    second_face, second_edge = second % count, second // count
+    labels = connected_components(3 * count,
+        np.concatenate((first_face * 3 + first_edge, first_face * 3 + (first_edge + 1) % 3)),
+        np.concatenate((second_face * 3 + (second_edge + 1) % 3, second_face * 3 + second_edge)))
+    vertices = triangles.ravel()
+    fans = np.unique(vertices * (int(labels.max()) + 1) + labels).size
+    return fans != np.unique(vertices).size, has_boundary
+
+#interval of a triangle on the intersection line of two planes, from the signed distances of its corners
+#to the other plane and the corners projected onto the line
+def plane_interval(distances, projected):
+    points = [np.where(distances == 0, projected, np.nan)]
+    for i, j in ((0, 1), (1, 2), (2, 0)):
+        di, dj = distances[:, i], distances[:, j]
+        crossing = di * dj < 0
+        t = projected[:, i] + (projected[:, j] - projected[:, i]) * di / np.where(crossing, di - dj, 1.0)
+        points.append(np.where(crossing, t, np.nan)[:, None])
+    points = np.concatenate(points, axis=1)
+    return np.nanmin(points, axis=1), np.nanmax(points, axis=1)
+
+#whether triangle pairs a[i], b[i] (k, 3, 3) intersect in a segment longer than epsilon. coplanar pairs
+#don't count, as in Blender's triangle intersection test.
+def triangles_intersect(a, b, epsilon=INTERSECTION_EPSILON):
+    normals_a = np.cross(a[:, 1] - a[:, 0], a[:, 2] - a[:, 0])
+    normals_b = np.cross(b[:, 1] - b[:, 0], b[:, 2] - b[:, 0])
+    distances_a = np.einsum("ijk,ik->ij", a - b[:, None, 0], normals_b)
+    distances_b = np.einsum("ijk,ik->ij", b - a[:, None, 0], normals_a)
+    line = np.cross(normals_a, normals_b)
+    length = np.linalg.norm(line, axis=1)
+
+    # each triangle must touch the plane of the other one
+    candidates = (length > 0) & (distances_a.min(axis=1) <= 0) & (distances_a.max(axis=1) >= 0) \
+        & (distances_b.min(axis=1) <= 0) & (distances_b.max(axis=1) >= 0)
+    if not candidates.any():
+        return np.zeros(a.shape[0], dtype=bool)
+    a, b, line = a[candidates], b[candidates], line[candidates] / length[candidates, None]
+    with np.errstate(invalid="ignore"):
+        min_a, max_a = plane_interval(distances_a[candidates], np.einsum("ijk,ik->ij", a, line))
+        min_b, max_b = plane_interval(distances_b[candidates], np.einsum("ijk,ik->ij", b, line))
+    result = np.zeros(candidates.size, dtype=bool)
+    result[candidates] = np.minimum(max_a, max_b) - np.maximum(min_a, min_b) > epsilon
+    return result
+
+#whether any two triangles not sharing a vertex intersect. triangles are binned into a uniform grid by
+#their bounding boxes, each pair is tested in the cell holding the larger of the two minimum corners only.
+def self_intersecting(positions, triangles, epsilon=INTERSECTION_EPSILON):
+    count = triangles.shape[0]
+    if count < 2:
+        return False
+    corners = positions[triangles]
+    lower = np.minimum(np.minimum(corners[:, 0], corners[:, 1]), corners[:, 2])
+    upper = np.maximum(np.maximum(corners[:, 0], corners[:, 1]), corners[:, 2])
+    origin = lower.min(axis=0)
+    cell = max(GRID_CELL_SIZE * float((upper - lower).max(axis=1).mean()), 1e-12)
+    while True:
+        first = np.floor((lower - origin) / cell).astype(np.int64)
+        spans = np.floor((upper - origin) / cell).astype(np.int64) - first + 1
+        entries = spans.prod(axis=1)
+        if entries.sum() <= GRID_ENTRIES_PER_TRIANGLE * count:
+            break
+        cell *= 2.0
+    dims = np.floor((upper.max(axis=0) - origin) / cell).astype(np.int64) + 1
+
+    # one entry per triangle and covered cell, sorted by cell
+    faces = np.repeat(np.arange(count), entries)
+    offsets = np.arange(faces.size) - np.repeat(np.cumsum(entries) - entries, entries)
+    span = spans[faces]
+    cells = first[faces] + np.stack((offsets // (span[:, 2] * span[:, 1]), offsets // span[:, 2] % span[:, 1], offsets % span[:, 2]), axis=1)
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    order = np.argsort(keys, kind="stable")
+    faces, keys = faces[order], keys[order]
+    change = np.ones(keys.size, dtype=bool)
+    change[1:] = np.diff(keys) != 0
+    group_ends = np.append(np.flatnonzero(change)[1:], keys.size)
+    partners = np.repeat(group_ends, np.diff(np.append(np.flatnonzero(change), keys.size))) - np.arange(keys.size) - 1
+
+    # pairs of entries within a cell, in chunks of about INTERSECTION_CHUNK
+    cumulative = np.cumsum(partners)
+    start = 0
+    while start < keys.size:
+        stop = max(int(np.searchsorted(cumulative, cumulative[start] - partners[start] + INTERSECTION_CHUNK, side="right")), start + 1)
+        counts = partners[start:stop]
+        left = np.repeat(np.arange(start, stop), counts)
+        right = left + 1 + np.arange(left.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        start = stop
+        fa, fb = faces[left], faces[right]
+
+        # bounding boxes overlap, axis by axis on the remaining pairs (reducing short rows is slow)
+        for axis in range(3):
+            overlap = (lower[fa, axis] <= upper[fb, axis] + epsilon) & (lower[fb, axis] <= upper[fa, axis] + epsilon)
+            fa, fb, left = fa[overlap], fb[overlap], left[overlap]
+        reference = np.floor((np.maximum(lower[fa], lower[fb]) - origin) / cell).astype(np.int64)
+        home = (reference[:, 0] * dims[1] + reference[:, 1]) * dims[2] + reference[:, 2] == keys[left]
+        fa, fb = fa[home], fb[home]
+        ta, tb = triangles[fa], triangles[fb]
+        shared = np.zeros(fa.size, dtype=bool)
+        for i in range(3):
+            for j in range(3):
+                shared |= ta[:, i] == tb[:, j]
+        if (~shared).any() and triangles_intersect(corners[fa[~shared]], corners[fb[~shared]], epsilon).any():
+            return True
+    return False
+
+#per object analysis, run in the pool processes: manifoldness, self intersection, quality and UV layout.
+#job holds the object index, positions, triangles, per corner texture coordinates (or None) and the
+#number of loose edges.
+def object_analysis(job):
+    start = time.perf_counter()
+    positions, triangles, uvs = job["positions"], job["triangles"], job.get("uvs")
+    other, boundary = non_manifold(triangles, job.get("looseEdges", 0))
+    statistics = {
+        "isTwoManifoldUnbounded": not other and not boundary,
+        "isTwoManifoldBounded": not other,
+        "selfIntersecting": self_intersecting(positions, triangles)
+    }
+    statistics["isWatertight"] = statistics["isTwoManifoldUnbounded"] and not statistics["selfIntersecting"]
+    statistics["quality"] = quality_metrics(positions, triangles)
+    if uvs is not None:
+        statistics["uvLayout"] = uv_analysis(positions, triangles, uvs)
+    return { "index": job["index"], "statistics": statistics, "seconds": time.perf_counter() - start }
+
+#runs object_analysis for each job, yielding results as they are done. jobs are handed out largest first
+#to a pool of processes; pool processes are forked, so they inherit the loaded modules (interpreters
+#embedded in Blender can't spawn them). without fork, jobs run one by one in this process.
+def analyze_objects(jobs, processes):
+    jobs = sorted(jobs, key=lambda job: -job["triangles"].shape[0])
+    if processes <= 1 or len(jobs) < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        for job in jobs:
+            yield object_analysis(job)
+        return
+    with multiprocessing.get_context("fork").Pool(min(processes, len(jobs))) as pool:
+        for result in pool.imap_unordered(object_analysis, jobs):
+            yield result
+
+if __name__ == "__main__":
+    # inside Blender, script arguments follow "--"
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
+
+    # standalone use runs the analysis on a grid mesh and reports timing
+    parser = argparse.ArgumentParser(description="Mesh analysis benchmark")
+    parser.add_argument("-t", "--triangles", required=False, default=2000000, type=int, help="Benchmark triangle count")
+    parser.add_argument("-w", "--workers", required=False, default=0, type=int, help="Scaling benchmark of per-object analysis with 1 to this many processes (0: all cores)")
+    parser.add_argument("-n", "--objects", required=False, default=32, type=int, help="Number of objects of the scaling benchmark, sharing the triangle count")
+    args = parser.parse_known_args(argv)[0]
+
+    from GLBWriter import grid_mesh
+    positions, normals, uvs, indices = grid_mesh(args.triangles)
+    triangles = indices.astype(np.int64)
+    # glTF texture coordinates start at the top, Blender's at the bottom
+    uvs[:, 1] = 1.0 - uvs[:, 1]
+    start = time.perf_counter()
+    report = { "uv": uv_analysis(positions.astype(np.float64), triangles, uvs.astype(np.float64)[triangles]) }
+    report["uvSeconds"] = time.perf_counter() - start
+    start = time.perf_counter()
+    report["quality"] = quality_metrics(positions.astype(np.float64), triangles)
+    report["qualitySeconds"] = time.perf_counter() - start
+    start = time.perf_counter()
+    report["nonManifold"] = non_manifold(triangles)
+    report["selfIntersecting"] = self_intersecting(positions.astype(np.float64), triangles)
+    report["topologySeconds"] = time.perf_counter() - start
+    report["numFaces"] = int(triangles.shape[0])
+
+    # objects of varying size, each a grid shifted so they don't intersect
+    jobs = []
+    sizes = np.linspace(0.5, 1.5, args.objects)
+    for index, size in enumerate(sizes):
+        positions, normals, uvs, indices = grid_mesh(int(args.triangles * size / sizes.sum()))
+        uvs[:, 1] = 1.0 - uvs[:, 1]
+        positions = positions.astype(np.float64) + [0.0, 2.0 * index, 0.0]
+        jobs.append({ "index": index, "positions": positions, "triangles": indices.astype(np.int64), "uvs": uvs.astype(np.float64)[indices] })
+    report["scaling"] = []
+    for processes in range(1, (args.workers or os.cpu_count() or 1) + 1):
+        start = time.perf_counter()
+        results = list(analyze_objects(jobs, processes))
+        seconds = time.perf_counter() - start
+        report["scaling"].append({ "processes": processes, "seconds": seconds, "speedup": report["scaling"][0]["seconds"] / seconds if report["scaling"] else 1.0 })
+    print("JSON=" + json.dumps(report))
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import struct
+import hashlib
+import argparse
+import numpy as np
+
+# Content addressed cache of files derived from meshes (Draco decoded GLBs, binary mesh sidecars), in a
+# directory next to the job files. Entries are named by the SHA-256 of the source content and the kind of
+# entry, so steps and repeated runs working on the same content find them whatever the source file is
+# called. Entries are written to a temporary name and renamed, readers never see partial files. Reading
+# an entry touches it, eviction removes the least recently used entries above a size limit.
+# Sidecars hold named arrays and a JSON description: a header (magic, version, JSON length), the JSON,
+# then the arrays at 64 byte aligned offsets, so they can be memory mapped (see BlenderMeshCache.py).
+
+CACHE_DIRECTORY = "cache"
+
+# bytes read at a time when hashing
+HASH_BLOCK = 1 << 22
+
+# size limit of a cache directory, older entries are evicted when a new one is added
+MAX_CACHE_BYTES = 4 << 30
+
+SIDECAR_MAGIC = b"CKMS"
+SIDECAR_VERSION = 1
+SIDECAR_ALIGNMENT = 64
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_directory(source, directory=None):
+    return directory or os.path.join(os.path.dirname(os.path.abspath(source)), CACHE_DIRECTORY)
+
+#path of the cache entry of a kind for a source file, given its hash or hashing it
+def cache_entry(source, kind, extension, directory=None, digest=None):
+    return os.path.join(cache_directory(source, directory), "%s-%s%s" % (digest or file_hash(source), kind, extension))
+
+#temporary path to write an entry to, keeping the extension for writers that pick the format by it
+def temporary_path(entry):
+    base, extension = os.path.splitext(entry)
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    return "%s.%d.tmp%s" % (base, os.getpid(), extension)
+
+#moves a written temporary file into place. concurrent writers of the same entry write the same content.
+def commit_entry(temporary, entry):
+    os.replace(temporary, entry)
+    return entry
+
+#touches an entry, marking it as recently used
+def touch_entry(entry):
+    os.utime(entry)
+
+#removes the least recently used entries until the directory holds at most max_bytes, keeping the
+#given entry. temporary files of running writers are left alone.
+def evict_entries(directory, max_bytes=MAX_CACHE_BYTES, keep=None):
+    entries = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if ".tmp" in name or not os.path.isfile(path):
+            continue
+        status = os.stat(path)
+        entries.append((status.st_mtime, status.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed.append(path)
+    return removed
+
+def write_sidecar(entry, arrays, info):
+    description = { "info": info, "arrays": {} }
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        description["arrays"][name] = { "dtype": array.dtype.str, "shape": list(array.shape), "offset": offset }
+        offset += -(-array.nbytes // SIDECAR_ALIGNMENT) * SIDECAR_ALIGNMENT
+    text = json.dumps(description).encode("utf-8")
+    data_start = -(-(12 + len(text)) // SIDECAR_ALIGNMENT) * SIDECAR_ALIGNMENT
+
+    temporary = temporary_path(entry)
+    with open(temporary, "wb") as f:
+        f.write(SIDECAR_MAGIC + struct.pack("<II", SIDECAR_VERSION, len(text)) + text)
+        for name, array in arrays.items():
+            f.seek(data_start + description["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    return commit_entry(temporary, entry)
+
+#arrays of a sidecar memory mapped read only, and its info. returns None for missing or foreign files.
+def read_sidecar(entry):
+    if not os.path.isfile(entry):
+        return None
+    with open(entry, "rb") as f:
+        magic, version, length = struct.unpack("<4sII", f.read(12))
+        if magic != SIDECAR_MAGIC or version != SIDECAR_VERSION:
+            return None
+        description = json.loads(f.read(length).decode("utf-8"))
+    data_start = -(-(12 + length) // SIDECAR_ALIGNMENT) * SIDECAR_ALIGNMENT
+    arrays = {}
+    for name, array in description["arrays"].items():
+        count = int(np.prod(array["shape"]))
+        if count == 0:
+            arrays[name] = np.empty(array["shape"], dtype=array["dtype"])
+        else:
+            arrays[name] = np.memmap(entry, dtype=array["dtype"], mode="r", offset=data_start + array["offset"], shape=tuple(array["shape"]))
+    touch_entry(entry)
+    return arrays, description["info"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the cache entry path of a source file, or evict entries")
+    parser.add_argument("-i", "--input", required=False, default=None, help="Source file")
+    parser.add_argument("-k", "--kind", required=False, default="decoded", help="Kind of entry")
+    parser.add_argument("-e", "--extension", required=False, default=".glb", help="Extension of the entry")
+    parser.add_argument("-d", "--directory", required=False, default=None, help="Cache directory, default is a directory next to the input")
+    parser.add_argument("-m", "--max_bytes", required=False, default=None, type=int, help="Evict least recently used entries of the directory down to this size")
+    args = parser.parse_args(sys.argv[1:])
+
+    if args.input is None and (args.max_bytes is None or args.directory is None):
+        parser.error("an input file is required, or a directory to evict entries from")
+    if args.max_bytes is not None:
+        directory = args.directory or cache_directory(args.input)
+        print("JSON=" + json.dumps({ "removed": evict_entries(directory, args.max_bytes) }))
+        sys.exit(0)
+
+    entry = cache_entry(args.input, args.kind, args.extension, args.directory)
+    print("JSON=" + json.dumps({ "entry": entry, "exists": os.path.isfile(entry) }))
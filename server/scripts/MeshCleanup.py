@@ -0,0 +1,241 @@
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+# Vertex welding and face cleanup for photogrammetry meshes, run on whole arrays.
+# Vertices closer than the weld distance are merged with a spatial hash: every vertex is binned into a
+# grid with cells of the weld distance and compared with all vertices of its own and the neighboring
+# cells. Vertices within the distance are joined into connected components, each welded to its lowest
+# index vertex. Faces use Blender's corner layout: corner vertices, face start, face size.
+
+# grid cell offsets of a cell and its neighbors
+NEIGHBOR_OFFSETS = np.array([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)], dtype=np.int64)
+
+# the cell itself and the half of its neighbors after it, the other half finds each pair from the other side
+HALF_OFFSETS = NEIGHBOR_OFFSETS[13:]
+
+# candidate vertex pairs compared at a time
+PAIR_CHUNK = 1 << 22
+
+# welded vertices must also agree in their extra keys (e.g. texture coordinates) within this tolerance
+KEY_TOLERANCE = 1e-6
+
+# faces whose area is below this fraction of their longest edge squared count as degenerate
+DEGENERATE_RATIO = 1e-6
+
+def cell_hash(cells):
+    cells = cells.astype(np.uint64)
+    return (cells[:, 0] * np.uint64(73856093)) ^ (cells[:, 1] * np.uint64(19349663)) ^ (cells[:, 2] * np.uint64(83492791))
+
+# integer key of each grid cell and a function giving the keys of neighboring cells. cells are numbered
+# in row order if the grid fits into 62 bits, so neighbor keys are a constant offset away and stay sorted,
+# otherwise they are hashed.
+def cell_keys(cells):
+    cells = cells - (cells.min(axis=0) - 1)
+    size = cells.max(axis=0) + 2
+    if float(size[0]) * float(size[1]) * float(size[2]) < 2.0 ** 62:
+        strides = np.array([size[1] * size[2], size[2], 1], dtype=np.int64)
+        keys = cells @ strides
+        return keys, lambda offset: keys + int(offset @ strides)
+    return cell_hash(cells), lambda offset: cell_hash(cells + offset)
+
+# pairs of vertices within the distance (and key tolerance). vertices are sorted by cell, each vertex is
+# compared with the vertices after it in its own cell and with all vertices of half of the neighbor cells.
+def close_pairs(positions, keys, distance):
+    count = positions.shape[0]
+    hashes, neighbor_hashes = cell_keys(np.floor(positions / distance).astype(np.int64))
+
+    # work in cell order, neighbor cells are contiguous ranges
+    order = np.argsort(hashes, kind='stable')
+    positions = positions[order]
+    if keys is not None:
+        keys = keys[order]
+    sorted_hashes = hashes[order]
+    first = np.ones(count, dtype=bool)
+    first[1:] = sorted_hashes[1:] != sorted_hashes[:-1]
+    cell_hashes = sorted_hashes[first]
+    starts = np.flatnonzero(first)
+    ends = np.append(starts[1:], count)
+
+    pairs_a, pairs_b = [], []
+    for offset in HALF_OFFSETS:
+        neighbor = neighbor_hashes(offset)[order]
+        slot = np.minimum(np.searchsorted(cell_hashes, neighbor), cell_hashes.size - 1)
+        found = cell_hashes[slot] == neighbor
+        begin = np.where(found, starts[slot], 0)
+        if not offset.any():
+            begin = np.arange(1, count + 1)
+        lengths = np.maximum(np.where(found, ends[slot], 0) - begin, 0)
+        totals = np.cumsum(lengths)
+
+        # vertex ranges with about PAIR_CHUNK candidates each
+        start = 0
+        while start < count:
+            done = totals[start - 1] if start > 0 else 0
+            stop = max(int(np.searchsorted(totals, done + PAIR_CHUNK, side='right')), start + 1)
+            run = lengths[start:stop]
+            a = np.repeat(np.arange(start, stop), run)
+            b = np.arange(a.size) - np.repeat(np.cumsum(run) - run, run) + np.repeat(begin[start:stop], run)
+            valid = ((positions[a] - positions[b]) ** 2).sum(axis=1) <= distance * distance
+            if keys is not None:
+                valid &= (np.abs(keys[a] - keys[b]) <= KEY_TOLERANCE).all(axis=1)
+            pairs_a.append(order[a[valid]])
+            pairs_b.append(order[b[valid]])
+            start = stop
+
+    return np.concatenate(pairs_a), np.concatenate(pairs_b)
+
+#lowest node of the connected component of each of count nodes, given edges a[i] - b[i]
+def component_roots(count, a, b):
+    parent = np.arange(count)
+    while True:
+        root_a, root_b = parent[a], parent[b]
+        differ = root_a != root_b
+        if not differ.any():
+            break
+        # hook the higher root onto the lower one, parents only decrease so there are no cycles
+        np.minimum.at(parent, np.maximum(root_a[differ], root_b[differ]), np.minimum(root_a[differ], root_b[differ]))
+        while True:
+            grandparent = parent[parent]
+            if (grandparent == parent).all():
+                break
+            parent = grandparent
+    return parent
+
+#connected component label of each of count nodes, given edges a[i] - b[i]
+def connected_components(count, a, b):
+    return np.unique(component_roots(count, a, b), return_inverse=True)[1]
+
+# Map each vertex to the vertex it's welded to (itself if it stays). keys are optional extra
+# per-vertex values that have to match, such as texture coordinates to keep UV seams open.
+# A weld distance of 0 only merges vertices at exactly the same position.
+def weld_vertices(positions, distance, keys=None):
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    count = positions.shape[0]
+    if keys is not None:
+        keys = np.asarray(keys, dtype=np.float64).reshape(count, -1)
+
+    # identical vertices first (all a weld distance of 0 does), so clusters of them don't multiply the pairs
+    rows = positions if keys is None else np.hstack((positions, keys))
+    rows = np.ascontiguousarray(rows)
+    rows = rows.view(np.dtype((np.void, rows.shape[1] * rows.itemsize))).ravel()
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    remap = first[inverse.ravel()]
+    if distance <= 0.0 or count == 0:
+        return remap
+
+    # vertices within the distance of each other form clusters, also if they are connected through others
+    unique = np.flatnonzero(remap == np.arange(count))
+    a, b = close_pairs(positions[unique], None if keys is None else keys[unique], distance)
+    roots = component_roots(unique.size, a, b)
+    return unique[roots][np.searchsorted(unique, remap)]
+
+# Remove degenerate and duplicate faces after welding. Corners repeating the previous corner's vertex are
+# dropped; faces left with fewer than three corners, with (almost) zero area or with the same vertices as an
+# earlier face are removed. returns masks of the kept corners and faces and the number of removed faces.
+def clean_faces(corner_vertices, face_start, face_size, positions):
+    corner_vertices = np.asarray(corner_vertices, dtype=np.int64)
+    face_start = np.asarray(face_start, dtype=np.int64)
+    face_size = np.asarray(face_size, dtype=np.int64)
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    face_count = face_start.size
+    corner_count = corner_vertices.size
+    if face_count == 0:
+        return np.ones(corner_count, dtype=bool), np.ones(0, dtype=bool), { "degenerateFaces": 0, "duplicateFaces": 0 }
+
+    corner_face = np.repeat(np.arange(face_count), face_size)
+    previous = np.arange(corner_count) - 1
+    previous[face_start] = face_start + face_size - 1
+    keep_corner = corner_vertices != corner_vertices[previous]
+    size = np.bincount(corner_face, weights=keep_corner, minlength=face_count).astype(np.int64)
+
+    # area (Newell's method) and longest edge over the remaining corners
+    vertices = corner_vertices[keep_corner]
+    faces = corner_face[keep_corner]
+    start = np.cumsum(size) - size
+    following = np.arange(vertices.size) + 1
+    last = start[size > 0] + size[size > 0] - 1
+    following[last] = start[size > 0]
+    p = positions[vertices]
+    q = positions[vertices[following]]
+    cross = np.cross(p, q)
+    normal = np.stack([np.bincount(faces, weights=cross[:, i], minlength=face_count) for i in range(3)], axis=1)
+    area = 0.5 * np.linalg.norm(normal, axis=1)
+    edge = np.zeros(face_count)
+    edge[size > 0] = np.maximum.reduceat(((q - p) ** 2).sum(axis=1), start[size > 0])
+
+    keep_face = (size >= 3) & (area > DEGENERATE_RATIO * edge)
+    degenerate = int(face_count - np.count_nonzero(keep_face))
+
+    # duplicates: same sorted vertex list, the first face is kept
+    width = int(size.max())
+    sorted_vertices = np.full((face_count, width), -1, dtype=np.int64)
+    sorted_vertices[faces, np.arange(vertices.size) - start[faces]] = vertices
+    sorted_vertices.sort(axis=1)
+    candidates = np.flatnonzero(keep_face)
+    rows = np.ascontiguousarray(sorted_vertices[candidates])
+    rows = rows.view(np.dtype((np.void, rows.shape[1] * rows.itemsize))).ravel()
+    _, first = np.unique(rows, return_index=True)
+    unique_face = np.zeros(face_count, dtype=bool)
+    unique_face[candidates[first]] = True
+    duplicate = int(np.count_nonzero(keep_face & ~unique_face))
+    keep_face &= unique_face
+
+    keep_corner &= keep_face[corner_face]
+    return keep_corner, keep_face, { "degenerateFaces": degenerate, "duplicateFaces": duplicate }
+
+# grid mesh as triangle strips with duplicated seam vertices (slightly displaced), plus a few zero-area
+# and duplicated triangles, a stand-in for photogrammetry exports
+def seam_grid(triangle_count, strip_width=32, jitter=1e-7, seed=0):
+    size = max(2, int(np.sqrt(triangle_count / 2)) + 1)
+    u, v = np.meshgrid(np.arange(size, dtype=np.float64), np.arange(size, dtype=np.float64))
+    grid = np.stack((u.ravel(), np.zeros(size * size), v.ravel()), axis=1) / (size - 1)
+    quad = np.arange(size * size, dtype=np.int64).reshape(size, size)[:-1, :-1]
+    triangles = np.stack((quad, quad + size, quad + 1, quad + 1, quad + size, quad + size + 1), axis=2).reshape(size - 1, -1, 3)
+
+    # every strip gets its own copy of the vertices on its left border
+    rng = np.random.default_rng(seed)
+    columns = np.arange(size) % strip_width == 0
+    seam = np.flatnonzero(np.tile(columns, size))
+    seam = seam[seam % size != 0]
+    copies = grid[seam] + rng.uniform(-jitter, jitter, (seam.size, 3))
+    duplicate = np.full(size * size, -1, dtype=np.int64)
+    duplicate[seam] = size * size + np.arange(seam.size)
+    strip_start = (quad % size) % strip_width == 0
+    triangles = triangles.reshape(-1, 3)
+    on_seam = np.repeat(strip_start.ravel(), 2)
+    left = triangles[on_seam]
+    left = np.where((duplicate[left] >= 0) & ((left % size) % strip_width == 0), duplicate[left], left)
+    triangles[on_seam] = left
+
+    positions = np.vstack((grid, copies))
+    extra = rng.integers(0, triangles.shape[0], max(1, triangles.shape[0] // 1000))
+    degenerate = np.stack((triangles[extra, 0], triangles[extra, 0], triangles[extra, 1]), axis=1)
+    triangles = np.vstack((triangles, triangles[extra], degenerate))
+    return positions, triangles
+
+if __name__ == "__main__":
+    # inside Blender, script arguments follow "--"
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
+
+    # standalone use runs the cleanup on a grid mesh with seams and degenerate faces and reports timing
+    parser = argparse.ArgumentParser(description="Vertex welding and face cleanup benchmark")
+    parser.add_argument("-t", "--triangles", required=False, default=2000000, type=int, help="Benchmark triangle count")
+    parser.add_argument("-w", "--weld_distance", required=False, default=1e-5, type=float, help="Weld distance")
+    args = parser.parse_known_args(argv)[0]
+
+    positions, triangles = seam_grid(args.triangles)
+    start = time.perf_counter()
+    remap = weld_vertices(positions, args.weld_distance)
+    weld_seconds = time.perf_counter() - start
+    face_start = np.arange(0, triangles.size, 3)
+    keep_corner, keep_face, report = clean_faces(remap[triangles.ravel()], face_start, np.full(face_start.size, 3), positions)
+    report["seconds"] = time.perf_counter() - start
+    report["weldSeconds"] = weld_seconds
+    report["numVertices"] = int(positions.shape[0])
+    report["numFaces"] = int(triangles.shape[0])
+    report["weldedVertices"] = int(np.count_nonzero(remap != np.arange(remap.size)))
+    print("JSON=" + json.dumps(report))
@@ -1,6 +1,13 @@
+import os
 import sys
-import pymeshlab
+import json
+import time
 import argparse
+import tempfile
+import xml.etree.ElementTree as ET
+
+#shared secret for connections to a persistent worker (MeshLabWorker.py), set by the server
+WORKER_KEY_VARIABLE = "COOK_MESHLAB_WORKER_KEY"
 
 def convert(s):
     if s.lower() == "true":
@@ -8,28 +15,258 @@ def convert(s):
     else:
         return False
 
-#get args
-argv = sys.argv
+#pymeshlab parameter value, "10%" strings are percentages of the bounding box diagonal
+def filter_value(value):
+    import pymeshlab
+    if isinstance(value, str) and value.endswith("%"):
+        return pymeshlab.PercentageValue(float(value[:-1]))
+    return value
+
+#current and peak resident set size of this process in bytes (None if unknown)
+def memory_usage():
+    try:
+        with open("/proc/self/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(status["VmRSS"].split()[0]) * 1024, int(status["VmHWM"].split()[0]) * 1024
+    except (OSError, KeyError):
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return info.rss, getattr(info, "peak_wset", info.rss)
+    except ImportError:
+        return None, None
+
+#reset the peak resident set size, so it can be measured per filter (Linux only)
+def reset_peak_memory():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+#records wall time, memory and mesh size for each step of a job
+class FilterProfile:
+    def __init__(self, ms):
+        self.ms = ms
+        self.start = time.perf_counter()
+        self.steps = []
+        self.peak_per_step = reset_peak_memory()
+
+    def mesh_size(self):
+        try:
+            mesh = self.ms.current_mesh()
+            return { "numVertices": mesh.vertex_number(), "numFaces": mesh.face_number() }
+        except Exception:
+            return { "numVertices": 0, "numFaces": 0 }
+
+    def measure(self, name, function):
+        before = self.mesh_size()
+        reset_peak_memory()
+        start = time.perf_counter()
+        result = function()
+        end = time.perf_counter()
+        rss, peak_rss = memory_usage()
+        self.steps.append({
+            "name": name,
+            "start": start - self.start,
+            "seconds": end - start,
+            "rss": rss,
+            "peakRSS": peak_rss,
+            "before": before,
+            "after": self.mesh_size()
+        })
+        print("Profile: %s %.2fs, %d -> %d faces" % (name, end - start, before["numFaces"], self.steps[-1]["after"]["numFaces"]))
+        return result
+
+    def report(self):
+        return {
+            "seconds": time.perf_counter() - self.start,
+            "peakPerStep": self.peak_per_step,
+            "steps": self.steps
+        }
+
+    #write the steps as a Chrome trace (chrome://tracing, Perfetto)
+    def write_trace(self, path):
+        events = []
+        for step in self.steps:
+            events.append({ "name": step["name"], "cat": "filter", "ph": "X", "pid": os.getpid(), "tid": 0,
+                "ts": step["start"] * 1e6, "dur": step["seconds"] * 1e6,
+                "args": { "before": step["before"], "after": step["after"], "peakRSS": step["peakRSS"] }})
+            if step["peakRSS"] is not None:
+                events.append({ "name": "memory", "ph": "C", "pid": os.getpid(), "tid": 0,
+                    "ts": (step["start"] + step["seconds"]) * 1e6, "args": { "rss": step["rss"], "peakRSS": step["peakRSS"] }})
+        with open(path, "w") as f:
+            json.dump({ "traceEvents": events, "displayTimeUnit": "ms" }, f)
+
+#call function, measured as a step of the profile if there is one
+def measure(profile, name, function):
+    if profile is None:
+        return function()
+    return profile.measure(name, function)
+
+#load a mesh and make sure it is pure triangles
+def load_mesh(ms, path, profile=None):
+    measure(profile, "load_new_mesh", lambda: ms.load_new_mesh(path))
+    measure(profile, "meshing_poly_to_tri", lambda: ms.apply_filter("meshing_poly_to_tri"))
+
+#split a filter script into scripts with a single filter each. returns (filter name, script path) pairs.
+def split_filter_script(script, directory):
+    root = ET.parse(script).getroot()
+    scripts = []
+    for index, element in enumerate(root):
+        path = os.path.join(directory, "filter_%03d.mlx" % index)
+        with open(path, "wb") as f:
+            f.write(b"<!DOCTYPE FilterScript>\n<FilterScript>\n" + ET.tostring(element) + b"\n</FilterScript>\n")
+        scripts.append((element.get("name", element.tag), path))
+    return scripts
+
+#apply a structured filter list ([{ "name": pymeshlab filter name, "params": {...} }]) or a filter script file.
+#with a profile, filters are applied and measured one at a time (scripts are split into single filters).
+def apply_filters(ms, filters=None, script=None, profile=None):
+    if filters is not None:
+        for filter in filters:
+            params = { name.lower(): filter_value(value) for name, value in filter.get("params", {}).items() }
+            measure(profile, filter["name"], lambda: ms.apply_filter(filter["name"], **params))
+    if script is not None:
+        if profile is None:
+            ms.load_filter_script(script)
+            ms.apply_filter_script()
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            for name, path in split_filter_script(script, directory):
+                ms.load_filter_script(path)
+                profile.measure(name, ms.apply_filter_script)
+
+def save_mesh(ms, job, profile=None):
+    measure(profile, "save_current_mesh", lambda: ms.save_current_mesh(job["output"],
+        save_vertex_normal=job["writeNormals"], save_wedge_texcoord=job["writeTexCoords"]))
+
+#save the job output, then for each level of a pyramid apply its filters to the mesh as left by the previous
+#level (e.g. decimate further) and save it with its own settings. returns the last saved output or None.
+def save_outputs(ms, job, profile=None):
+    saved = None
+    if job.get("output") is not None:
+        save_mesh(ms, job, profile)
+        saved = job
+    for index, level in enumerate(job.get("levels") or []):
+        start = time.perf_counter()
+        apply_filters(ms, level.get("filters"), None, profile)
+        save_mesh(ms, level, profile)
+        print("Level %d: %d faces saved to %s in %.2fs" % (index, ms.current_mesh().face_number(), level["output"], time.perf_counter() - start))
+        saved = level
+    return saved
+
+#print the profile as a JSON line and write the optional trace file
+def report_profile(profile, job):
+    print("PROFILE=" + json.dumps(profile.report()))
+    if job.get("trace") is not None:
+        profile.write_trace(job["trace"])
+
+#run a job in this process
+def run_job(job):
+    import pymeshlab
+    ms = pymeshlab.MeshSet()
+    profile = FilterProfile(ms) if job.get("profile") else None
+    load_mesh(ms, job["input"], profile)
+    apply_filters(ms, job.get("filters"), job.get("script"), profile)
+    save_outputs(ms, job, profile)
+    if profile is not None:
+        report_profile(profile, job)
+
+#run a job in a persistent worker, prints its output. returns False if no worker is listening or the
+#connection is lost before the result arrives.
+def run_in_worker(address, job):
+    from multiprocessing.connection import Client
+    host, port = address.rsplit(":", 1)
+    try:
+        connection = Client((host, int(port)), authkey=os.environ.get(WORKER_KEY_VARIABLE, "").encode("utf-8"))
+    except OSError:
+        return False
 
-#parse args
-parser = argparse.ArgumentParser()
-parser.add_argument("-i", "--input", required=True, help="Input filepath")
-parser.add_argument("-s", "--script", required=True, help="Script filepath")
-parser.add_argument("-o", "--output", required=False, help="Output filepath")
-parser.add_argument("-vn", required=False, default=False, help="Write vertex normals")
-parser.add_argument("-wt", required=False, default=False, help="Write texture coordinates")
-args = parser.parse_args()
+    with connection:
+        try:
+            connection.send(job)
+            result = connection.recv()
+        except (EOFError, OSError) as e:
+            print("Lost connection to worker, running job in process: %s" % (str(e) or type(e).__name__))
+            return False
+    for line in result["lines"]:
+        print(line)
+    if result["error"] is not None:
+        print(result["error"])
+        sys.exit(1)
+    return True
 
-ms = pymeshlab.MeshSet()
+if __name__ == "__main__":
+    #get args
+    argv = sys.argv
 
-ms.load_new_mesh(args.input)
+    #parse args
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", required=True, help="Input filepath")
+    parser.add_argument("-s", "--script", required=False, help="Script filepath")
+    parser.add_argument("-f", "--filters", required=False, help="Filter list filepath (JSON)")
+    parser.add_argument("-o", "--output", required=False, help="Output filepath")
+    parser.add_argument("-vn", required=False, default=False, help="Write vertex normals")
+    parser.add_argument("-wt", required=False, default=False, help="Write texture coordinates")
+    parser.add_argument("-l", "--levels", required=False, help="Level list filepath (JSON), saves a pyramid from one load")
+    parser.add_argument("-tm", "--tile_memory", required=False, type=float, help="Memory limit in MB, processes the mesh in spatial blocks")
+    parser.add_argument("-to", "--tile_overlap", required=False, default=0.05, type=float, help="Block overlap as fraction of the block size")
+    parser.add_argument("-tw", "--tile_weld", required=False, default=0.0, type=float, help="Weld distance for vertices along block boundaries")
+    parser.add_argument("-tp", "--tile_processes", required=False, default=0, type=int, help="Number of block processes (default: all cores)")
+    parser.add_argument("-w", "--worker", required=False, help="Address (host:port) of a persistent worker")
+    parser.add_argument("-tl", "--time_limit", required=False, default=0, type=int, help="Seconds after which the worker cancels the job, 0 for no limit")
+    parser.add_argument("-p", "--profile", required=False, default=False, help="Profile each filter")
+    parser.add_argument("-t", "--trace", required=False, help="Chrome trace filepath for the profile")
+    args = parser.parse_args()
 
-# make sure mesh is pure triangles
-ms.apply_filter("meshing_poly_to_tri")
+    job = {
+        "input": os.path.abspath(args.input),
+        "output": os.path.abspath(args.output) if args.output is not None else None,
+        "script": os.path.abspath(args.script) if args.script is not None else None,
+        "filters": None,
+        "levels": None,
+        "writeNormals": convert(str(args.vn)),
+        "writeTexCoords": convert(str(args.wt)),
+        "profile": convert(str(args.profile)) or args.trace is not None,
+        "trace": os.path.abspath(args.trace) if args.trace is not None else None,
+        "tiling": None,
+        "timeLimit": args.time_limit
+    }
+    if args.tile_memory is not None:
+        job["tiling"] = {
+            "memoryLimit": args.tile_memory * 1e6,
+            "overlap": args.tile_overlap,
+            "weldDistance": args.tile_weld,
+            "processes": args.tile_processes
+        }
+    if args.filters is not None:
+        with open(args.filters, "r") as f:
+            job["filters"] = json.load(f)
+    if args.levels is not None:
+        with open(args.levels, "r") as f:
+            job["levels"] = [{
+                "output": os.path.abspath(level["output"]),
+                "writeNormals": level.get("writeNormals", False),
+                "writeTexCoords": level.get("writeTexCoords", False),
+                "filters": level.get("filters", [])
+            } for level in json.load(f)]
 
-# load the filter script and execute
-ms.load_filter_script(args.script)
-ms.apply_filter_script()
+    #meshes exceeding the memory limit are processed block by block in a process pool
+    if job["tiling"] is not None:
+        if job["output"] is None:
+            print("tiled processing requires an output file")
+            sys.exit(1)
+        sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+        from MeshTiling import run_tiled
+        try:
+            run_tiled(job)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
 
-if args.output is not None:
-    ms.save_current_mesh(args.output, save_vertex_normal=convert(args.vn), save_wedge_texcoord=convert(args.wt))
+    #without a worker (or if it isn't running yet), the job runs here
+    elif args.worker is None or run_in_worker(args.worker, job) is False:
+        run_job(job)
@@ -0,0 +1,188 @@
+import io
+import os
+import sys
+import time
+import argparse
+import threading
+import contextlib
+import traceback
+import pymeshlab
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Listener, wait
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from MeshLabExecuteFilter import WORKER_KEY_VARIABLE, FilterProfile, load_mesh, apply_filters, save_outputs, report_profile
+
+# Long-running PyMeshLab worker. Receives jobs from MeshLabExecuteFilter.py -w over a local
+# connection and sends back the printed output. Jobs run concurrently in a pool of processes, one per
+# tool instance slot (-n). Each process keeps its mesh set loaded between jobs: if a job's input is the
+# file a previous job saved (unchanged on disk), it goes to that process and isn't reloaded, so chained
+# recipe steps on the same mesh skip the import. If the client goes away (the task was cancelled or
+# timed out) or a job exceeds its time limit, the job's process is terminated and replaced.
+
+class MeshLabWorker:
+    def __init__(self):
+        self.ms = pymeshlab.MeshSet()
+        # (path, modification time) of the file the loaded mesh set corresponds to
+        self.mesh_file = None
+
+    def run(self, job):
+        start = time.perf_counter()
+        reuse = self.mesh_file is not None and self.mesh_file == file_key(job["input"])
+        if reuse:
+            print("Reusing loaded mesh: " + job["input"])
+        else:
+            self.ms = pymeshlab.MeshSet()
+        profile = FilterProfile(self.ms) if job.get("profile") else None
+        if not reuse:
+            load_mesh(self.ms, job["input"], profile)
+        self.mesh_file = None
+
+        apply_filters(self.ms, job.get("filters"), job.get("script"), profile)
+
+        saved = save_outputs(self.ms, job, profile)
+        # the mesh set matches the last saved file, unless a reload would lose texture coordinates that weren't written
+        if saved is not None and (saved["writeTexCoords"] or not self.ms.current_mesh().has_wedge_tex_coord()):
+            self.mesh_file = file_key(saved["output"])
+        if profile is not None:
+            report_profile(profile, job)
+
+        print("Worker job finished in %.2fs" % (time.perf_counter() - start))
+
+    # jobs from the pool, answered with the printed output, the error and the loaded file
+    def serve(self, connection):
+        while True:
+            try:
+                job = connection.recv()
+            except EOFError:
+                return
+            output = io.StringIO()
+            error = None
+            with contextlib.redirect_stdout(output):
+                try:
+                    self.run(job)
+                except Exception as e:
+                    error = str(e) or traceback.format_exc()
+                    self.mesh_file = None
+            connection.send({ "lines": output.getvalue().splitlines(), "error": error, "meshFile": self.mesh_file })
+
+def run_worker(connection):
+    MeshLabWorker().serve(connection)
+
+# a worker process of the pool, started on first use and after it was terminated
+class WorkerSlot:
+    def __init__(self):
+        self.process = None
+        self.connection = None
+        self.mesh_file = None
+        self.busy = False
+
+    def start(self):
+        self.connection, child = Pipe()
+        self.process = Process(target=run_worker, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.connection.close()
+        self.process = None
+        self.mesh_file = None
+
+class WorkerPool:
+    def __init__(self, size):
+        self.slots = [WorkerSlot() for _ in range(size)]
+        self.condition = threading.Condition()
+
+    # waits for a free slot, preferably the one with the job's input loaded
+    def acquire(self, job):
+        key = file_key(job["input"])
+        with self.condition:
+            while not any(not slot.busy for slot in self.slots):
+                self.condition.wait()
+            free = [slot for slot in self.slots if not slot.busy]
+            slot = next((slot for slot in free if key is not None and slot.mesh_file == key), free[0])
+            slot.busy = True
+        if slot.process is None or not slot.process.is_alive():
+            slot.stop()
+            slot.start()
+        return slot
+
+    def release(self, slot):
+        with self.condition:
+            slot.busy = False
+            self.condition.notify()
+
+    # runs the job in the slot's process. returns the result, or None if the client went away.
+    def run(self, slot, job, client):
+        slot.connection.send(job)
+        limit = job.get("timeLimit") or None
+        deadline = time.perf_counter() + limit if limit else None
+        while True:
+            remaining = max(deadline - time.perf_counter(), 0) if deadline is not None else None
+            ready = wait([slot.connection, client], remaining)
+            if slot.connection in ready:
+                try:
+                    result = slot.connection.recv()
+                except EOFError:
+                    slot.process.join()
+                    code = slot.process.exitcode
+                    slot.stop()
+                    return { "lines": [], "error": "worker process exited with code %s" % code }
+                slot.mesh_file = result.pop("meshFile")
+                return result
+            if client in ready:
+                # the client doesn't send anything after the job, it disconnected
+                print("Job cancelled by client, restarting worker process: " + job["input"])
+                slot.stop()
+                return None
+            if not ready:
+                print("Job exceeded %ds, restarting worker process: %s" % (limit, job["input"]))
+                slot.stop()
+                return { "lines": [], "error": "worker job cancelled after %d seconds" % limit }
+
+    def handle(self, connection):
+        with connection:
+            try:
+                job = connection.recv()
+            except EOFError:
+                return
+            slot = self.acquire(job)
+            try:
+                result = self.run(slot, job, connection)
+            finally:
+                self.release(slot)
+            if result is not None:
+                try:
+                    connection.send(result)
+                except OSError:
+                    # client went away (cancelled or timed out)
+                    pass
+
+def serve(port, size):
+    pool = WorkerPool(size)
+    authkey = os.environ.get(WORKER_KEY_VARIABLE, "").encode("utf-8")
+    with Listener(("localhost", port), authkey=authkey) as listener:
+        print("MeshLab worker listening on port %d, %d processes" % (port, size))
+        sys.stdout.flush()
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                print(e)
+                continue
+            threading.Thread(target=pool.handle, args=(connection,), daemon=True).start()
+
+def file_key(path):
+    path = os.path.abspath(path)
+    return (path, os.path.getmtime(path)) if os.path.exists(path) else None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent PyMeshLab worker")
+    parser.add_argument("-p", "--port", required=True, type=int, help="Port to listen on (localhost)")
+    parser.add_argument("-n", "--processes", required=False, default=1, type=int, help="Number of jobs running at the same time")
+    args = parser.parse_args()
+
+    serve(args.port, max(args.processes, 1))
@@ -0,0 +1,183 @@
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+# Triangle and vertex order optimization for web assets.
+# Triangles are sorted along a 3D Hilbert curve through their centroids, which keeps
+# neighboring triangles together for the post-transform vertex cache, then vertices are
+# renumbered in order of first use for fetch locality. Everything runs on whole arrays.
+
+# spread the lower 21 bits of each value so that two zero bits separate each bit
+def part1by2(x):
+    x = x.astype(np.uint64) & np.uint64(0x1FFFFF)
+    x = (x | (x << np.uint64(32))) & np.uint64(0x1F00000000FFFF)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x1F0000FF0000FF)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x100F00F00F00F00F)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x10C30C30C30C30C3)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return x
+
+# quantize points to an integer grid with the given number of bits per axis
+def quantize_points(points, bits):
+    points = np.asarray(points, dtype=np.float64)
+    lower = points.min(axis=0)
+    extent = max(float((points.max(axis=0) - lower).max()), 1e-30)
+    scale = ((1 << bits) - 1) / extent
+    return np.clip((points - lower) * scale, 0, (1 << bits) - 1).astype(np.int64)
+
+# Hilbert curve index of each point (Skilling's transform, vectorized over all points)
+def hilbert_codes(points, bits=16):
+    x = quantize_points(points, bits).astype(np.int32).T.copy()
+
+    # inverse undo excess work
+    q = 1 << (bits - 1)
+    while q > 1:
+        p = q - 1
+        for i in range(3):
+            invert = ((x[i] & q) != 0).astype(np.int32) * p
+            if i == 0:
+                x[0] ^= invert
+                continue
+            t = (x[0] ^ x[i]) & p
+            t[invert != 0] = 0
+            x[0] ^= t | invert
+            x[i] ^= t
+        q >>= 1
+
+    # gray encode
+    x[1] ^= x[0]
+    x[2] ^= x[1]
+    t = np.zeros_like(x[0])
+    q = 1 << (bits - 1)
+    while q > 1:
+        t ^= ((x[2] & q) != 0).astype(np.int32) * (q - 1)
+        q >>= 1
+    x ^= t
+
+    # interleave the transposed bits into one index
+    return (part1by2(x[0]) << np.uint64(2)) | (part1by2(x[1]) << np.uint64(1)) | part1by2(x[2])
+
+# simulate a FIFO post-transform vertex cache, returns the number of cache misses.
+# the index stream is split into windows that are simulated side by side; each window first
+# replays the end of the preceding one to warm up its cache, so the result is practically exact.
+def count_cache_misses(indices, cache_size=32, window=3072):
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+    count = indices.size
+    if count == 0:
+        return 0
+
+    warmup = min(8 * cache_size, count)
+    windows = (count + window - 1) // window
+    padded = np.full(windows * window + warmup, -1, dtype=np.int64)
+    padded[warmup:warmup + count] = indices
+    padded[:warmup] = -2   # no warm-up data before the first window
+    starts = np.arange(windows) * window
+
+    cache = np.full((windows, cache_size), -3, dtype=np.int64)
+    head = np.zeros(windows, dtype=np.int64)
+    rows = np.arange(windows)
+    misses = np.zeros(windows, dtype=np.int64)
+
+    for step in range(warmup + window):
+        v = padded[starts + step]
+        miss = ~(cache == v[:, None]).any(axis=1) & (v >= 0)
+        if not miss.any():
+            continue
+        cache[rows[miss], head[miss]] = v[miss]
+        head[miss] = (head[miss] + 1) % cache_size
+        if step >= warmup:
+            misses += miss
+
+    return int(misses.sum())
+
+# average cache miss ratio (misses per triangle) and average transform to vertex ratio
+def analyze_vertex_cache(indices, vertex_count, cache_size=32):
+    indices = np.asarray(indices).reshape(-1)
+    misses = count_cache_misses(indices, cache_size)
+    return {
+        "acmr": misses / max(indices.size // 3, 1),
+        "atvr": misses / max(vertex_count, 1)
+    }
+
+# fraction of vertex fetches that land in a different 64 byte line than the previous fetch
+def analyze_vertex_fetch(indices, vertex_size=32):
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+    if indices.size < 2:
+        return { "fetchRatio": 0.0 }
+    lines = indices * vertex_size // 64
+    return { "fetchRatio": float(np.count_nonzero(lines[1:] != lines[:-1]) / indices.size) }
+
+# new triangle order, sorted along a Hilbert curve through the triangle centroids
+def optimize_vertex_cache(indices, positions):
+    triangles = np.asarray(indices).reshape(-1, 3)
+    positions = np.asarray(positions, dtype=np.float64)
+    if triangles.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64)
+    centroids = (positions[triangles[:, 0]] + positions[triangles[:, 1]] + positions[triangles[:, 2]]) / 3.0
+    return np.argsort(hilbert_codes(centroids), kind='stable')
+
+# vertex remap table, numbering vertices in order of first use. unused vertices go last.
+def optimize_vertex_fetch(indices, vertex_count):
+    flat = np.asarray(indices, dtype=np.int64).reshape(-1)
+    first = np.full(vertex_count, flat.size, dtype=np.int64)
+    np.minimum.at(first, flat, np.arange(flat.size))
+    order = np.argsort(first, kind='stable')
+    remap = np.empty(vertex_count, dtype=np.int64)
+    remap[order] = np.arange(vertex_count)
+    return remap, order
+
+# Reorder triangles for vertex cache locality, then vertices for fetch locality.
+# attributes are per-vertex arrays that are reordered along with the positions (None entries are skipped).
+# returns the new index array, positions, attributes and a report with metrics before and after.
+def optimize_mesh(indices, positions, attributes=(), cache_size=32):
+    start = time.perf_counter()
+    positions = np.asarray(positions)
+    triangles = np.asarray(indices).reshape(-1, 3)
+    vertex_count = positions.shape[0]
+
+    report = { "numTriangles": int(triangles.shape[0]), "numVertices": int(vertex_count), "cacheSize": cache_size }
+    report["before"] = analyze_vertex_cache(triangles, vertex_count, cache_size)
+    report["before"].update(analyze_vertex_fetch(triangles))
+
+    triangles = triangles[optimize_vertex_cache(triangles, positions)]
+    remap, order = optimize_vertex_fetch(triangles, vertex_count)
+    triangles = remap[triangles].astype(np.uint32)
+    positions = positions[order]
+    attributes = [attribute[order] if attribute is not None else None for attribute in attributes]
+
+    report["after"] = analyze_vertex_cache(triangles, vertex_count, cache_size)
+    report["after"].update(analyze_vertex_fetch(triangles))
+    report["seconds"] = time.perf_counter() - start
+
+    return triangles, positions, attributes, report
+
+# shuffled grid mesh, a stand-in for photogrammetry meshes with arbitrary triangle order
+def shuffled_grid(triangle_count, seed=0):
+    size = max(2, int(np.sqrt(triangle_count / 2)) + 1)
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, size), np.linspace(0.0, 1.0, size))
+    positions = np.stack((u.ravel(), np.zeros(size * size), v.ravel()), axis=1).astype(np.float32)
+    quad = np.arange(size * size, dtype=np.int64).reshape(size, size)[:-1, :-1].ravel()
+    triangles = np.stack((quad, quad + size, quad + 1, quad + 1, quad + size, quad + size + 1), axis=1).reshape(-1, 3)
+
+    rng = np.random.default_rng(seed)
+    permutation = rng.permutation(positions.shape[0])
+    inverse = np.empty_like(permutation)
+    inverse[permutation] = np.arange(permutation.size)
+    return positions[permutation], inverse[triangles][rng.permutation(triangles.shape[0])]
+
+if __name__ == "__main__":
+    # inside Blender, script arguments follow "--"
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
+
+    # standalone use runs the optimizer on a shuffled grid mesh and reports timing and metrics
+    parser = argparse.ArgumentParser(description="Vertex cache and fetch optimization benchmark")
+    parser.add_argument("-t", "--triangles", required=False, default=5000000, type=int, help="Benchmark triangle count")
+    parser.add_argument("-c", "--cache_size", required=False, default=32, type=int, help="Simulated vertex cache size")
+    args = parser.parse_known_args(argv)[0]
+
+    positions, triangles = shuffled_grid(args.triangles)
+    report = optimize_mesh(triangles, positions, cache_size=args.cache_size)[3]
+    print("JSON=" + json.dumps(report))
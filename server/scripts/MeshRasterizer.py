@@ -0,0 +1,703 @@
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import struct
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from PlyIO import PLY_TYPES, read_ply_header, map_element, face_indices, positions as vertex_positions
+from MeshCleanup import cell_keys
+
+# Software rasterizer for catalog preview images without Blender. Reads PLY (binary and ASCII), STL,
+# OBJ and GLB files directly and renders the same views as BlenderScreenshot.py's preview session with
+# NumPy only: triangles are expanded into the pixel centers of their screen bounding boxes in chunks,
+# tested with edge functions, and the nearest one per pixel wins the z-buffer. Shading is deferred: the
+# winning triangle and its barycentric coordinates are stored per pixel, then normals, texture and the
+# headlight are evaluated once per covered pixel. Meshes with many more triangles than pixels are first
+# simplified by vertex clustering on a grid of about a pixel, which keeps the silhouette and shading
+# but bounds the rasterization work by the image size instead of the triangle count.
+
+# camera field of view, same as BlenderScreenshot.py
+PREVIEW_FOV = np.radians(40.0)
+
+# pixel candidates (triangle, pixel pairs) tested at once
+CANDIDATE_CHUNK = 1 << 20
+
+# meshes are simplified when they have more triangles than this many per pixel
+SIMPLIFY_TRIANGLES_PER_PIXEL = 0.5
+
+# clustering cell size relative to the pixel size at the center of the model
+SIMPLIFY_CELL_PIXELS = 1.0
+
+# headlight: ambient share and the rest from the angle between the normal and the view direction
+AMBIENT = 0.25
+
+BASE_COLOR = np.array([0.8, 0.8, 0.8, 1.0])
+
+def convert(s):
+    if s.lower() == "true":
+        return True
+    else:
+        return False
+
+#mesh as arrays: float64 (n, 3) positions, (m, 3) triangles, optional per corner (m, 3, 2) texture coordinates
+#(origin bottom left), optional (n, 3) vertex colors, per triangle material index and materials
+#({ "color": rgba, "texture": file path or encoded image bytes })
+def make_mesh(positions, triangles, uvs=None, colors=None, material_index=None, materials=None):
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    return {
+        "positions": np.asarray(positions, dtype=np.float64).reshape(-1, 3),
+        "triangles": triangles,
+        "uvs": uvs,
+        "colors": colors,
+        "materialIndex": material_index if material_index is not None else np.zeros(triangles.shape[0], dtype=np.int64),
+        "materials": materials or [{ "color": BASE_COLOR, "texture": None }]
+    }
+
+#fan triangulation of polygons given as lists of corner values
+def fan_triangles(polygons):
+    triangles = []
+    for polygon in polygons:
+        for index in range(1, len(polygon) - 1):
+            triangles.append((polygon[0], polygon[index], polygon[index + 1]))
+    return triangles
+
+#texture file named in PLY header comments (MeshLab writes "comment TextureFile name")
+def ply_texture(path):
+    with open(path, "rb") as f:
+        for line in f:
+            words = line.decode("ascii", "replace").split()
+            if words[:2] == ["comment", "TextureFile"] and len(words) > 2:
+                return os.path.join(os.path.dirname(path), " ".join(words[2:]))
+            if words[:1] == ["end_header"]:
+                return None
+    return None
+
+#texture coordinate and color columns of PLY vertex records
+def ply_vertex_attributes(vertices):
+    names = vertices.dtype.names
+    uvs = colors = None
+    for u, v in (("s", "t"), ("u", "v"), ("texture_u", "texture_v")):
+        if u in names and v in names:
+            uvs = np.stack((vertices[u], vertices[v]), axis=1).astype(np.float64)
+            break
+    if "red" in names and "green" in names and "blue" in names:
+        colors = np.stack((vertices["red"], vertices["green"], vertices["blue"]), axis=1).astype(np.float64)
+        if np.issubdtype(vertices.dtype["red"], np.integer):
+            colors /= 255.0
+    return uvs, colors
+
+def ply_mesh(path, vertices, triangles, wedge_uvs):
+    uvs, colors = ply_vertex_attributes(vertices)
+    if wedge_uvs is None and uvs is not None:
+        wedge_uvs = uvs[triangles]
+    texture = ply_texture(path)
+    materials = [{ "color": BASE_COLOR, "texture": texture if wedge_uvs is not None else None }]
+    return make_mesh(vertex_positions(vertices), triangles, wedge_uvs, colors, None, materials)
+
+def read_binary_ply(path):
+    header = read_ply_header(path)
+    vertices = np.array(map_element(path, header["vertex"]))
+    faces = map_element(path, header["face"])
+    triangles = face_indices(faces)
+    wedge_uvs = None
+    if "texcoord" in faces.dtype.names and faces.dtype["texcoord"].shape == (6,):
+        wedge_uvs = np.array(faces["texcoord"], dtype=np.float64).reshape(-1, 3, 2)
+    return ply_mesh(path, vertices, triangles, wedge_uvs)
+
+def read_ascii_ply(path):
+    with open(path, "r") as f:
+        elements = []
+        for line in f:
+            words = line.split()
+            if words[:1] == ["element"]:
+                elements.append((words[1], int(words[2]), []))
+            elif words[:1] == ["property"]:
+                elements[-1][2].append(words[1:])
+            elif words[:1] == ["end_header"]:
+                break
+
+        vertices = None
+        polygons, wedges = [], []
+        for name, count, properties in elements:
+            lines = [f.readline() for _ in range(count)]
+            if name == "vertex":
+                values = np.array(" ".join(lines).split(), dtype=np.float64).reshape(count, len(properties))
+                vertices = np.empty(count, dtype=[(prop[1], PLY_TYPES[prop[0]]) for prop in properties])
+                for index, prop in enumerate(properties):
+                    vertices[prop[1]] = values[:, index]
+            elif name == "face":
+                for line in lines:
+                    values = line.split()
+                    position = 0
+                    for prop in properties:
+                        if prop[0] != "list":
+                            position += 1
+                            continue
+                        size = int(values[position])
+                        items = values[position + 1:position + 1 + size]
+                        position += 1 + size
+                        if prop[3] in ("vertex_indices", "vertex_index"):
+                            polygons.append([int(item) for item in items])
+                        elif prop[3] == "texcoord":
+                            wedges.append([(float(items[i]), float(items[i + 1])) for i in range(0, size - 1, 2)])
+
+    if vertices is None:
+        raise ValueError("PLY file without vertices: " + path)
+    triangles = np.array(fan_triangles(polygons), dtype=np.int64).reshape(-1, 3)
+    wedge_uvs = None
+    if wedges and len(wedges) == len(polygons):
+        wedge_uvs = np.array(fan_triangles(wedges), dtype=np.float64).reshape(-1, 3, 2)
+    return ply_mesh(path, vertices, triangles, wedge_uvs)
+
+def read_ply(path):
+    with open(path, "rb") as f:
+        header = f.read(512)
+    if b"format ascii" in header:
+        return read_ascii_ply(path)
+    return read_binary_ply(path)
+
+def read_stl(path):
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.read(84)
+    count = struct.unpack_from("<I", header, 80)[0] if len(header) == 84 else 0
+    if size == 84 + count * 50:
+        record = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attributes", "<u2")])
+        positions = np.fromfile(path, dtype=record, offset=84, count=count)["vertices"].reshape(-1, 3)
+    else:
+        with open(path, "r", errors="replace") as f:
+            values = re.findall(r"vertex\s+(\S+)\s+(\S+)\s+(\S+)", f.read())
+        positions = np.array(values, dtype=np.float64).reshape(-1, 3)
+    # STL has no shared vertices, clustering in simplify() or the vertex normals join them again
+    return make_mesh(positions, np.arange(positions.shape[0] // 3 * 3))
+
+#diffuse color and texture of each material in an MTL file
+def read_mtl(path):
+    materials = {}
+    current = None
+    if not os.path.exists(path):
+        print("Warning: material library not found: " + path)
+        return materials
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == "newmtl":
+                current = materials.setdefault(" ".join(words[1:]), { "color": BASE_COLOR.copy(), "texture": None })
+            elif current is not None and words[0] == "Kd" and len(words) >= 4:
+                current["color"] = np.array([float(words[1]), float(words[2]), float(words[3]), 1.0])
+            elif current is not None and words[0] == "map_Kd":
+                # options like -s or -bm come before the file name
+                current["texture"] = os.path.join(os.path.dirname(path), words[-1])
+    return materials
+
+#1-based OBJ index of a corner, relative indices resolved against the count of elements read so far
+def one_based(index, count):
+    return index if index > 0 else count + index + 1
+
+def read_obj(path):
+    positions, uvs = [], []
+    polygons, uv_polygons, polygon_materials = [], [], []
+    library, names, material = {}, [], 0
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            if line.startswith("v "):
+                positions.append(line.split()[1:4])
+            elif line.startswith("vt "):
+                uvs.append(line.split()[1:3])
+            elif line.startswith("f "):
+                corners = [corner.split("/") for corner in line.split()[1:]]
+                # negative (relative) indices count back from the elements read before this line
+                polygons.append([one_based(int(corner[0]), len(positions)) for corner in corners])
+                uv_polygons.append([one_based(int(corner[1]), len(uvs)) if len(corner) > 1 and corner[1] else 0 for corner in corners])
+                polygon_materials.append(material)
+            elif line.startswith("mtllib "):
+                library.update(read_mtl(os.path.join(os.path.dirname(path), line[7:].strip())))
+            elif line.startswith("usemtl "):
+                name = line[7:].strip()
+                if name not in names:
+                    names.append(name)
+                material = names.index(name)
+
+    positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+    triangles = np.array(fan_triangles(polygons), dtype=np.int64).reshape(-1, 3)
+    triangles = triangles - 1
+    material_index = np.repeat(np.array(polygon_materials, dtype=np.int64), [max(len(p) - 2, 0) for p in polygons])
+
+    corner_uvs = None
+    uv_triangles = np.array(fan_triangles(uv_polygons), dtype=np.int64).reshape(-1, 3)
+    if uvs and uv_triangles.size > 0 and (uv_triangles != 0).all():
+        uvs = np.array(uvs, dtype=np.float64).reshape(-1, 2)
+        corner_uvs = uvs[uv_triangles - 1]
+
+    materials = [library.get(name, { "color": BASE_COLOR, "texture": None }) for name in names]
+    return make_mesh(positions, triangles, corner_uvs, None, material_index if materials else None, materials)
+
+GLB_COMPONENTS = { 5120: np.int8, 5121: np.uint8, 5122: np.int16, 5123: np.uint16, 5125: np.uint32, 5126: np.float32 }
+GLB_TYPE_SIZES = { "SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16 }
+
+#accessor data as a float64 (or index) array, normalized integers are scaled to [0, 1] or [-1, 1]
+def glb_accessor(gltf, binary, index):
+    accessor = gltf["accessors"][index]
+    dtype = np.dtype(GLB_COMPONENTS[accessor["componentType"]])
+    size = GLB_TYPE_SIZES[accessor["type"]]
+    count = accessor["count"]
+    if "bufferView" not in accessor:
+        return np.zeros((count, size))
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    if "extensions" in view:
+        raise ValueError("compressed GLB buffer views (%s) are not supported" % ", ".join(view["extensions"]))
+    offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    stride = view.get("byteStride", dtype.itemsize * size)
+    data = np.ndarray((count, size), dtype=dtype.newbyteorder("<"), buffer=binary, offset=offset, strides=(stride, dtype.itemsize))
+    if accessor.get("normalized"):
+        info = np.iinfo(dtype)
+        return np.maximum(data / float(info.max), -1.0)
+    return data.astype(np.float64) if dtype.kind == "f" or size > 1 else data.astype(np.int64).ravel()
+
+def glb_node_matrix(node):
+    if "matrix" in node:
+        return np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T
+    x, y, z, w = node.get("rotation", [0.0, 0.0, 0.0, 1.0])
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.array(node.get("scale", [1.0, 1.0, 1.0]))
+    matrix[:3, 3] = node.get("translation", [0.0, 0.0, 0.0])
+    return matrix
+
+def glb_materials(gltf, binary, path):
+    materials = []
+    for material in gltf.get("materials", []):
+        pbr = material.get("pbrMetallicRoughness", {})
+        texture = None
+        if "baseColorTexture" in pbr:
+            source = gltf["textures"][pbr["baseColorTexture"]["index"]].get("source")
+            image = gltf["images"][source] if source is not None else {}
+            if "bufferView" in image:
+                view = gltf["bufferViews"][image["bufferView"]]
+                texture = binary[view.get("byteOffset", 0):view.get("byteOffset", 0) + view["byteLength"]]
+            elif "uri" in image and not image["uri"].startswith("data:"):
+                texture = os.path.join(os.path.dirname(path), image["uri"])
+        materials.append({ "color": np.array(pbr.get("baseColorFactor", [1.0, 1.0, 1.0, 1.0])), "texture": texture })
+    materials.append({ "color": BASE_COLOR, "texture": None })
+    return materials
+
+#all triangle primitives of the default scene in world space, glTF Y up is turned into Z up like Blender's importer
+def read_glb(path):
+    from GLBWriter import read_glb as read_glb_chunks
+    gltf, binary = read_glb_chunks(path)
+    materials = glb_materials(gltf, binary, path)
+    parts = []
+
+    def visit(node_index, parent):
+        node = gltf["nodes"][node_index]
+        matrix = parent @ glb_node_matrix(node)
+        if "mesh" in node:
+            for primitive in gltf["meshes"][node["mesh"]]["primitives"]:
+                if primitive.get("mode", 4) != 4 or "POSITION" not in primitive["attributes"]:
+                    continue
+                positions = glb_accessor(gltf, binary, primitive["attributes"]["POSITION"])
+                positions = positions @ matrix[:3, :3].T + matrix[:3, 3]
+                if "indices" in primitive:
+                    triangles = glb_accessor(gltf, binary, primitive["indices"]).reshape(-1, 3)
+                else:
+                    triangles = np.arange(positions.shape[0] // 3 * 3).reshape(-1, 3)
+                uvs = None
+                if "TEXCOORD_0" in primitive["attributes"]:
+                    uvs = glb_accessor(gltf, binary, primitive["attributes"]["TEXCOORD_0"]).copy()
+                    uvs[:, 1] = 1.0 - uvs[:, 1]
+                parts.append((positions, triangles, uvs, primitive.get("material", len(materials) - 1)))
+        for child in node.get("children", []):
+            visit(child, matrix)
+
+    scene = gltf.get("scenes", [{ "nodes": list(range(len(gltf.get("nodes", [])))) }])[gltf.get("scene", 0)]
+    y_up_to_z_up = np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 0.0, -1.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 0.0, 1.0]])
+    for node_index in scene.get("nodes", []):
+        visit(node_index, y_up_to_z_up)
+    if not parts:
+        raise ValueError("GLB file without triangle meshes: " + path)
+
+    offsets = np.cumsum([0] + [part[0].shape[0] for part in parts])
+    positions = np.vstack([part[0] for part in parts])
+    triangles = np.vstack([part[1] + offset for part, offset in zip(parts, offsets)])
+    material_index = np.concatenate([np.full(part[1].shape[0], part[3], dtype=np.int64) for part in parts])
+    corner_uvs = None
+    if any(part[2] is not None for part in parts):
+        corner_uvs = np.vstack([part[2][part[1]] if part[2] is not None else np.zeros((part[1].shape[0], 3, 2)) for part in parts])
+    return make_mesh(positions, triangles, corner_uvs, None, material_index, materials)
+
+MESH_READERS = { ".ply": read_ply, ".stl": read_stl, ".obj": read_obj, ".glb": read_glb }
+
+def read_mesh(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in MESH_READERS:
+        raise ValueError("unsupported file type: " + extension)
+    return MESH_READERS[extension](path)
+
+#RGBA texture as a float (h, w, 4) array, decoded with Pillow if it is installed. returns None without it.
+def load_texture(source):
+    if source is None:
+        return None
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Warning: Pillow is not installed, rendering without textures")
+        return None
+    import io
+    try:
+        image = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+        return np.asarray(image.convert("RGBA"), dtype=np.float32) / 255.0
+    except OSError as e:
+        print("Warning: can't read texture: %s" % e)
+        return None
+
+def write_png(path, pixels):
+    height, width = pixels.shape[:2]
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 1:] = pixels.reshape(height, -1)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+#view directions (from the object to the camera), same as BlenderScreenshot.py
+def preview_views(count, elevation, top_bottom):
+    views = []
+    for index in range(count):
+        angle = 2.0 * np.pi * index / count
+        views.append(("view_%02d" % index, np.array([np.sin(angle) * np.cos(elevation), -np.cos(angle) * np.cos(elevation), np.sin(elevation)])))
+    if top_bottom:
+        views.append(("top", np.array([0.0, 0.0, 1.0])))
+        views.append(("bottom", np.array([0.0, 0.0, -1.0])))
+    return views
+
+def bounding_sphere(positions):
+    if positions.shape[0] == 0:
+        return np.zeros(3), 1.0
+    lower, upper = positions.min(axis=0), positions.max(axis=0)
+    return (lower + upper) * 0.5, max(np.linalg.norm(upper - lower) * 0.5, 1e-6)
+
+#camera at the distance that fits the bounding sphere into the field of view, looking along -direction.
+#up is world Z, or world Y when looking straight up or down (like Blender's to_track_quat('-Z', 'Y')).
+def view_camera(center, radius, direction):
+    distance = radius / np.sin(PREVIEW_FOV * 0.5) * 1.05
+    forward = -direction / np.linalg.norm(direction)
+    up = np.array([0.0, 0.0, 1.0]) if abs(forward[2]) < 0.999 else np.array([0.0, 1.0, 0.0])
+    right = np.cross(forward, up)
+    right /= np.linalg.norm(right)
+    return { "position": center - forward * distance, "forward": forward, "right": right, "up": np.cross(right, forward) }
+
+#vertex clustering: vertices in the same grid cell are merged at their mean position, triangles that
+#collapse are dropped. texture coordinates stay per corner, so they don't blur across seams.
+def simplify(mesh, cell_size):
+    positions, triangles = mesh["positions"], mesh["triangles"]
+    used = np.zeros(positions.shape[0], dtype=bool)
+    used[triangles.ravel()] = True
+    keys = np.full(positions.shape[0], -1, dtype=np.int64)
+    cells = np.floor((positions[used] - positions[used].min(axis=0)) / cell_size).astype(np.int64)
+    cell_ids = cell_keys(cells)[0]
+    unique_cells, cluster = np.unique(cell_ids, return_inverse=True)
+    keys[used] = cluster
+
+    counts = np.bincount(cluster, minlength=unique_cells.size).astype(np.float64)[:, None]
+    clustered = np.stack([np.bincount(cluster, positions[used][:, axis], minlength=unique_cells.size) for axis in range(3)], axis=1) / counts
+    colors = None
+    if mesh["colors"] is not None:
+        colors = np.stack([np.bincount(cluster, mesh["colors"][used][:, axis], minlength=unique_cells.size) for axis in range(3)], axis=1) / counts
+
+    corners = keys[triangles]
+    keep = (corners[:, 0] != corners[:, 1]) & (corners[:, 1] != corners[:, 2]) & (corners[:, 2] != corners[:, 0])
+    result = dict(mesh)
+    result.update({
+        "positions": clustered,
+        "triangles": corners[keep],
+        "uvs": mesh["uvs"][keep] if mesh["uvs"] is not None else None,
+        "colors": colors,
+        "materialIndex": mesh["materialIndex"][keep]
+    })
+    return result
+
+#area weighted vertex normals
+def vertex_normals(positions, triangles):
+    corners = positions[triangles]
+    face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals = np.stack([np.bincount(triangles.ravel(), np.repeat(face_normals[:, axis], 3), minlength=positions.shape[0]) for axis in range(3)], axis=1)
+    return normals / np.maximum(np.linalg.norm(normals, axis=1), 1e-30)[:, None]
+
+#pixel centers inside triangles given by (m, 3) corner coordinates in pixels, in chunks of candidates.
+#yields the triangles, pixel x and y, and the barycentric coordinates of the first two corners.
+def covered_pixels(x, y, width, height, valid=None):
+    area = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0])
+    # pixel centers are at +0.5, the bounding box covers the centers inside the triangle's extent
+    # (elementwise minimum and maximum of the columns is much faster than reducing short rows)
+    x_min = np.maximum(np.ceil(np.minimum(np.minimum(x[:, 0], x[:, 1]), x[:, 2]) - 0.5), 0)
+    x_max = np.minimum(np.floor(np.maximum(np.maximum(x[:, 0], x[:, 1]), x[:, 2]) - 0.5), width - 1)
+    y_min = np.maximum(np.ceil(np.minimum(np.minimum(y[:, 0], y[:, 1]), y[:, 2]) - 0.5), 0)
+    y_max = np.minimum(np.floor(np.maximum(np.maximum(y[:, 0], y[:, 1]), y[:, 2]) - 0.5), height - 1)
+    inside_box = (np.abs(area) > 1e-12) & (x_max >= x_min) & (y_max >= y_min)
+    ids = np.flatnonzero(inside_box if valid is None else inside_box & valid)
+
+    # edge functions as affine functions of the pixel position: w = a * px + b * py + c
+    inverse_area = 1.0 / area[ids]
+    x0, x1, x2 = x[ids].T
+    y0, y1, y2 = y[ids].T
+    coefficients = np.stack((
+        (y1 - y2) * inverse_area, (x2 - x1) * inverse_area, (x1 * y2 - x2 * y1) * inverse_area,
+        (y2 - y0) * inverse_area, (x0 - x2) * inverse_area, (x2 * y0 - x0 * y2) * inverse_area), axis=1)
+    box_x = x_min[ids].astype(np.int64)
+    box_y = y_min[ids].astype(np.int64)
+    box_width = (x_max[ids] - x_min[ids] + 1).astype(np.int64)
+    counts = box_width * (y_max[ids] - y_min[ids] + 1).astype(np.int64)
+
+    ends = np.cumsum(counts)
+    start = 0
+    while start < ids.size:
+        # triangles whose candidates fit into a chunk, at least one
+        stop = max(int(np.searchsorted(ends, (ends[start - 1] if start > 0 else 0) + CANDIDATE_CHUNK, side="right")), start + 1)
+        chunk_counts = counts[start:stop]
+        local = np.repeat(np.arange(start, stop), chunk_counts)
+        offsets = np.arange(local.size) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+        px = box_x[local] + offsets % box_width[local]
+        py = box_y[local] + offsets // box_width[local]
+        center_x, center_y = px + 0.5, py + 0.5
+
+        c = coefficients[local]
+        w0 = c[:, 0] * center_x + c[:, 1] * center_y + c[:, 2]
+        w1 = c[:, 3] * center_x + c[:, 4] * center_y + c[:, 5]
+        inside = (w0 >= 0) & (w1 >= 0) & (w0 + w1 <= 1.0)
+        yield ids[local[inside]], px[inside], py[inside], w0[inside], w1[inside]
+        start = stop
+
+#rasterize triangles into a z-buffer: per pixel the nearest triangle (-1 if none) and its perspective
+#correct barycentric coordinates of the first two corners
+def rasterize(view_positions, triangles, width, height, focal):
+    depth = view_positions[:, 2]
+    screen_x = view_positions[:, 0] / depth * focal + width * 0.5
+    screen_y = height * 0.5 - view_positions[:, 1] / depth * focal
+    z = depth[triangles]
+    inverse_depth = 1.0 / z
+    in_front = np.minimum(np.minimum(z[:, 0], z[:, 1]), z[:, 2]) > 0
+
+    nearest = np.zeros(width * height)
+    triangle = np.full(width * height, -1, dtype=np.int64)
+    weights = np.zeros((width * height, 2))
+
+    for faces, px, py, w0, w1 in covered_pixels(screen_x[triangles], screen_y[triangles], width, height, in_front):
+        pixel = py * width + px
+        # 1/z is linear in screen space, the largest value is the nearest surface
+        d = inverse_depth[faces]
+        inverse_z = w0 * d[:, 0] + w1 * d[:, 1] + (1.0 - w0 - w1) * d[:, 2]
+        order = np.lexsort((-inverse_z, pixel))
+        pixel, inverse_z = pixel[order], inverse_z[order]
+        first = np.ones(pixel.size, dtype=bool)
+        first[1:] = pixel[1:] != pixel[:-1]
+        winner = order[first]
+        pixel, inverse_z = pixel[first], inverse_z[first]
+        closer = inverse_z > nearest[pixel]
+        winner, pixel, inverse_z = winner[closer], pixel[closer], inverse_z[closer]
+
+        nearest[pixel] = inverse_z
+        triangle[pixel] = faces[winner]
+        weights[pixel, 0] = w0[winner] * d[winner, 0] / inverse_z
+        weights[pixel, 1] = w1[winner] * d[winner, 1] / inverse_z
+
+    return triangle, weights
+
+#nearest texel lookup with wrapping, v = 0 is the bottom row
+def sample_texture(texture, uvs):
+    height, width = texture.shape[:2]
+    x = (np.mod(uvs[:, 0], 1.0) * width).astype(np.int64).clip(0, width - 1)
+    y = ((1.0 - np.mod(uvs[:, 1], 1.0)) * height).astype(np.int64).clip(0, height - 1)
+    return texture[y, x]
+
+#color of covered pixels: material color, times texture and vertex colors, lit by a headlight
+def shade(mesh, normals, textures, triangle, weights, camera):
+    covered = np.flatnonzero(triangle >= 0)
+    faces = triangle[covered]
+    w = np.empty((covered.size, 3))
+    w[:, :2] = weights[covered]
+    w[:, 2] = 1.0 - w[:, 0] - w[:, 1]
+
+    corners = mesh["triangles"][faces]
+    normal = np.einsum("ij,ijk->ik", w, normals[corners])
+    normal /= np.maximum(np.linalg.norm(normal, axis=1), 1e-30)[:, None]
+    light = AMBIENT + (1.0 - AMBIENT) * np.abs(normal @ camera["forward"])
+
+    material_index = mesh["materialIndex"][faces]
+    colors = np.array([material["color"] for material in mesh["materials"]], dtype=np.float64)
+    color = colors[np.clip(material_index, 0, len(colors) - 1)]
+    if mesh["uvs"] is not None:
+        for index, texture in enumerate(textures):
+            if texture is None:
+                continue
+            selected = np.flatnonzero(material_index == index)
+            uvs = np.einsum("ij,ijk->ik", w[selected], mesh["uvs"][faces[selected]])
+            color[selected] *= sample_texture(texture, uvs)
+    if mesh["colors"] is not None:
+        color[:, :3] *= np.einsum("ij,ijk->ik", w, mesh["colors"][corners])
+
+    rgba = np.zeros((triangle.size, 4))
+    rgba[covered, :3] = color[:, :3] * light[:, None]
+    rgba[covered, 3] = 1.0
+    return rgba
+
+#render one view as an (h, w, 4) uint8 image, supersampled by the given factor
+def render_view(mesh, normals, textures, center, radius, direction, resolution, supersample=1):
+    camera = view_camera(center, radius, direction)
+    size = resolution * supersample
+    focal = size * 0.5 / np.tan(PREVIEW_FOV * 0.5)
+    relative = mesh["positions"] - camera["position"]
+    view_positions = np.stack((relative @ camera["right"], relative @ camera["up"], relative @ camera["forward"]), axis=1)
+
+    triangle, weights = rasterize(view_positions, mesh["triangles"], size, size, focal)
+    rgba = shade(mesh, normals, textures, triangle, weights, camera).reshape(size, size, 4)
+    if supersample > 1:
+        # average with alpha weights, so the background doesn't darken edges
+        blocks = rgba.reshape(resolution, supersample, resolution, supersample, 4)
+        alpha = blocks[..., 3].sum(axis=(1, 3))
+        rgb = (blocks[..., :3] * blocks[..., 3:]).sum(axis=(1, 3)) / np.maximum(alpha, 1e-12)[..., None]
+        rgba = np.concatenate((rgb, (alpha / (supersample * supersample))[..., None]), axis=2)
+    return (np.clip(rgba, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+#simplify meshes with more triangles than the image can show, cells are a fraction of a pixel at the center
+def prepare_mesh(mesh, resolution, adaptive=True):
+    center, radius = bounding_sphere(mesh["positions"][np.unique(mesh["triangles"])] if mesh["triangles"].size else mesh["positions"])
+    if adaptive and mesh["triangles"].shape[0] > SIMPLIFY_TRIANGLES_PER_PIXEL * resolution * resolution:
+        distance = radius / np.sin(PREVIEW_FOV * 0.5) * 1.05
+        pixel_size = 2.0 * distance * np.tan(PREVIEW_FOV * 0.5) / resolution
+        mesh = simplify(mesh, pixel_size * SIMPLIFY_CELL_PIXELS)
+    return mesh, center, radius
+
+#combine view images into one sprite sheet, one row per list of images, as wide as the longest row
+#(same layout as BlenderScreenshot.py)
+def write_sprite_sheet(rows, save_file):
+    height, width = rows[0][0].shape[:2]
+    columns = max(len(row) for row in rows)
+    sheet = np.zeros((len(rows) * height, columns * width, 4), dtype=np.uint8)
+    for row, images in enumerate(rows):
+        for column, pixels in enumerate(images):
+            sheet[row * height:(row + 1) * height, column * width:(column + 1) * width] = pixels
+    write_png(save_file, sheet)
+
+#render all views of one model, returns timings like BlenderScreenshot.py's preview session
+def render_preview(file_path, args):
+    start = time.perf_counter()
+    report = { "file": file_path, "views": [] }
+    mesh = read_mesh(file_path)
+    report["importSeconds"] = time.perf_counter() - start
+    report["numFaces"] = int(mesh["triangles"].shape[0])
+
+    prepare_start = time.perf_counter()
+    mesh, center, radius = prepare_mesh(mesh, args.resolution * args.supersample, args.simplify)
+    normals = vertex_normals(mesh["positions"], mesh["triangles"])
+    textures = [load_texture(material["texture"]) for material in mesh["materials"]] if mesh["uvs"] is not None else []
+    report["renderedFaces"] = int(mesh["triangles"].shape[0])
+    report["prepareSeconds"] = time.perf_counter() - prepare_start
+
+    base = os.path.splitext(os.path.basename(file_path))[0]
+    directory = args.output_dir or os.path.dirname(file_path)
+    images = []
+    for name, direction in preview_views(args.views, np.radians(args.elevation), args.top_bottom):
+        view_start = time.perf_counter()
+        image = render_view(mesh, normals, textures, center, radius, direction, args.resolution, args.supersample)
+        file = os.path.join(directory, "%s_%s.png" % (base, name))
+        write_png(file, image)
+        images.append(image)
+        seconds = time.perf_counter() - view_start
+        report["views"].append({ "name": name, "file": file, "seconds": seconds })
+        print("Rendered %s %s in %.2fs" % (base, name, seconds))
+
+    if args.sprite_sheet and images:
+        sprite_start = time.perf_counter()
+        report["spriteSheet"] = os.path.join(directory, base + "_sprites.png")
+        # turntable views in the first row, top and bottom in their own
+        rows = [row for row in (images[:args.views], images[args.views:]) if row]
+        write_sprite_sheet(rows, report["spriteSheet"])
+        report["spriteSeconds"] = time.perf_counter() - sprite_start
+
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+#bumpy sphere test mesh with roughly the requested number of triangles
+def sphere_mesh(triangle_count):
+    rings = max(4, int(np.sqrt(triangle_count / 4)))
+    segments = 2 * rings
+    theta, phi = np.meshgrid(np.linspace(0.0, np.pi, rings + 1), np.linspace(0.0, 2.0 * np.pi, segments + 1), indexing="ij")
+    radius = 1.0 + 0.03 * np.sin(theta * 40.0) * np.cos(phi * 30.0)
+    positions = np.stack((radius * np.sin(theta) * np.cos(phi), radius * np.sin(theta) * np.sin(phi), radius * np.cos(theta)), axis=-1).reshape(-1, 3)
+    quad = np.arange((rings + 1) * (segments + 1), dtype=np.int64).reshape(rings + 1, segments + 1)[:-1, :-1].ravel()
+    row = segments + 1
+    triangles = np.stack((quad, quad + row, quad + 1, quad + 1, quad + row, quad + row + 1), axis=1).reshape(-1, 3)
+    uvs = np.stack((phi.ravel() / (2.0 * np.pi), 1.0 - theta.ravel() / np.pi), axis=1)
+    return make_mesh(positions, triangles, uvs[triangles])
+
+#images per second on one core for a generated mesh, with and without adaptive simplification
+def benchmark(triangle_count, resolution, views, full):
+    mesh = sphere_mesh(triangle_count)
+    directions = [direction for _, direction in preview_views(views, np.radians(20.0), True)]
+    report = { "numFaces": int(mesh["triangles"].shape[0]), "resolution": resolution, "numImages": len(directions) }
+
+    variants = [("simplified", True)] + ([("full", False)] if full else [])
+    for name, adaptive in variants:
+        start = time.perf_counter()
+        prepared, center, radius = prepare_mesh(mesh, resolution, adaptive)
+        normals = vertex_normals(prepared["positions"], prepared["triangles"])
+        prepare_seconds = time.perf_counter() - start
+        render_start = time.perf_counter()
+        for direction in directions:
+            render_view(prepared, normals, [], center, radius, direction, resolution)
+        render_seconds = time.perf_counter() - render_start
+        report[name] = {
+            "renderedFaces": int(prepared["triangles"].shape[0]),
+            "prepareSeconds": prepare_seconds,
+            "secondsPerImage": render_seconds / len(directions),
+            "imagesPerSecond": len(directions) / (prepare_seconds + render_seconds)
+        }
+        print("%s: %d faces, %.3fs per image, %.2f images/s" % (name, prepared["triangles"].shape[0], render_seconds / len(directions), report[name]["imagesPerSecond"]))
+    return report
+
+if __name__ == "__main__":
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
+
+    parser = argparse.ArgumentParser(description="Render preview views with a NumPy software rasterizer")
+    parser.add_argument("-i", "--inputs", required=False, nargs="+", help="Input mesh files (.ply, .stl, .obj, .glb)")
+    parser.add_argument("-o", "--output_dir", required=False, help="Output directory (default: directory of each input)")
+    parser.add_argument("-v", "--views", required=False, default=8, type=int, help="Number of turntable views")
+    parser.add_argument("-el", "--elevation", required=False, default=20.0, type=float, help="Turntable camera elevation in degrees")
+    parser.add_argument("-tb", "--top_bottom", required=False, default=True, type=convert, help="Render top and bottom views")
+    parser.add_argument("-r", "--resolution", required=False, default=512, type=int, help="Image width and height")
+    parser.add_argument("-aa", "--supersample", required=False, default=1, type=int, help="Supersampling factor per axis")
+    parser.add_argument("-sm", "--simplify", required=False, default=True, type=convert, help="Simplify meshes with more triangles than pixels")
+    parser.add_argument("-ss", "--sprite_sheet", required=False, default=True, type=convert, help="Write a sprite sheet of all views")
+    parser.add_argument("-b", "--benchmark", required=False, type=int, help="Benchmark triangle count, renders a generated mesh")
+    parser.add_argument("-bf", "--benchmark_full", required=False, default=False, type=convert, help="Also benchmark without simplification")
+    args = parser.parse_args(argv)
+
+    if args.benchmark is not None:
+        print("JSON=" + json.dumps(benchmark(args.benchmark, args.resolution, args.views, args.benchmark_full)))
+        sys.exit(0)
+
+    if not args.inputs:
+        print("Error: no input files")
+        sys.exit(1)
+    try:
+        reports = [render_preview(file_path, args) for file_path in args.inputs]
+    except ValueError as e:
+        print("Error: %s" % e)
+        sys.exit(1)
+    print("PREVIEW=" + json.dumps(reports))
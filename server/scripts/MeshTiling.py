@@ -0,0 +1,433 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+import xml.etree.ElementTree as ET
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from MeshCleanup import weld_vertices
+from PlyIO import read_ply_header, map_element, face_indices, positions, write_ply_header, face_records, little_endian, write_ply, read_ply
+
+# Out-of-core processing of meshes too large to load at once. The input (binary PLY, OBJ is converted
+# first) is read through memory maps in chunks and split into blocks on a regular grid: every face
+# belongs to the block containing its centroid, and each block file also holds the faces whose centroids
+# lie within an overlap margin, so filters see the surrounding surface. Blocks are filtered in a process
+# pool. The block's own faces are selected and decimation runs on the selection only, with boundaries
+# preserved: vertices touching the overlap faces (the cut) are frozen, so neighboring blocks keep the same
+# seam vertices. Afterwards only the selected faces are kept (by centroid for filters that drop the
+# selection), so every part of the surface comes from exactly one block. The blocks are stitched by
+# welding the vertices along the cuts.
+
+# estimated PyMeshLab memory per face, including vertices and filter working memory
+BYTES_PER_FACE = 400
+
+# memory per face of a chunk while splitting (indices, corner positions, block assignments)
+SPLIT_BYTES_PER_FACE = 400
+
+# share of the memory limit for the main process, the rest is divided among the pool processes
+MAIN_MEMORY_SHARE = 0.25
+
+# convert an OBJ file to binary PLY (positions and triangulated faces) line chunk by line chunk,
+# texture coordinates and normals are not kept
+def obj_to_ply(path, ply_path, chunk_lines=1000000):
+    vertex_path, face_path = ply_path + ".vertices", ply_path + ".faces"
+    vertex_count, face_count = 0, 0
+    with open(path, "r", errors="replace") as obj, open(vertex_path, "wb") as vertex_file, open(face_path, "wb") as face_file:
+        while True:
+            lines = obj.readlines(chunk_lines * 40)
+            if not lines:
+                break
+            vertices = [line[2:] for line in lines if line.startswith("v ")]
+            if vertices:
+                values = np.array(" ".join(" ".join(v.split()[:3]) for v in vertices).split(), dtype=np.float32).reshape(-1, 3)
+                vertex_file.write(values.tobytes())
+            triangles = []
+            # vertices of the chunk before the current line
+            before = 0
+            for line in lines:
+                if line.startswith("v "):
+                    before += 1
+                    continue
+                if not line.startswith("f "):
+                    continue
+                corners = [int(word.split("/")[0]) for word in line.split()[1:]]
+                # relative (negative) indices count back from the vertices read so far
+                corners = [c - 1 if c > 0 else vertex_count + before + c for c in corners]
+                triangles += [(corners[0], corners[i], corners[i + 1]) for i in range(1, len(corners) - 1)]
+            vertex_count += len(vertices)
+            if triangles:
+                face_file.write(face_records(np.array(triangles, dtype=np.int64)).tobytes())
+                face_count += len(triangles)
+
+    with open(ply_path, "wb") as f:
+        write_ply_header(f, np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4")]), vertex_count, face_count)
+        for part in (vertex_path, face_path):
+            with open(part, "rb") as source:
+                shutil.copyfileobj(source, f)
+            os.remove(part)
+
+# grid with at least the given number of blocks, cells as close to cubes as possible
+def block_grid(lower, upper, blocks):
+    extent = np.maximum(upper - lower, 1e-12)
+    cell = (np.prod(extent) / max(blocks, 1)) ** (1.0 / 3.0)
+    shape = np.maximum(np.ceil(extent / cell), 1).astype(np.int64)
+    while np.prod(shape) < blocks:
+        shape[np.argmax(extent / shape)] += 1
+    return { "lower": lower, "size": extent / shape, "shape": shape }
+
+def grid_cells(points, grid):
+    cells = np.floor((points - grid["lower"]) / grid["size"]).astype(np.int64)
+    return np.clip(cells, 0, grid["shape"] - 1)
+
+def block_index(cells, grid):
+    return np.ravel_multi_index(tuple(cells.T), tuple(grid["shape"]))
+
+def face_centroids(path, header, start, stop):
+    faces = face_indices(map_element(path, header["face"], start, stop))
+    vertices = map_element(path, header["vertex"])
+    corners = positions(vertices[faces.ravel()]).reshape(-1, 3, 3)
+    return corners.mean(axis=1)
+
+# split the mesh into blocks: every block gets a file with the indices of its own faces and the faces
+# within the overlap margin. returns the grid and the block face counts.
+def split_mesh(path, header, directory, face_budget, overlap, chunk):
+    lower, upper = np.full(3, np.inf), np.full(3, -np.inf)
+    for start in range(0, header["vertex"]["count"], chunk):
+        points = positions(map_element(path, header["vertex"], start, start + chunk))
+        lower, upper = np.minimum(lower, points.min(axis=0)), np.maximum(upper, points.max(axis=0))
+
+    face_count = header["face"]["count"]
+    grid = block_grid(lower, upper, int(np.ceil(face_count * (1.0 + overlap) ** 3 / face_budget)))
+    margin = grid["size"] * overlap
+    counts = np.zeros(int(np.prod(grid["shape"])), dtype=np.int64)
+
+    files = {}
+    try:
+        for start in range(0, face_count, chunk):
+            centroids = face_centroids(path, header, start, start + chunk)
+            ids = np.arange(start, start + centroids.shape[0], dtype=np.int64)
+            low, high = grid_cells(centroids - margin, grid), grid_cells(centroids + margin, grid)
+            # a face lies in at most two cells per axis (the margin is below half a cell)
+            pairs = []
+            for corner in range(8):
+                pick = np.array([(corner >> axis) & 1 for axis in range(3)], dtype=bool)
+                cells = np.where(pick, high, low)
+                valid = ~(pick & (high == low)).any(axis=1)
+                pairs.append(np.stack((block_index(cells[valid], grid), ids[valid]), axis=1))
+            pairs = np.concatenate(pairs)
+            pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+            blocks, first = np.unique(pairs[:, 0], return_index=True)
+            for block, part in zip(blocks, np.split(pairs[:, 1], first[1:])):
+                if block not in files:
+                    files[block] = open(os.path.join(directory, "block_%05d.faces" % block), "wb")
+                files[block].write(part.tobytes())
+                counts[block] += part.size
+    finally:
+        for f in files.values():
+            f.close()
+
+    return grid, counts
+
+# decimation parameters freezing the cut: only selected faces (the block's own) are simplified, and
+# boundaries are preserved for cuts without overlap faces
+SEAM_PARAMS = { "Selected": True, "PreserveBoundary": True }
+
+# adapt filter parameters to a block: absolute face count targets (decimation) are scaled to the share
+# of faces the block owns, percentages refer to the diagonal of the whole mesh instead of the block.
+# decimation filters get the SEAM_PARAMS.
+def scale_filters(filters, ratio, diagonal):
+    if filters is None:
+        return None
+    import pymeshlab
+    absolute_value = getattr(pymeshlab, "PureValue", None) or pymeshlab.AbsoluteValue
+    result = []
+    for filter in filters:
+        params = dict(filter.get("params", {}))
+        for name, value in params.items():
+            if name.lower() == "targetfacenum":
+                params[name] = max(int(round(value * ratio)), 4)
+            elif isinstance(value, str) and value.endswith("%"):
+                params[name] = absolute_value(float(value[:-1]) * 0.01 * diagonal)
+        if any(name.lower() in ("targetfacenum", "targetperc") for name in params):
+            params = { name: value for name, value in params.items() if name.lower() not in (key.lower() for key in SEAM_PARAMS) }
+            params.update(SEAM_PARAMS)
+        result.append({ "name": filter["name"], "params": params })
+    return result
+
+def scale_filter_script(script, ratio, path):
+    if script is None:
+        return None
+    tree = ET.parse(script)
+    seam_params = { name.lower() for name in SEAM_PARAMS }
+    for filter in tree.getroot():
+        params = filter.findall("Param")
+        decimation = any(param.get("name", "").lower() == "targetfacenum" for param in params)
+        for param in params:
+            name = param.get("name", "").lower()
+            if name == "targetfacenum":
+                param.set("value", str(max(int(round(float(param.get("value")) * ratio)), 4)))
+            elif decimation and name in seam_params:
+                param.set("value", "true")
+    with open(path, "wb") as f:
+        f.write(b"<!DOCTYPE FilterScript>\n" + ET.tostring(tree.getroot()) + b"\n")
+    return path
+
+# vertices on open edges (used by one face only), the cuts between blocks are among them
+def boundary_vertices(faces):
+    edges = np.sort(np.stack((faces, np.roll(faces, -1, axis=1)), axis=2).reshape(-1, 2), axis=1)
+    edges, counts = np.unique(edges, axis=0, return_counts=True)
+    return np.unique(edges[counts == 1])
+
+# apply the first filter of the given names that the PyMeshLab version has (filters were renamed in 2022.2)
+def apply_named_filter(ms, names, **params):
+    import pymeshlab
+    name = next((name for name in names if hasattr(pymeshlab.MeshSet, name)), names[0])
+    ms.apply_filter(name, **params)
+
+# process a block in a pool worker: write the block mesh, filter it with PyMeshLab, keep the block's
+# own faces and write the result with the vertices along its boundary
+def process_block(task):
+    import pymeshlab
+    from MeshLabExecuteFilter import apply_filters, memory_usage
+
+    start = time.perf_counter()
+    path, header, directory, index = task["input"], task["header"], task["directory"], task["index"]
+    name = os.path.join(directory, "block_%05d" % index)
+
+    ids = np.fromfile(name + ".faces", dtype=np.int64)
+    faces = face_indices(map_element(path, header["face"])[ids])
+    vertices = map_element(path, header["vertex"])
+    # the block's own faces (quality 1) are selected, the overlap faces (quality 0) only give context
+    own = block_index(grid_cells(positions(vertices[faces.ravel()]).reshape(-1, 3, 3).mean(axis=1), task["grid"]), task["grid"]) == index
+    used, faces = np.unique(faces, return_inverse=True)
+    write_ply(name + ".ply", np.array(vertices[used]), faces.reshape(-1, 3), own.astype(np.float32))
+    own_count = int(own.sum())
+    del faces, used, own
+    os.remove(name + ".faces")
+
+    ms = pymeshlab.MeshSet()
+    ms.load_new_mesh(name + ".ply")
+    apply_named_filter(ms, ["compute_selection_by_condition_per_face", "conditional_face_selection"], condselect="fq > 0.5")
+    # targets are shared by the faces the block owns, the overlap faces belong to its neighbors
+    ratio = own_count / header["face"]["count"]
+    diagonal = float(np.linalg.norm(task["grid"]["size"] * task["grid"]["shape"]))
+    apply_filters(ms, scale_filters(task["filters"], ratio, diagonal), scale_filter_script(task["script"], ratio, name + ".mlx"))
+    # remove the overlap faces, unless a filter dropped the selection
+    selected = ms.current_mesh().selected_face_number() > 0
+    if selected:
+        apply_named_filter(ms, ["apply_selection_inverse", "invert_selection"], invfaces=True, invverts=False)
+        apply_named_filter(ms, ["meshing_remove_selected_faces", "delete_selected_faces"])
+        apply_named_filter(ms, ["meshing_remove_unreferenced_vertices", "remove_unreferenced_vertices"])
+    ms.save_current_mesh(name + "_filtered.ply", binary=True, save_vertex_normal=task["writeNormals"], save_wedge_texcoord=False, save_face_quality=False)
+    ms = None
+
+    vertices, faces = read_ply(name + "_filtered.ply")
+    keep = np.ones(faces.shape[0], dtype=bool)
+    if not selected:
+        corners = positions(vertices[faces.ravel()]).reshape(-1, 3, 3)
+        keep = block_index(grid_cells(corners.mean(axis=1), task["grid"]), task["grid"]) == index
+    used, faces = np.unique(faces[keep], return_inverse=True)
+    faces = faces.reshape(-1, 3)
+    write_ply(name + "_result.ply", vertices[used], faces)
+    np.save(name + "_seam.npy", boundary_vertices(faces))
+    for suffix in (".ply", "_filtered.ply", ".mlx"):
+        if os.path.exists(name + suffix):
+            os.remove(name + suffix)
+
+    return {
+        "index": index,
+        "result": name + "_result.ply",
+        "seam": name + "_seam.npy",
+        "inputFaces": int(ids.size),
+        "numVertices": int(used.size),
+        "numFaces": int(faces.shape[0]),
+        "seconds": time.perf_counter() - start,
+        "peakRSS": memory_usage()[1]
+    }
+
+# stitch block results into one PLY file. vertices on the boundaries of the blocks are welded with the
+# weld distance (0: identical positions), faces collapsed by welding are removed.
+def stitch_blocks(results, output, weld_distance):
+    headers = [read_ply_header(result["result"]) for result in results]
+    vertex_dtype = headers[0]["vertex"]["dtype"] if headers else np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4")])
+    if any(header["vertex"]["dtype"] != vertex_dtype for header in headers):
+        raise ValueError("blocks have different vertex properties")
+
+    offsets = np.cumsum([0] + [header["vertex"]["count"] for header in headers])
+    seam_ids, seam_positions = [], []
+    for result, header, offset in zip(results, headers, offsets):
+        seam = np.load(result["seam"])
+        seam_ids.append(seam + offset)
+        seam_positions.append(positions(map_element(result["result"], header["vertex"])[seam]))
+
+    seam_ids = np.concatenate(seam_ids) if seam_ids else np.zeros(0, dtype=np.int64)
+    removed, targets = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    if seam_ids.size > 0:
+        remap = weld_vertices(np.concatenate(seam_positions), weld_distance)
+        welded = remap != np.arange(remap.size)
+        removed, targets = seam_ids[welded], seam_ids[remap[welded]]
+        order = np.argsort(removed)
+        removed, targets = removed[order], targets[order]
+
+    # renumber faces: welded vertices point to their target, then indices close the gaps of removed vertices
+    face_parts = []
+    for result, header, offset in zip(results, headers, offsets):
+        faces = face_indices(map_element(result["result"], header["face"])) + offset
+        slot = np.minimum(np.searchsorted(removed, faces), max(removed.size - 1, 0))
+        if removed.size > 0:
+            faces = np.where(removed[slot] == faces, targets[slot], faces)
+        faces -= np.searchsorted(removed, faces)
+        faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])]
+        np.save(result["result"] + ".npy", faces)
+        face_parts.append(faces.shape[0])
+
+    vertex_count = int(offsets[-1] - removed.size)
+    with open(output, "wb") as f:
+        write_ply_header(f, vertex_dtype, vertex_count, sum(face_parts))
+        for result, header, offset in zip(results, headers, offsets):
+            vertices = map_element(result["result"], header["vertex"])
+            local = removed[(removed >= offset) & (removed < offset + vertices.size)] - offset
+            keep = np.ones(vertices.size, dtype=bool)
+            keep[local] = False
+            f.write(little_endian(np.asarray(vertices[keep])).tobytes())
+        for result in results:
+            f.write(face_records(np.load(result["result"] + ".npy")).tobytes())
+
+    return { "numVertices": vertex_count, "numFaces": int(sum(face_parts)), "weldedVertices": int(removed.size) }
+
+# run a filter job (see MeshLabExecuteFilter.py) block by block. job["tiling"] holds the memory limit in
+# bytes, the overlap as fraction of the block size, the weld distance and the number of processes.
+def run_tiled(job):
+    from MeshLabExecuteFilter import memory_usage
+
+    start = time.perf_counter()
+    tiling = job["tiling"]
+    processes = tiling.get("processes") or os.cpu_count() or 1
+    memory_limit = tiling["memoryLimit"]
+    overlap = min(max(tiling.get("overlap", 0.05), 0.0), 0.45)
+    chunk = max(int(MAIN_MEMORY_SHARE * memory_limit / SPLIT_BYTES_PER_FACE), 10000)
+
+    if job.get("levels"):
+        raise ValueError("tiled processing doesn't support level pyramids")
+    if job["writeTexCoords"]:
+        print("Warning: texture coordinates are not kept in tiled processing")
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(job["output"])) as directory:
+        path = job["input"]
+        if os.path.splitext(path)[1].lower() == ".obj":
+            path = os.path.join(directory, "input.ply")
+            obj_to_ply(job["input"], path, chunk)
+            print("Converted OBJ to PLY in %.2fs" % (time.perf_counter() - start))
+        header = read_ply_header(path)
+
+        # each of the pool processes works on one block at a time
+        face_budget = max((1.0 - MAIN_MEMORY_SHARE) * memory_limit / processes / BYTES_PER_FACE, 1000)
+        grid, counts = split_mesh(path, header, directory, face_budget, overlap, chunk)
+        blocks = np.flatnonzero(counts)
+        print("Split %d faces into %d blocks (grid %s) in %.2fs" % (header["face"]["count"], blocks.size,
+            "x".join(str(n) for n in grid["shape"]), time.perf_counter() - start))
+
+        tasks = [{
+            "input": path, "header": header, "directory": directory, "index": int(index), "grid": grid,
+            "filters": job.get("filters"), "script": job.get("script"), "writeNormals": job["writeNormals"]
+        } for index in blocks[np.argsort(-counts[blocks], kind="stable")]]
+
+        results = []
+        with multiprocessing.Pool(min(processes, max(len(tasks), 1)), maxtasksperchild=1) as pool:
+            for result in pool.imap_unordered(process_block, tasks):
+                print("Block %d: %d -> %d faces in %.2fs" % (result["index"], result["inputFaces"], result["numFaces"], result["seconds"]))
+                results.append(result)
+        results.sort(key=lambda result: result["index"])
+
+        stitched = job["output"]
+        if os.path.splitext(stitched)[1].lower() != ".ply":
+            stitched = os.path.join(directory, "stitched.ply")
+        report = stitch_blocks(results, stitched, tiling.get("weldDistance", 0.0))
+        if stitched != job["output"]:
+            import pymeshlab
+            ms = pymeshlab.MeshSet()
+            ms.load_new_mesh(stitched)
+            ms.save_current_mesh(job["output"], save_vertex_normal=job["writeNormals"], save_wedge_texcoord=False)
+
+    report.update({
+        "seconds": time.perf_counter() - start,
+        "blocks": len(results),
+        "processes": processes,
+        "memoryLimit": memory_limit,
+        "peakRSS": memory_usage()[1],
+        "workerPeakRSS": max([result["peakRSS"] or 0 for result in results] + [0])
+    })
+    print("Stitched %d vertices, %d faces (%d welded vertices) in %.2fs" % (report["numVertices"], report["numFaces"], report["weldedVertices"], report["seconds"]))
+    print("TILING=" + json.dumps(report))
+    return report
+
+# bumpy height field as a binary PLY file, written row chunk by row chunk
+def write_height_field(path, triangle_count):
+    size = max(2, int(np.sqrt(triangle_count / 2)) + 1)
+    rows = max(1, 2000000 // size)
+    with open(path, "wb") as f:
+        write_ply_header(f, np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4")]), size * size, 2 * (size - 1) ** 2)
+        u = np.linspace(0.0, 1.0, size)
+        for row in range(0, size, rows):
+            v = np.linspace(0.0, 1.0, size)[row:row + rows]
+            x, z = np.meshgrid(u, v)
+            y = 0.02 * np.sin(40.0 * x) * np.cos(30.0 * z)
+            f.write(np.stack((x, y, z), axis=2).astype("<f4").tobytes())
+        for row in range(0, size - 1, rows):
+            quad = (np.arange(row, min(row + rows, size - 1))[:, None] * size + np.arange(size - 1)[None, :]).ravel()
+            triangles = np.stack((quad, quad + size, quad + 1, quad + 1, quad + size, quad + size + 1), axis=1).reshape(-1, 3)
+            f.write(face_records(triangles).tobytes())
+
+# run MeshLabExecuteFilter.py in a child process, returns wall time, peak RSS and the last JSON report line
+def run_filter_process(arguments):
+    start = time.perf_counter()
+    script = os.path.join(os.path.dirname(os.path.realpath(__file__)), "MeshLabExecuteFilter.py")
+    process = subprocess.Popen([sys.executable, script] + arguments, stdout=subprocess.PIPE, universal_newlines=True)
+    output = process.stdout.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    report = { "seconds": time.perf_counter() - start, "peakRSS": usage.ru_maxrss * 1024, "status": status }
+    for line in output.splitlines():
+        if line.startswith("TILING="):
+            report["tiling"] = json.loads(line[7:])
+    return report
+
+if __name__ == "__main__":
+    # inside Blender, script arguments follow "--"
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
+
+    # standalone use decimates a height field once as a whole and once tiled, and compares peak memory
+    parser = argparse.ArgumentParser(description="Tiled mesh processing benchmark")
+    parser.add_argument("-t", "--triangles", required=False, default=10000000, type=int, help="Benchmark triangle count")
+    parser.add_argument("-m", "--memory_limit", required=False, default=1024, type=float, help="Memory limit in MB")
+    parser.add_argument("-p", "--processes", required=False, default=0, type=int, help="Number of processes (default: all cores)")
+    parser.add_argument("-d", "--directory", required=False, default=None, help="Directory for the benchmark files")
+    parser.add_argument("-hf", "--height_field", required=False, help="Only write the benchmark mesh to this file")
+    args = parser.parse_known_args(argv)[0]
+
+    if args.height_field is not None:
+        write_height_field(args.height_field, args.triangles)
+        sys.exit(0)
+
+    directory = tempfile.mkdtemp(dir=args.directory)
+    try:
+        # written by a child process: children forked from a large parent would report its memory as their peak
+        mesh = os.path.join(directory, "height_field.ply")
+        subprocess.check_call([sys.executable, os.path.realpath(__file__), "-hf", mesh, "-t", str(args.triangles)])
+        filters = os.path.join(directory, "filters.json")
+        with open(filters, "w") as f:
+            json.dump([{ "name": "meshing_decimation_quadric_edge_collapse", "params": { "targetfacenum": args.triangles // 10 } }], f)
+
+        report = { "numFaces": read_ply_header(mesh)["face"]["count"] }
+        report["whole"] = run_filter_process(["-i", mesh, "-f", filters, "-o", os.path.join(directory, "whole.ply")])
+        report["tiled"] = run_filter_process(["-i", mesh, "-f", filters, "-o", os.path.join(directory, "tiled.ply"),
+            "-tm", str(args.memory_limit), "-tp", str(args.processes)])
+        print("JSON=" + json.dumps(report))
+    finally:
+        shutil.rmtree(directory)
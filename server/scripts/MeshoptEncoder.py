@@ -0,0 +1,131 @@
+import numpy as np
+
+# NumPy implementation of the meshoptimizer buffer codecs used by the EXT_meshopt_compression
+# glTF extension: the vertex codec (mode ATTRIBUTES, format version 0) and the index sequence
+# codec (mode INDICES, format version 1). Both produce standard streams that viewers decode with
+# the meshoptimizer decoder; the output is designed to be compressed further by gzip or brotli.
+
+VERTEX_HEADER = 0xa0
+SEQUENCE_HEADER = 0xd1
+BYTE_GROUP_SIZE = 16
+VERTEX_BLOCK_SIZE_BYTES = 8192
+VERTEX_BLOCK_MAX_SIZE = 256
+TAIL_MAX_SIZE = 32
+
+# bits per value for the 2 bit group header codes of format version 0
+GROUP_BITS = (0, 2, 4, 8)
+
+def vertex_block_size(vertex_size):
+    result = (VERTEX_BLOCK_SIZE_BYTES // vertex_size) & ~(BYTE_GROUP_SIZE - 1)
+    return min(result, VERTEX_BLOCK_MAX_SIZE)
+
+# encode byte groups of shape (segments, groups, 16) in stream order.
+# returns an array of (segments, 1 + groups, 32) byte rows and the used length of each row;
+# the first row of each segment holds the group header bytes.
+def encode_segments(groups):
+    segments, group_count = groups.shape[:2]
+    rows = np.zeros((segments, group_count + 1, 2 * BYTE_GROUP_SIZE), dtype=np.uint8)
+    lengths = np.zeros((segments, group_count + 1), dtype=np.int64)
+
+    # size of each group for each bit width, pick the smallest (wider bits on ties)
+    sizes = []
+    for bits in GROUP_BITS:
+        if bits == 0:
+            size = np.where((groups == 0).all(axis=2), 0, 2 * BYTE_GROUP_SIZE)
+        elif bits == 8:
+            size = np.full((segments, group_count), BYTE_GROUP_SIZE)
+        else:
+            size = BYTE_GROUP_SIZE * bits // 8 + (groups >= (1 << bits) - 1).sum(axis=2)
+        sizes.append(size)
+    sizes = np.stack(sizes)
+    codes = len(GROUP_BITS) - 1 - np.argmin(sizes[::-1], axis=0)
+
+    for code, bits in enumerate(GROUP_BITS):
+        select = codes == code
+        if not select.any() or bits == 0:
+            continue
+        values = groups[select]
+        if bits == 8:
+            encoded = values
+            length = np.full(values.shape[0], BYTE_GROUP_SIZE)
+        else:
+            sentinel = (1 << bits) - 1
+            per_byte = 8 // bits
+            clamped = np.minimum(values, sentinel).reshape(values.shape[0], -1, per_byte).astype(np.uint16)
+            shifts = (bits * np.arange(per_byte - 1, -1, -1)).astype(np.uint16)
+            packed = (clamped << shifts).sum(axis=2).astype(np.uint8)
+            # values that don't fit are stored after the packed bits, in order
+            is_extra = values >= sentinel
+            order = np.argsort(~is_extra, axis=1, kind='stable')
+            extras = np.take_along_axis(values, order, axis=1)
+            encoded = np.concatenate((packed, extras), axis=1)
+            length = packed.shape[1] + is_extra.sum(axis=1)
+        block = rows[:, 1:][select]
+        block[:, :encoded.shape[1]] = encoded
+        rows[:, 1:][select] = block
+        lengths[:, 1:][select] = length
+
+    # 2 bit codes, four groups per header byte, first group in the lowest bits
+    header_size = (group_count + 3) // 4
+    padded = np.zeros((segments, header_size * 4), dtype=np.uint8)
+    padded[:, :group_count] = codes
+    padded = padded.reshape(segments, header_size, 4)
+    rows[:, 0, :header_size] = padded[..., 0] | (padded[..., 1] << 2) | (padded[..., 2] << 4) | (padded[..., 3] << 6)
+    lengths[:, 0] = header_size
+
+    return rows, lengths
+
+# encode vertex data (count x vertex_size bytes, vertex_size a multiple of 4) with the vertex codec
+def encode_vertex_buffer(vertices, vertex_size=None):
+    data = np.ascontiguousarray(vertices).view(np.uint8)
+    if vertex_size is None:
+        vertex_size = data.shape[1] if data.ndim == 2 else data.size // len(vertices)
+    data = data.reshape(-1, vertex_size)
+    count = data.shape[0]
+    if vertex_size % 4 != 0 or vertex_size > 256:
+        raise ValueError("vertex size must be a multiple of 4 and at most 256 bytes")
+
+    # each byte is encoded as the zigzag delta to the same byte of the previous vertex
+    deltas = np.zeros_like(data)
+    deltas[1:] = data[1:] - data[:-1]
+    deltas = ((deltas << 1) ^ (deltas.view(np.int8) >> 7).view(np.uint8))
+
+    block_size = vertex_block_size(vertex_size)
+    chunks = [np.array([VERTEX_HEADER], dtype=np.uint8)]
+    full_blocks = count // block_size
+    for first, blocks, size in ((0, full_blocks, block_size), (full_blocks * block_size, 1 if count % block_size else 0, count % block_size)):
+        if blocks == 0:
+            continue
+        group_count = (size + BYTE_GROUP_SIZE - 1) // BYTE_GROUP_SIZE
+        segment = np.zeros((blocks, group_count * BYTE_GROUP_SIZE, vertex_size), dtype=np.uint8)
+        segment[:, :size] = deltas[first:first + blocks * size].reshape(blocks, size, vertex_size)
+        # segments are ordered by block, then by byte position within the vertex
+        groups = segment.transpose(0, 2, 1).reshape(blocks * vertex_size, group_count, BYTE_GROUP_SIZE)
+        rows, lengths = encode_segments(groups)
+        chunks.append(rows[np.arange(rows.shape[2])[None, None, :] < lengths[..., None]])
+
+    # tail: first vertex, padded to at least 32 bytes
+    chunks.append(np.zeros(max(TAIL_MAX_SIZE - vertex_size, 0), dtype=np.uint8))
+    chunks.append(data[0] if count > 0 else np.zeros(vertex_size, dtype=np.uint8))
+    return np.concatenate(chunks).tobytes()
+
+# LEB128 style variable length encoding of unsigned values
+def encode_vbyte(values):
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(values.size, dtype=np.int64)
+    for shift in (7, 14, 21, 28, 35):
+        lengths += values >= np.uint64(1 << shift)
+    width = int(lengths.max()) if values.size else 1
+    shifts = (7 * np.arange(width)).astype(np.uint64)
+    parts = ((values[:, None] >> shifts[None, :]) & np.uint64(127)).astype(np.uint8)
+    parts[np.arange(width)[None, :] < (lengths[:, None] - 1)] |= 128
+    return parts[np.arange(width)[None, :] < lengths[:, None]]
+
+# encode an index buffer with the index sequence codec. every index is stored as the zigzag
+# delta to the previous index using baseline 0 (decoders follow the baseline bit of each value).
+def encode_index_sequence(indices):
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+    deltas = np.diff(indices, prepend=0)
+    values = np.where(deltas < 0, -2 * deltas - 1, 2 * deltas).astype(np.uint64) << np.uint64(1)
+    body = encode_vbyte(values)
+    return b''.join((bytes([SEQUENCE_HEADER]), body.tobytes(), b'\0' * 4))
@@ -0,0 +1,628 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from PlyIO import ply_header
+from GLBWriter import GLBBuilder, build_material, image_mime_type, grid_mesh, ELEMENT_ARRAY_BUFFER
+
+# Streaming conversion of (huge) OBJ files to binary PLY or GLB, so later steps don't parse the text again.
+# The file is read in chunks of whole lines. Each chunk is parsed with NumPy: lines are classified by
+# their first bytes, the lines of each kind are joined and read with one np.fromstring call, faces are
+# fan triangulated. Chunks with lines the vectorized parser can't handle (mixed vertex formats, missing
+# values, ...) are parsed line by line. The parsed arrays go to temporary files, so memory stays bounded
+# by the chunk size; with several processes, the file is split into byte ranges at line boundaries and
+# the ranges are parsed in a process pool. Relative (negative) face indices and materials set by earlier
+# chunks are resolved when the chunks are joined.
+# PLY output has per vertex positions, normals and colors, per face texture coordinates and a texture
+# number with the texture files as "TextureFile" comments (MeshLab's conventions). GLB output has one
+# primitive per chunk and material with the MTL materials (diffuse color and texture, opacity, normal map).
+
+# bytes of text parsed at a time
+CHUNK_BYTES = 1 << 25
+
+LINE_OTHER, LINE_V, LINE_VT, LINE_VN, LINE_F = range(5)
+
+# numbers of values per line the vectorized parser accepts: positions with or without colors,
+# texture coordinates with or without w
+VALUE_WIDTHS = { LINE_V: (3, 6), LINE_VT: (2, 3), LINE_VN: (3,) }
+
+KEYWORDS = { LINE_V: b"v", LINE_VT: b"vt", LINE_VN: b"vn", LINE_F: b"f" }
+
+# per vertex arrays of a chunk and the index of their element in the chunk counts
+VERTEX_ARRAYS = { "positions": 0, "colors": 0, "texcoords": 1, "normals": 2 }
+
+# type of each line from its first bytes
+def line_types(buffer, starts):
+    last = buffer.size - 1
+    first = buffer[starts]
+    second = buffer[np.minimum(starts + 1, last)]
+    third = buffer[np.minimum(starts + 2, last)]
+    blank = (second == 32) | (second == 9)
+    blank_third = (third == 32) | (third == 9)
+    types = np.full(starts.size, LINE_OTHER, dtype=np.uint8)
+    types[(first == ord("v")) & blank] = LINE_V
+    types[(first == ord("v")) & (second == ord("t")) & blank_third] = LINE_VT
+    types[(first == ord("v")) & (second == ord("n")) & blank_third] = LINE_VN
+    types[(first == ord("f")) & blank] = LINE_F
+    return types
+
+# text of all lines of a type with the keyword blanked out, runs of consecutive lines are copied as one slice
+def joined_lines(data, types, starts, ends, line_type):
+    selected = np.concatenate(([0], (types == line_type).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(selected))
+    first, last = edges[0::2], edges[1::2] - 1
+    text = b"".join([data[s:e] for s, e in zip(starts[first].tolist(), (ends[last] + 1).tolist())])
+    keyword = KEYWORDS[line_type]
+    return text.replace(keyword, b" " * len(keyword))
+
+def parse_values(text, count, widths):
+    values = np.fromstring(text, dtype=np.float64, sep=" ") if count > 0 else np.zeros(0)
+    for width in widths:
+        if values.size == count * width:
+            return values.reshape(count, width)
+    raise ValueError("irregular vertex lines")
+
+# corners of face lines: raw (v, vt, vn) values per corner, 0 where a component is missing, and the
+# number of corners per line. all corners must have the components of the first one.
+def parse_faces(text, count):
+    if count == 0:
+        return np.zeros((0, 3), dtype=np.int64), np.zeros(0, dtype=np.int64)
+    buffer = np.frombuffer(text, dtype=np.uint8)
+    blank = buffer <= 32
+    token_starts = np.flatnonzero(~blank & np.concatenate(([True], blank[:-1])))
+    newlines = np.flatnonzero(buffer == 10)
+    corner_counts = np.bincount(np.searchsorted(newlines, token_starts), minlength=count)[:count]
+
+    token = text[token_starts[0]:token_starts[0] + 64].split()[0]
+    if b"//" in token:
+        text, columns = text.replace(b"//", b" "), [0, 2]
+    else:
+        text, columns = text.replace(b"/", b" "), [0, 1, 2][:token.count(b"/") + 1]
+    values = np.fromstring(text, dtype=np.int64, sep=" ")
+    if values.size != corner_counts.sum() * len(columns):
+        raise ValueError("irregular face lines")
+    corners = np.zeros((values.size // len(columns), 3), dtype=np.int64)
+    corners[:, columns] = values.reshape(-1, len(columns))
+    return corners, corner_counts
+
+# names following a keyword (usemtl, mtllib) on the lines starting with it
+def keyword_lines(data, types, starts, ends, buffer, keyword):
+    candidates = np.flatnonzero((types == LINE_OTHER) & (buffer[starts] == keyword[0]))
+    lines, names = [], []
+    for line in candidates.tolist():
+        words = data[starts[line]:ends[line]].split(None, 1)
+        if words and words[0] == keyword:
+            lines.append(line)
+            names.append(words[1].strip().decode("utf-8", "replace") if len(words) > 1 else "")
+    return np.array(lines, dtype=np.int64), names
+
+def parse_vectorized(data):
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buffer == 10)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    types = line_types(buffer, starts)
+    counts = { line_type: int((types == line_type).sum()) for line_type in KEYWORDS }
+
+    vertices = parse_values(joined_lines(data, types, starts, ends, LINE_V), counts[LINE_V], VALUE_WIDTHS[LINE_V])
+    texcoords = parse_values(joined_lines(data, types, starts, ends, LINE_VT), counts[LINE_VT], VALUE_WIDTHS[LINE_VT])
+    normals = parse_values(joined_lines(data, types, starts, ends, LINE_VN), counts[LINE_VN], VALUE_WIDTHS[LINE_VN])
+    corners, corner_counts = parse_faces(joined_lines(data, types, starts, ends, LINE_F), counts[LINE_F])
+
+    # elements read before each face line, for relative indices
+    face_lines = np.flatnonzero(types == LINE_F)
+    before = np.stack([np.cumsum(types == line_type)[face_lines] for line_type in (LINE_V, LINE_VT, LINE_VN)], axis=1)
+    material_lines, materials = keyword_lines(data, types, starts, ends, buffer, b"usemtl")
+    _, libraries = keyword_lines(data, types, starts, ends, buffer, b"mtllib")
+
+    return {
+        "positions": vertices[:, :3],
+        "colors": vertices[:, 3:6] if vertices.shape[1] == 6 else None,
+        "texcoords": texcoords[:, :2],
+        "normals": normals,
+        "corners": corners,
+        "cornerCounts": corner_counts,
+        "before": before,
+        "faceMaterials": np.searchsorted(material_lines, face_lines, side="right") - 1,
+        "materials": materials,
+        "libraries": libraries
+    }
+
+# line by line parser for chunks the vectorized parser rejects
+def parse_lines(data):
+    positions, colors, texcoords, normals = [], [], [], []
+    corners, corner_counts, before, face_materials = [], [], [], []
+    materials, libraries = [], []
+    for line in data.split(b"\n"):
+        words = line.split()
+        if not words:
+            continue
+        key = words[0]
+        if key == b"v":
+            values = [float(word) for word in words[1:7]]
+            positions.append(values[:3])
+            colors.append(values[3:6] if len(values) == 6 else None)
+        elif key == b"vt":
+            texcoords.append(([float(word) for word in words[1:3]] + [0.0, 0.0])[:2])
+        elif key == b"vn":
+            normals.append([float(word) for word in words[1:4]])
+        elif key == b"f":
+            for word in words[1:]:
+                parts = word.split(b"/") + [b"", b""]
+                corners.append([int(part) if part else 0 for part in parts[:3]])
+            corner_counts.append(len(words) - 1)
+            before.append((len(positions), len(texcoords), len(normals)))
+            face_materials.append(len(materials) - 1)
+        elif key in (b"usemtl", b"mtllib"):
+            name = line.strip().split(None, 1)
+            name = name[1].decode("utf-8", "replace") if len(name) > 1 else ""
+            (materials if key == b"usemtl" else libraries).append(name)
+
+    if any(len(position) != 3 for position in positions) or any(len(normal) != 3 for normal in normals):
+        raise ValueError("incomplete vertex or normal line")
+    return {
+        "positions": np.array(positions, dtype=np.float64).reshape(-1, 3),
+        "colors": np.array(colors, dtype=np.float64) if colors and all(color is not None for color in colors) else None,
+        "texcoords": np.array(texcoords, dtype=np.float64).reshape(-1, 2),
+        "normals": np.array(normals, dtype=np.float64).reshape(-1, 3),
+        "corners": np.array(corners, dtype=np.int64).reshape(-1, 3),
+        "cornerCounts": np.array(corner_counts, dtype=np.int64),
+        "before": np.array(before, dtype=np.int64).reshape(-1, 3),
+        "faceMaterials": np.array(face_materials, dtype=np.int64),
+        "materials": materials,
+        "libraries": libraries
+    }
+
+# corners of the fan triangles of faces given their corner counts, and the face of each triangle
+def fan_triangles(corner_counts):
+    triangles = np.maximum(corner_counts - 2, 0)
+    face = np.repeat(np.arange(corner_counts.size), triangles)
+    step = np.arange(face.size) - np.repeat(np.cumsum(triangles) - triangles, triangles)
+    base = (np.cumsum(corner_counts) - corner_counts)[face]
+    return face, np.stack((base, base + step + 1, base + step + 2), axis=1)
+
+# parses a chunk of whole lines. face corners get zero based (v, vt, vn) indices, -1 for missing
+# components. relative marks the indices counted back from the face line, the elements of the
+# earlier chunks are added to those when the chunks are joined.
+def parse_chunk(data):
+    try:
+        parsed = parse_vectorized(data)
+    except ValueError:
+        parsed = parse_lines(data)
+
+    corners = parsed["corners"]
+    face, triangles = fan_triangles(parsed["cornerCounts"])
+    before = np.repeat(parsed["before"], parsed["cornerCounts"], axis=0)
+    relative = corners < 0
+    indices = np.where(relative, before + corners, corners - 1)
+    parsed["indices"] = indices[triangles]
+    parsed["relative"] = relative[triangles]
+    parsed["triangleMaterials"] = parsed["faceMaterials"][face].astype(np.int32)
+    return parsed
+
+CHUNK_ARRAYS = [ "positions", "colors", "texcoords", "normals", "indices", "relative", "triangleMaterials" ]
+
+def save_chunk(parsed, prefix):
+    for name in CHUNK_ARRAYS:
+        if parsed[name] is not None:
+            dtype = np.float32 if parsed[name].dtype == np.float64 else parsed[name].dtype
+            np.save(prefix + "-" + name + ".npy", parsed[name].astype(dtype, copy=False))
+    return {
+        "prefix": prefix,
+        "counts": [int(parsed[name].shape[0]) for name in ("positions", "texcoords", "normals")],
+        "numTriangles": int(parsed["indices"].shape[0]),
+        "hasColors": parsed["colors"] is not None,
+        "materials": parsed["materials"],
+        "libraries": parsed["libraries"]
+    }
+
+def load_array(info, name):
+    return np.load(info["prefix"] + "-" + name + ".npy")
+
+# parses the lines of a byte range chunk by chunk, saving the arrays in the directory.
+# start and stop are line boundaries.
+def parse_range(task):
+    chunks = []
+    with open(task["path"], "rb") as f:
+        f.seek(task["start"])
+        position, remainder = task["start"], b""
+        while position < task["stop"]:
+            block = f.read(min(task["chunkBytes"], task["stop"] - position))
+            if not block:
+                break
+            position += len(block)
+            data = remainder + block
+            remainder = b""
+            if position < task["stop"]:
+                cut = data.rfind(b"\n") + 1
+                if cut == 0:
+                    remainder = data
+                    continue
+                data, remainder = data[:cut], data[cut:]
+            if not data.endswith(b"\n"):
+                data += b"\n"
+            prefix = os.path.join(task["directory"], "%d-%d" % (task["index"], len(chunks)))
+            chunks.append(save_chunk(parse_chunk(data), prefix))
+    return chunks
+
+# byte ranges of about equal size starting at line boundaries
+def byte_ranges(path, count):
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for index in range(1, count):
+            f.seek(max(size * index // count, bounds[-1]))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+def parse_file(path, directory, processes=1, chunk_bytes=CHUNK_BYTES):
+    tasks = [{ "path": path, "start": start, "stop": stop, "chunkBytes": chunk_bytes, "directory": directory, "index": index }
+        for index, (start, stop) in enumerate(byte_ranges(path, max(processes, 1)))]
+    if processes <= 1 or len(tasks) < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        results = [parse_range(task) for task in tasks]
+    else:
+        # forked, so the pool also works inside Blender
+        with multiprocessing.get_context("fork").Pool(len(tasks)) as pool:
+            results = pool.map(parse_range, tasks)
+    return [chunk for chunks in results for chunk in chunks]
+
+# offsets of each chunk's elements and global material indices, materials set by an earlier
+# chunk continue until the next usemtl line
+def join_chunks(chunks):
+    offset = np.zeros(3, dtype=np.int64)
+    names, current = [], -1
+    for chunk in chunks:
+        chunk["offset"] = offset.copy()
+        offset += chunk["counts"]
+        table = []
+        for name in chunk["materials"]:
+            if name not in names:
+                names.append(name)
+            table.append(names.index(name))
+        # the last entry is looked up by the faces before the chunk's first usemtl line (index -1)
+        chunk["materialTable"] = np.array(table + [current], dtype=np.int32)
+        if table:
+            current = table[-1]
+    return offset, names
+
+# zero based (v, vt, vn) indices (n, 3, 3) and material indices of a chunk's triangles
+def chunk_triangles(chunk, totals):
+    indices = load_array(chunk, "indices")
+    indices += load_array(chunk, "relative") * chunk["offset"]
+    if indices.size > 0:
+        if indices[:, :, 0].min() < 0 or (indices >= totals).any() or (indices < -1).any():
+            raise ValueError("face index out of range in " + chunk["prefix"])
+    return indices, chunk["materialTable"][load_array(chunk, "triangleMaterials")]
+
+# concatenates an array of all chunks into a file and memory maps it
+def joined_array(chunks, name, width, directory):
+    path = os.path.join(directory, name + ".bin")
+    count = 0
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            if chunk["counts"][VERTEX_ARRAYS[name]] > 0:
+                values = load_array(chunk, name)
+                f.write(values.tobytes())
+                count += values.shape[0]
+    if count == 0:
+        return np.zeros((0, width), dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(count, width))
+
+# materials of MTL files: diffuse color, opacity, diffuse and normal map paths
+def read_materials(obj_path, libraries):
+    materials = {}
+    for library in libraries:
+        path = os.path.join(os.path.dirname(obj_path), library)
+        if not os.path.isfile(path):
+            print("OBJ conversion: cannot read from MTL file: '%s'" % library)
+            continue
+        material = None
+        with open(path, "r", errors="replace") as f:
+            for line in f:
+                words = line.split()
+                if not words:
+                    continue
+                key = words[0]
+                if key == "newmtl":
+                    name = line.strip().split(None, 1)[1] if len(words) > 1 else ""
+                    material = materials.setdefault(name, { "name": name })
+                elif material is None or len(words) < 2:
+                    continue
+                elif key == "Kd":
+                    material["diffuse"] = [float(word) for word in words[1:4]]
+                elif key == "d":
+                    material["opacity"] = float(words[1])
+                elif key == "Tr":
+                    material["opacity"] = 1.0 - float(words[1])
+                elif key == "map_Kd":
+                    material["diffuseMap"] = os.path.join(os.path.dirname(path), words[-1])
+                elif key.lower() in ("map_bump", "bump", "norm"):
+                    material["normalMap"] = os.path.join(os.path.dirname(path), words[-1])
+    return materials
+
+def write_ply(output, chunks, totals, names, materials, directory):
+    colors = all(chunk["hasColors"] for chunk in chunks if chunk["counts"][0] > 0) and totals[0] > 0
+    vertex_fields = [("x", "<f4"), ("y", "<f4"), ("z", "<f4")]
+    if totals[2] > 0:
+        vertex_fields += [("nx", "<f4"), ("ny", "<f4"), ("nz", "<f4")]
+    if colors:
+        vertex_fields += [("red", "u1"), ("green", "u1"), ("blue", "u1")]
+    vertex_dtype = np.dtype(vertex_fields)
+
+    # texture files of the materials in order of first use, texture number of each material
+    textures, texture_numbers = [], np.full(len(names) + 1, -1, dtype=np.int32)
+    for index, name in enumerate(names):
+        texture = materials.get(name, {}).get("diffuseMap")
+        if texture is not None:
+            if texture not in textures:
+                textures.append(texture)
+            texture_numbers[index] = textures.index(texture)
+    face_fields = [("vertex_indices_count", "u1"), ("vertex_indices", "<i4", (3,))]
+    if totals[1] > 0:
+        face_fields += [("texcoord_count", "u1"), ("texcoord", "<f4", (6,))]
+    if len(textures) > 1:
+        face_fields.append(("texnumber", "<i4"))
+    face_dtype = np.dtype(face_fields)
+    comments = ["TextureFile " + os.path.relpath(texture, os.path.dirname(os.path.abspath(output))) for texture in textures]
+
+    # per vertex normals from the normals of the face corners
+    vertex_normals = None
+    if totals[2] > 0:
+        normals = joined_array(chunks, "normals", 3, directory)
+        vertex_normals = np.memmap(os.path.join(directory, "vertex_normals.bin"), dtype=np.float32, mode="w+", shape=(int(totals[0]), 3))
+    texcoords = joined_array(chunks, "texcoords", 2, directory) if totals[1] > 0 else None
+
+    face_count = 0
+    with open(output + ".faces", "wb") as f:
+        for chunk in chunks:
+            indices, triangle_materials = chunk_triangles(chunk, totals)
+            records = np.zeros(indices.shape[0], dtype=face_dtype)
+            records["vertex_indices_count"] = 3
+            records["vertex_indices"] = indices[:, :, 0]
+            if texcoords is not None:
+                records["texcoord_count"] = 6
+                records["texcoord"] = np.where(indices[:, :, 1:2] >= 0, texcoords[np.maximum(indices[:, :, 1], 0)], 0.0).reshape(-1, 6)
+            if len(textures) > 1:
+                records["texnumber"] = texture_numbers[triangle_materials]
+            if vertex_normals is not None:
+                corners = indices.reshape(-1, 3)
+                corners = corners[corners[:, 2] >= 0]
+                vertex_normals[corners[:, 0]] = normals[corners[:, 2]]
+            f.write(records.tobytes())
+            face_count += records.shape[0]
+
+    with open(output, "wb") as f:
+        f.write(ply_header(vertex_dtype, int(totals[0]), face_dtype, face_count, comments))
+        start = 0
+        for chunk in chunks:
+            if chunk["counts"][0] == 0:
+                continue
+            positions = load_array(chunk, "positions")
+            records = np.zeros(positions.shape[0], dtype=vertex_dtype)
+            records["x"], records["y"], records["z"] = positions.T
+            if vertex_normals is not None:
+                records["nx"], records["ny"], records["nz"] = vertex_normals[start:start + positions.shape[0]].T
+            if colors:
+                rgb = np.round(np.clip(load_array(chunk, "colors"), 0.0, 1.0) * 255.0).astype(np.uint8)
+                records["red"], records["green"], records["blue"] = rgb.T
+            f.write(records.tobytes())
+            start += positions.shape[0]
+        with open(output + ".faces", "rb") as faces:
+            shutil.copyfileobj(faces, f)
+    os.remove(output + ".faces")
+    return int(totals[0]), face_count
+
+# unique (v, vt, vn) corners of triangles and the triangles' indices into them
+def unique_corners(corners, totals):
+    keys = corners + 1
+    if np.prod(totals.astype(np.float64) + 1) < 2.0 ** 62:
+        key = (keys[:, 0] * (totals[1] + 1) + keys[:, 1]) * (totals[2] + 1) + keys[:, 2]
+        key, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        return corners[first], inverse.reshape(-1)
+    unique, inverse = np.unique(corners, axis=0, return_inverse=True)
+    return unique, inverse.reshape(-1)
+
+# glTF material of an MTL material, textures are embedded if they are PNG or JPEG files
+def gltf_material(material, images):
+    result = { "name": material["name"], "metallicFactor": 0.0, "roughnessFactor": 1.0 }
+    opacity = material.get("opacity", 1.0)
+    color = material.get("diffuse", [0.8, 0.8, 0.8])
+    for slot, key in (("baseColorTexture", "diffuseMap"), ("normalTexture", "normalMap")):
+        path = material.get(key)
+        if path is None:
+            continue
+        if path not in images:
+            images[path] = None
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                if image_mime_type(data) is not None:
+                    images[path] = data
+            if images[path] is None:
+                print("OBJ conversion: texture is not a PNG or JPEG file, not embedded: '%s'" % path)
+        if images[path] is not None:
+            result[slot] = images[path]
+            if slot == "baseColorTexture":
+                color = [1.0, 1.0, 1.0]
+    result["baseColorFactor"] = list(color[:3]) + [opacity]
+    if opacity < 1.0:
+        result["alphaMode"] = "BLEND"
+    return result
+
+def write_glb(output, chunks, totals, names, materials, directory):
+    colors = all(chunk["hasColors"] for chunk in chunks if chunk["counts"][0] > 0) and totals[0] > 0
+    positions = joined_array(chunks, "positions", 3, directory)
+    texcoords = joined_array(chunks, "texcoords", 2, directory)
+    normals = joined_array(chunks, "normals", 3, directory)
+    vertex_colors = joined_array(chunks, "colors", 3, directory) if colors else None
+
+    # attributes of each primitive are spilled to a file and memory mapped when the GLB is assembled
+    spill_path = os.path.join(directory, "primitives.bin")
+    spilled, primitives = [], []
+    with open(spill_path, "wb") as spill:
+        def spill_array(array):
+            spilled.append((spill.tell(), array.dtype, array.shape))
+            spill.write(np.ascontiguousarray(array).tobytes())
+            spill.write(b"\0" * (-spill.tell() % 4))
+            return len(spilled) - 1
+
+        for chunk in chunks:
+            indices, triangle_materials = chunk_triangles(chunk, totals)
+            order = np.argsort(triangle_materials, kind="stable")
+            groups, group_starts = np.unique(triangle_materials[order], return_index=True)
+            for group, start, stop in zip(groups.tolist(), group_starts.tolist(), list(group_starts[1:]) + [order.size]):
+                corners, triangles = unique_corners(indices[order[start:stop]].reshape(-1, 3), totals)
+                primitive = { "material": group, "vertexCount": corners.shape[0] }
+                primitive["POSITION"] = spill_array(positions[corners[:, 0]])
+                if (corners[:, 1] >= 0).any():
+                    uvs = np.where(corners[:, 1:2] >= 0, texcoords[np.maximum(corners[:, 1], 0)], 0.0).astype(np.float32)
+                    uvs[:, 1] = 1.0 - uvs[:, 1]
+                    primitive["TEXCOORD_0"] = spill_array(uvs)
+                if (corners[:, 2] >= 0).all():
+                    primitive["NORMAL"] = spill_array(normals[corners[:, 2]])
+                if vertex_colors is not None:
+                    primitive["COLOR_0"] = spill_array(vertex_colors[corners[:, 0]])
+                index_type = np.uint16 if corners.shape[0] <= 0xFFFF else np.uint32
+                primitive["indices"] = spill_array(triangles.astype(index_type))
+                primitives.append(primitive)
+
+    builder = GLBBuilder()
+    arrays = [np.memmap(spill_path, dtype=dtype, mode="r", offset=offset, shape=shape) if np.prod(shape) > 0 else np.zeros(shape, dtype=dtype)
+        for offset, dtype, shape in spilled]
+    images, material_indices = {}, {}
+    gltf_primitives = []
+    for primitive in primitives:
+        attributes = { "POSITION": builder.add_accessor(arrays[primitive["POSITION"]], with_bounds=True) }
+        for name in ("NORMAL", "TEXCOORD_0", "COLOR_0"):
+            if name in primitive:
+                attributes[name] = builder.add_accessor(arrays[primitive[name]])
+        result = { "attributes": attributes, "indices": builder.add_accessor(arrays[primitive["indices"]], target=ELEMENT_ARRAY_BUFFER), "mode": 4 }
+        if primitive["material"] >= 0:
+            name = names[primitive["material"]]
+            if name not in material_indices:
+                material_indices[name] = build_material(builder, gltf_material(materials.get(name, { "name": name }), images))
+            result["material"] = material_indices[name]
+        gltf_primitives.append(result)
+
+    name = os.path.splitext(os.path.basename(output))[0]
+    builder.gltf["meshes"] = [{ "name": name, "primitives": gltf_primitives }]
+    builder.gltf["nodes"] = [{ "name": name, "mesh": 0 }]
+    builder.gltf["scenes"] = [{ "nodes": [0] }]
+    builder.gltf["scene"] = 0
+    builder.write(output)
+    return sum(primitive["vertexCount"] for primitive in primitives), sum(arrays[primitive["indices"]].shape[0] // 3 for primitive in primitives)
+
+def convert(path, output, processes=1, chunk_bytes=CHUNK_BYTES, directory=None):
+    extension = os.path.splitext(output)[1].lower()
+    if extension not in (".ply", ".glb"):
+        raise ValueError("unsupported output format: " + output)
+    if processes == 0:
+        processes = os.cpu_count() or 1
+
+    start = time.perf_counter()
+    work_directory = tempfile.mkdtemp(dir=directory or os.path.dirname(os.path.abspath(output)))
+    try:
+        chunks = parse_file(path, work_directory, processes, chunk_bytes)
+        parse_seconds = time.perf_counter() - start
+        totals, names = join_chunks(chunks)
+        libraries = []
+        for chunk in chunks:
+            libraries += [library for library in chunk["libraries"] if library not in libraries]
+        materials = read_materials(path, libraries)
+        write = write_ply if extension == ".ply" else write_glb
+        vertex_count, face_count = write(output, chunks, totals, names, materials, work_directory)
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    seconds = time.perf_counter() - start
+    megabytes = os.path.getsize(path) / (1 << 20)
+    return {
+        "input": path,
+        "output": output,
+        "numVertices": vertex_count,
+        "numFaces": face_count,
+        "numMaterials": len(names),
+        "processes": processes,
+        "chunks": len(chunks),
+        "parseSeconds": parse_seconds,
+        "seconds": seconds,
+        "megabytesPerSecond": megabytes / max(seconds, 1e-9),
+        "parseMegabytesPerSecond": megabytes / max(parse_seconds, 1e-9)
+    }
+
+# grid test mesh as an OBJ file with texture coordinates, normals and quads, written row chunk by row chunk
+def write_test_obj(path, triangle_count):
+    positions, normals, uvs, indices = grid_mesh(triangle_count)
+    uvs[:, 1] = 1.0 - uvs[:, 1]
+    with open(os.path.splitext(path)[0] + ".mtl", "w") as f:
+        f.write("newmtl benchmark\nKd 0.8 0.8 0.8\nd 1.0\n")
+    with open(path, "w") as f:
+        f.write("mtllib %s\nusemtl benchmark\n" % os.path.basename(os.path.splitext(path)[0] + ".mtl"))
+        for kind, values in (("v", positions), ("vt", uvs), ("vn", normals)):
+            for start in range(0, values.shape[0], 1000000):
+                part = values[start:start + 1000000]
+                f.write("".join([kind + (" %.6f" * part.shape[1]) % tuple(row) + "\n" for row in part.tolist()]))
+        quads = np.concatenate((indices[0::2], indices[1::2, 2:]), axis=1)[:, [0, 1, 3, 2]] + 1
+        for start in range(0, quads.shape[0], 1000000):
+            f.write("".join(["f %d/%d/%d %d/%d/%d %d/%d/%d %d/%d/%d\n" % tuple(np.repeat(row, 3)) for row in quads[start:start + 1000000].tolist()]))
+
+# conversion throughput with 1 to the given number of processes, and Blender's OBJ import when run in Blender
+def benchmark(triangle_count, processes, directory):
+    work_directory = tempfile.mkdtemp(dir=directory)
+    try:
+        path = os.path.join(work_directory, "benchmark.obj")
+        write_test_obj(path, triangle_count)
+        megabytes = os.path.getsize(path) / (1 << 20)
+        report = { "inputBytes": os.path.getsize(path), "converter": [] }
+        for count in range(1, (processes or os.cpu_count() or 1) + 1):
+            for extension in (".ply", ".glb"):
+                result = convert(path, os.path.join(work_directory, "benchmark" + extension), count)
+                report["numFaces"] = result["numFaces"]
+                report["converter"].append({ key: result[key] for key in ("processes", "seconds", "megabytesPerSecond", "parseMegabytesPerSecond") })
+                report["converter"][-1]["format"] = extension[1:]
+
+        try:
+            import bpy
+        except ImportError:
+            bpy = None
+        if bpy is not None:
+            start = time.perf_counter()
+            bpy.ops.wm.obj_import(filepath=path)
+            seconds = time.perf_counter() - start
+            report["blender"] = { "seconds": seconds, "megabytesPerSecond": megabytes / seconds }
+        return report
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    # inside Blender, script arguments follow "--"
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else argv[1:]
+
+    parser = argparse.ArgumentParser(description="Convert an OBJ file to binary PLY or GLB")
+    parser.add_argument("-i", "--input", required=False, help="Input OBJ file")
+    parser.add_argument("-o", "--output", required=False, help="Output file, .ply or .glb")
+    parser.add_argument("-p", "--processes", required=False, default=1, type=int, help="Number of parsing processes (0: all cores)")
+    parser.add_argument("-c", "--chunk_size", required=False, default=CHUNK_BYTES >> 20, type=int, help="Chunk size in MB")
+    parser.add_argument("-d", "--directory", required=False, default=None, help="Directory for temporary files, default is next to the output")
+    parser.add_argument("-b", "--benchmark", required=False, default=False, action="store_true", help="Benchmark the conversion of a test mesh")
+    parser.add_argument("-t", "--triangles", required=False, default=2000000, type=int, help="Benchmark triangle count")
+    args = parser.parse_known_args(argv)[0]
+
+    if args.benchmark:
+        print("JSON=" + json.dumps(benchmark(args.triangles, args.processes, args.directory)))
+        sys.exit(0)
+    if args.input is None or args.output is None:
+        parser.error("input and output files are required")
+
+    report = convert(args.input, args.output, args.processes, args.chunk_size << 20, args.directory)
+    print("Converted %d vertices, %d faces at %.1f MB/s" % (report["numVertices"], report["numFaces"], report["megabytesPerSecond"]))
+    print("JSON=" + json.dumps(report))
@@ -0,0 +1,147 @@
+import numpy as np
+
+# Binary PLY reading and writing with numpy record arrays, shared by the scripts that stream meshes too
+# large for the Blender and PyMeshLab importers (MeshTiling.py, MeshRasterizer.py, ObjConverter.py,
+# BlenderCombineMesh.py). Elements are read through memory maps of their records; list properties have a
+# fixed length, taken from the first record (three for triangle meshes).
+
+PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8"
+}
+
+PLY_NAMES = { "i1": "char", "u1": "uchar", "i2": "short", "u2": "ushort", "i4": "int", "u4": "uint", "f4": "float", "f8": "double" }
+
+# length of each list property in the first record of an element, lists are read as fixed size lists
+def first_list_lengths(path, offset, properties, endian):
+    lengths = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for prop in properties:
+            if prop[0] == "list":
+                count_type = np.dtype(endian + PLY_TYPES[prop[1]])
+                data = f.read(count_type.itemsize)
+                length = int(np.frombuffer(data, dtype=count_type)[0]) if len(data) == count_type.itemsize else 3
+                lengths.append(length)
+                f.seek(length * np.dtype(PLY_TYPES[prop[2]]).itemsize, 1)
+            else:
+                f.seek(np.dtype(PLY_TYPES[prop[0]]).itemsize, 1)
+    return lengths
+
+# elements of a binary PLY file with their record dtype and byte offset. list properties are read as
+# fixed size lists with the length found in the first record (three for triangles), which is checked
+# when faces are read.
+def read_ply_header(path):
+    elements = []
+    with open(path, "rb") as f:
+        if f.readline().strip() != b"ply":
+            raise ValueError("not a PLY file: " + path)
+        format = None
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError("unexpected end of PLY header: " + path)
+            words = line.decode("ascii").split()
+            if not words or words[0] in ("comment", "obj_info"):
+                continue
+            if words[0] == "format":
+                format = words[1]
+            elif words[0] == "element":
+                elements.append({ "name": words[1], "count": int(words[2]), "properties": [] })
+            elif words[0] == "property":
+                elements[-1]["properties"].append(words[1:])
+            elif words[0] == "end_header":
+                break
+        offset = f.tell()
+
+    if format not in ("binary_little_endian", "binary_big_endian"):
+        raise ValueError("not a binary PLY file: " + path)
+    endian = "<" if format == "binary_little_endian" else ">"
+
+    result = {}
+    for element in elements:
+        fields = []
+        lengths = first_list_lengths(path, offset, element["properties"], endian) if element["count"] > 0 else []
+        for prop in element["properties"]:
+            if prop[0] == "list":
+                fields.append((prop[3] + "_count", endian + PLY_TYPES[prop[1]]))
+                fields.append((prop[3], endian + PLY_TYPES[prop[2]], (lengths.pop(0) if lengths else 3,)))
+            else:
+                fields.append((prop[1], endian + PLY_TYPES[prop[0]]))
+        dtype = np.dtype(fields)
+        result[element["name"]] = { "count": element["count"], "dtype": dtype, "offset": offset }
+        offset += element["count"] * dtype.itemsize
+
+    if "vertex" not in result or "face" not in result:
+        raise ValueError("PLY file without vertices or faces: " + path)
+    return result
+
+# memory map of an element's records, a fresh map per chunk lets the process drop the pages it read
+def map_element(path, element, start=0, stop=None):
+    stop = element["count"] if stop is None else min(stop, element["count"])
+    if stop <= start:
+        return np.zeros(0, dtype=element["dtype"])
+    return np.memmap(path, dtype=element["dtype"], mode="r", offset=element["offset"] + start * element["dtype"].itemsize, shape=(stop - start,))
+
+# vertex indices of face records as an (n, 3) array
+def face_indices(faces):
+    name = "vertex_indices" if "vertex_indices" in faces.dtype.names else "vertex_index"
+    if faces.dtype[name].shape != (3,) or (faces.size > 0 and (faces[name + "_count"] != 3).any()):
+        raise ValueError("PLY faces are not triangles")
+    return faces[name].astype(np.int64)
+
+# vertex positions as an (n, 3) float64 array
+def positions(vertices):
+    return np.stack((vertices["x"], vertices["y"], vertices["z"]), axis=1).astype(np.float64)
+
+# header of a binary little endian PLY file with vertex and face records of the given dtypes. array fields
+# are list properties with a uchar count, written as a "<name>_count" field before them (as read_ply_header
+# reads them).
+def ply_header(vertex_dtype, vertex_count, face_dtype, face_count, comments=()):
+    lines = ["ply", "format binary_little_endian 1.0"] + ["comment " + comment for comment in comments]
+    lines.append("element vertex %d" % vertex_count)
+    lines += ["property %s %s" % (PLY_NAMES[vertex_dtype[name].str[1:]], name) for name in vertex_dtype.names]
+    lines.append("element face %d" % face_count)
+    for name in face_dtype.names:
+        if name.endswith("_count"):
+            continue
+        field = face_dtype[name]
+        if field.shape:
+            lines.append("property list uchar %s %s" % (PLY_NAMES[field.base.str[1:]], name))
+        else:
+            lines.append("property %s %s" % (PLY_NAMES[field.str[1:]], name))
+    lines.append("end_header")
+    return ("\n".join(lines) + "\n").encode("ascii")
+
+# triangle records, with a float quality per face if given
+def face_dtype(quality=False):
+    return np.dtype([("vertex_indices_count", "u1"), ("vertex_indices", "<i4", (3,))] + ([("quality", "<f4")] if quality else []))
+
+def write_ply_header(f, vertex_dtype, vertex_count, face_count, comments=(), face_quality=False):
+    f.write(ply_header(vertex_dtype, vertex_count, face_dtype(face_quality), face_count, comments))
+
+def face_records(faces, quality=None):
+    records = np.zeros(faces.shape[0], dtype=face_dtype(quality is not None))
+    records["vertex_indices_count"] = 3
+    records["vertex_indices"] = faces
+    if quality is not None:
+        records["quality"] = quality
+    return records
+
+def little_endian(records):
+    return records.astype(records.dtype.newbyteorder("<"))
+
+def write_ply(path, vertices, faces, face_quality=None):
+    with open(path, "wb") as f:
+        write_ply_header(f, vertices.dtype, vertices.shape[0], faces.shape[0], face_quality=face_quality is not None)
+        f.write(little_endian(vertices).tobytes())
+        f.write(face_records(faces, face_quality).tobytes())
+
+# read a whole (small) PLY file: vertex records and (n, 3) face indices
+def read_ply(path):
+    header = read_ply_header(path)
+    vertices = np.array(map_element(path, header["vertex"]))
+    faces = face_indices(map_element(path, header["face"]))
+    return vertices, faces
@@ -33,6 +33,8 @@ export interface IToolConfiguration
     timeout: number;
     /** Absolute path to preconfigured project required for tool to run. */
     projectPath?: string;
+    /** Local port of a persistent worker process, if the tool supports one (PyMeshLab). */
+    workerPort?: number;
 }
 
 export interface IToolSettings
@@ -41,6 +41,8 @@ export interface ICleanupMeshTaskParameters extends ITaskParameters
     isTurntable?: boolean;
     /** String containing scene dimensions */
     sceneSize?: number[];
+    /** Meshlab only: Applies filters one at a time, reporting time, memory and mesh size for each. If a string is given, writes a Chrome trace to file. */
+    profileFilters?: string | boolean;
     /** Maximum task execution time in seconds (default: 0, uses timeout defined in tool setup, see [[IToolConfiguration]]). */
     timeout?: number;
 }
@@ -72,7 +74,8 @@ export default class CleanupMeshTask extends ToolTask
             keepLargestComponent: { type: "boolean", default: true },
             isTurntable: { type: "boolean", default: false },
             timeout: { type: "integer", default: 0 },
-            sceneSize: { type: "array" }
+            sceneSize: { type: "array" },
+            profileFilters: { oneOf:[ { type: "string" }, { type: "boolean" }]}
         },
         required: [
             "inputMeshFile",
@@ -116,7 +119,9 @@ export default class CleanupMeshTask extends ToolTask
                     name: "RemoveDuplicateFaces"
                 }
             ],
-            timeout: params.timeout
+            timeout: params.timeout,
+            profileFilters: !!params.profileFilters,
+            profileTraceFile: typeof params.profileFilters === "string" ? params.profileFilters : undefined
         };
 
         if(params.isTurntable) {
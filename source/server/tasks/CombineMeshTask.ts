@@ -15,6 +15,8 @@
  * limitations under the License.
  */
 
+import * as path from "path";
+
 import Job from "../app/Job";
 
 import { IBlenderToolSettings } from "../tools/BlenderTool";
@@ -24,23 +26,34 @@ import ToolTask from "../app/ToolTask";
 
 ////////////////////////////////////////////////////////////////////////////////
 
+/** Part of a combined mesh, see [[ICombineMeshTaskParameters]]. */
+export interface ICombineMeshPart
+{
+    /** Mesh file name of the part. */
+    meshFile: string;
+    /** Name of the part in the combined mesh (default: file name). */
+    name?: string;
+}
+
 /** Parameters for [[CombineMeshTask]]. */
 export interface ICombineMeshTaskParameters extends ITaskParameters
 {
     /** Base mesh file name. */
-    baseMeshFile: string;
+    baseMeshFile?: string;
     /** Input mesh file name to combine with base. */
-    inputMeshFile: string;
+    inputMeshFile?: string;
     /** Name used in svx file to identify input mesh */
-    inputMeshBasename: string;
-    /** Output mesh file name. */
+    inputMeshBasename?: string;
+    /** List of parts to combine, instead of base and input mesh. Each part's meshes are joined into one object named after the part. */
+    parts?: ICombineMeshPart[];
+    /** Output mesh file name. With parts, the extension selects the format: .fbx, .glb or .ply (binary). */
     outputMeshFile: string;
     /** Maximum task execution time in seconds (default: 0, uses timeout defined in tool setup, see [[IToolConfiguration]]). */
     timeout?: number;
 }
 
 /**
- * Combines meshes into a single self contained .fbx
+ * Combines meshes into a single self contained .fbx, or a list of parts into .fbx, .glb or .ply
  *
  * Parameters: [[ICombineMeshTaskParameters]].
  * Tool: [[BlenderTool]].
@@ -57,14 +70,24 @@ export default class CombineMeshTask extends ToolTask
             baseMeshFile: { type: "string", minLength: 1 },
             inputMeshFile: { type: "string", minLength: 1 },
             inputMeshBasename: { type: "string", minLength: 1 },
+            parts: {
+                type: "array",
+                minItems: 1,
+                items: {
+                    type: "object",
+                    properties: {
+                        meshFile: { type: "string", minLength: 1 },
+                        name: { type: "string", minLength: 1 }
+                    },
+                    required: [ "meshFile" ],
+                    additionalProperties: false
+                }
+            },
             outputMeshFile: { type: "string", minLength: 1 },
             timeout: { type: "integer", default: 0 }
         },
         required: [
-            "baseMeshFile",
-            "inputMeshFile",
-            "outputMeshFile",
-            "inputMeshBasename"
+            "outputMeshFile"
         ],
         additionalProperties: false
     };
@@ -76,6 +99,24 @@ export default class CombineMeshTask extends ToolTask
     {
         super(params, context);
 
+        if (params.parts) {
+            const settings: IBlenderToolSettings = {
+                inputMeshFile: params.parts[0].meshFile,
+                inputMeshFiles: params.parts.map(part => part.meshFile),
+                inputMeshNames: params.parts.map(part => part.name || path.basename(part.meshFile, path.extname(part.meshFile))),
+                outputFile: params.outputMeshFile,
+                mode: "combine",
+                timeout: params.timeout
+            };
+
+            this.addTool("Blender", settings);
+            return;
+        }
+
+        if (!params.baseMeshFile || !params.inputMeshFile || !params.inputMeshBasename) {
+            throw new Error("CombineMeshTask.constructor - parts or baseMeshFile, inputMeshFile and inputMeshBasename required");
+        }
+
         const settings: IBlenderToolSettings = {
             inputMeshFile: params.baseMeshFile,
             inputMeshFile2: params.inputMeshFile,
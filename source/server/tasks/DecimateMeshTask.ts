@@ -19,7 +19,7 @@ import * as fs from "fs-extra";
 
 import Job from "../app/Job";
 
-import { IMeshlabToolSettings } from "../tools/MeshlabTool";
+import { IMeshlabToolSettings, MeshlabFilter } from "../tools/MeshlabTool";
 import { IRapidCompactToolSettings } from "../tools/RapidCompactTool";
 
 import MeshlabTool from "../tools/MeshlabTool";
@@ -30,6 +30,19 @@ import ToolTask, { IToolMessageEvent } from "../app/ToolTask";
 
 ////////////////////////////////////////////////////////////////////////////////
 
+/** Additional level of a level of detail pyramid, see [[IDecimateMeshTaskParameters]] */
+export interface IDecimateMeshLevel
+{
+    /** Output mesh file name of the level. */
+    outputMeshFile: string;
+    /** Target number of faces of the level. */
+    numFaces: number;
+    /** Preserves texture coordinates of the level (default: preserveTexCoords of the task). */
+    preserveTexCoords?: boolean;
+    /** Re-computes vertex normals of the level (default: computeVertexNormals of the task). */
+    computeVertexNormals?: boolean;
+}
+
 /** Parameters for [[DecimateMeshTask]] */
 export interface IDecimateMeshTaskParameters extends ITaskParameters
 {
@@ -53,8 +66,18 @@ export interface IDecimateMeshTaskParameters extends ITaskParameters
     minComponentSize?: string | number;
     /** Meshlab only: Re-computes vertex normals of the decimated mesh. */
     computeVertexNormals?: boolean;
+    /** Meshlab only: Additional, smaller levels of detail. The mesh is loaded once and each level is decimated from the next larger one. */
+    lodLevels?: IDecimateMeshLevel[];
+    /** Meshlab only: Processes the mesh out of core in spatial blocks, keeping memory use below this limit in MB. Requires PyMeshLab. */
+    tileMemoryLimit?: number;
+    /** Meshlab only: Overlap of the blocks as a fraction of the block size (default: 0.05). */
+    tileOverlap?: number;
+    /** Meshlab only: Distance within which vertices along the block boundaries are welded (default: 0, identical positions only). */
+    tileWeldDistance?: number;
     /** Meshlab only: Performs mesh inspection and generates a report. If a string is given, writes report to file. */
     inspectMesh?: string | boolean;
+    /** Meshlab only: Applies filters one at a time, reporting time, memory and mesh size for each. If a string is given, writes a Chrome trace to file. */
+    profileFilters?: string | boolean;
     /** Maximum task execution time in seconds (default: 0, uses timeout defined in tool setup, see [[IToolConfiguration]]). */
     timeout?: number;
     /** Tool to use for decimation ("Meshlab" or "RapidCompact", default: "Meshlab"). */
@@ -86,7 +109,28 @@ export default class DecimateMeshTask extends ToolTask
             minComponentSize: { oneOf: [{ type: "string" }, { type: "number"}] },
             preserveTexCoords: { type: "boolean", default: false },
             computeVertexNormals: { type: "boolean", default: false },
+            lodLevels: {
+                type: "array",
+                items: {
+                    type: "object",
+                    properties: {
+                        outputMeshFile: { type: "string", minLength: 1 },
+                        numFaces: { type: "integer", minimum: 100 },
+                        preserveTexCoords: { type: "boolean" },
+                        computeVertexNormals: { type: "boolean" }
+                    },
+                    required: [
+                        "outputMeshFile",
+                        "numFaces"
+                    ],
+                    additionalProperties: false
+                }
+            },
+            tileMemoryLimit: { type: "number", minimum: 100 },
+            tileOverlap: { type: "number", minimum: 0, maximum: 0.45, default: 0.05 },
+            tileWeldDistance: { type: "number", minimum: 0, default: 0 },
             inspectMesh: { oneOf:[ { type: "string" }, { type: "boolean" }]},
+            profileFilters: { oneOf:[ { type: "string" }, { type: "boolean" }]},
             timeout: { type: "integer", default: 0 },
             tool: { type: "string", enum: [ "Meshlab", "RapidCompact" ], default: "Meshlab" }
         },
@@ -112,29 +156,36 @@ export default class DecimateMeshTask extends ToolTask
                 writeTexCoords: params.preserveTexCoords,
                 writeNormals: params.computeVertexNormals,
                 timeout: params.timeout,
-
-                filters: [{
-                    name: "Simplification",
-                    params: {
-                        "TargetFaceNum": params.numFaces,
-                        "QualityThr": 0.4,
-                        "PreserveTopology": params.preserveTopology,
-                        "PreserveBoundary": params.preserveBoundaries,
-                        "PreserveNormal": false, // keep surface orientation
-                        "OptimalPlacement": params.optimalPlacement, // re-position vertices
-                        "PlanarQuadric": false, // optimize planar areas
-                        "QualityWeight": false, // use triangle quality as weight factor
-                        "AutoClean": true
-                    }
-                }]
+                profileFilters: !!params.profileFilters,
+                profileTraceFile: typeof params.profileFilters === "string" ? params.profileFilters : undefined,
+                filters: this.getDecimationFilters(params.numFaces, params.computeVertexNormals),
+                tileMemoryLimit: params.tileMemoryLimit,
+                tileOverlap: params.tileOverlap,
+                tileWeldDistance: params.tileWeldDistance
             };
 
-            if (params.computeVertexNormals) {
-                settings.filters.push({
-                    name: "ComputeVertexNormals",
-                    params: {
-                        "weightMode": 2 // area weighted
-                    }
+            if (params.lodLevels && params.lodLevels.length > 0) {
+                // pyramid from a single load: the output mesh is the first level,
+                // each following level is decimated from the previous (larger) one
+                const levels = [{
+                    outputMeshFile: params.outputMeshFile,
+                    numFaces: params.numFaces,
+                    preserveTexCoords: params.preserveTexCoords,
+                    computeVertexNormals: params.computeVertexNormals
+                }].concat(params.lodLevels).sort((a, b) => b.numFaces - a.numFaces);
+
+                settings.outputMeshFile = undefined;
+                settings.filters = [];
+                settings.levels = levels.map(level => {
+                    const preserveTexCoords = level.preserveTexCoords !== undefined ? level.preserveTexCoords : params.preserveTexCoords;
+                    const computeVertexNormals = level.computeVertexNormals !== undefined ? level.computeVertexNormals : params.computeVertexNormals;
+
+                    return {
+                        outputMeshFile: level.outputMeshFile,
+                        writeTexCoords: preserveTexCoords,
+                        writeNormals: computeVertexNormals,
+                        filters: this.getDecimationFilters(level.numFaces, computeVertexNormals)
+                    };
                 });
             }
 
@@ -189,6 +240,40 @@ export default class DecimateMeshTask extends ToolTask
         }
     }
 
+    /**
+     * Meshlab filters decimating the mesh to the given number of faces.
+     */
+    protected getDecimationFilters(numFaces: number, computeVertexNormals: boolean): MeshlabFilter[]
+    {
+        const params = this.parameters as IDecimateMeshTaskParameters;
+
+        const filters: MeshlabFilter[] = [{
+            name: "Simplification",
+            params: {
+                "TargetFaceNum": numFaces,
+                "QualityThr": 0.4,
+                "PreserveTopology": params.preserveTopology,
+                "PreserveBoundary": params.preserveBoundaries,
+                "PreserveNormal": false, // keep surface orientation
+                "OptimalPlacement": params.optimalPlacement, // re-position vertices
+                "PlanarQuadric": false, // optimize planar areas
+                "QualityWeight": false, // use triangle quality as weight factor
+                "AutoClean": true
+            }
+        }];
+
+        if (computeVertexNormals) {
+            filters.push({
+                name: "ComputeVertexNormals",
+                params: {
+                    "weightMode": 2 // area weighted
+                }
+            });
+        }
+
+        return filters;
+    }
+
     /**
      * Watch instance messages for a JSON formatted inspection report.
      * @param event
@@ -42,6 +42,12 @@ export interface IInspectMeshTaskParameters extends ITaskParameters
     timeout?: number;
     /** The inspection tool to be used. Default is Meshlab. */
     tool?: /*"Meshlab" |*/ "MeshSmith" | "Blender";
+    /** Blender only: reports each mesh as soon as it is analyzed, so partial results survive a timeout. Default is false. */
+    streamReport?: boolean;
+    /** Blender only: number of processes analyzing mesh topology, 0 uses all cores. Default is 1, analysis runs in Blender. */
+    workers?: number;
+    /** Blender only: imports the mesh without loading image data, textures are reported from their file headers. Default is false. */
+    geometryOnly?: boolean;
 }
 
 /**
@@ -68,7 +74,10 @@ export default class InspectMeshTask extends ToolTask
             meshFile: { type: "string", minLength: 1 },
             reportFile: { type: "string", minLength: 1, default: undefined },
             timeout: { type: "integer", minimum: 0, default: 0 },
-            tool: { type: "string", enum: [ "MeshSmith", "Blender" ], default: "Blender" }
+            tool: { type: "string", enum: [ "MeshSmith", "Blender" ], default: "Blender" },
+            streamReport: { type: "boolean", default: false },
+            workers: { type: "integer", minimum: 0, default: 1 },
+            geometryOnly: { type: "boolean", default: false }
         },
         required: [
             "meshFile"
@@ -110,6 +119,9 @@ export default class InspectMeshTask extends ToolTask
             const settings: IBlenderToolSettings = {
                 inputMeshFile: params.meshFile,
                 mode: "inspect",
+                streamInspection: params.streamReport,
+                inspectionWorkers: params.workers,
+                inspectGeometryOnly: params.geometryOnly,
                 timeout: params.timeout
             };
 
@@ -187,6 +187,11 @@ export default class MergeReportsTask extends Task
         this.finalReport["scene"]["statistics"]["numMaterials"] = this.materialReport["scene"]["statistics"]["numMaterials"];
         this.finalReport["scene"]["statistics"]["numEmbeddedTextures"] = this.materialReport["scene"]["statistics"]["numEmbeddedTextures"];
         this.finalReport["scene"]["statistics"]["numLinkedTextures"] = this.materialReport["scene"]["statistics"]["numLinkedTextures"];
+        ["textures", "textureEncodedBytes", "textureDecodedBytes", "textureGPUBytes"].forEach(key => {
+            if (this.materialReport["scene"]["statistics"][key] !== undefined) {
+                this.finalReport["scene"]["statistics"][key] = this.materialReport["scene"]["statistics"][key];
+            }
+        });
         delete this.finalReport["scene"]["statistics"]["numTextures"];
         
         this.report.result["inspection"] = this.finalReport;
@@ -29,6 +29,20 @@ export interface IScreenshotTaskParameters extends ITaskParameters
 {
     /** Input mesh file name. */
     inputMeshFile: string;
+    /** Additional mesh files rendered in the same session (multi-view previews only). */
+    inputMeshFiles?: string[];
+    /** Renders multiple preview views per mesh instead of a single preview.png (default: false). */
+    multiView?: boolean;
+    /** Number of turntable views (default: 8). */
+    numViews?: number;
+    /** Renders top and bottom views in addition to the turntable views (default: true). */
+    topBottomViews?: boolean;
+    /** Render engine, "workbench" or "eevee" without effects (default: "workbench"). */
+    renderEngine?: "workbench" | "eevee";
+    /** Width and height of the views in pixels (default: 512). */
+    resolution?: number;
+    /** Writes a sprite sheet with all views of a mesh (default: true). */
+    spriteSheet?: boolean;
     /** Maximum task execution time in seconds (default: 0, uses timeout defined in tool setup, see [[IToolConfiguration]]). */
     timeout?: number;
 }
@@ -49,6 +63,13 @@ export default class ScreenshotTask extends ToolTask
         type: "object",
         properties: {
             inputMeshFile: { type: "string", minLength: 1 },
+            inputMeshFiles: { type: "array", items: { type: "string", minLength: 1 } },
+            multiView: { type: "boolean", default: false },
+            numViews: { type: "integer", minimum: 0, default: 8 },
+            topBottomViews: { type: "boolean", default: true },
+            renderEngine: { type: "string", enum: [ "workbench", "eevee" ], default: "workbench" },
+            resolution: { type: "integer", minimum: 16, default: 512 },
+            spriteSheet: { type: "boolean", default: true },
             timeout: { type: "integer", default: 0 }
         },
         required: [
@@ -70,6 +91,15 @@ export default class ScreenshotTask extends ToolTask
             timeout: params.timeout
         };
 
+        if (params.multiView) {
+            settings.inputMeshFiles = [ params.inputMeshFile ].concat(params.inputMeshFiles || []);
+            settings.previewViews = params.numViews;
+            settings.previewTopBottom = params.topBottomViews;
+            settings.previewEngine = params.renderEngine;
+            settings.previewResolution = params.resolution;
+            settings.previewSpriteSheet = params.spriteSheet;
+        }
+
         this.addTool("Blender", settings);
     }
 }
\ No newline at end of file
@@ -40,6 +40,10 @@ export interface IWebAssetTaskParameters extends ITaskParameters
     emissiveMapFile?: string;
     /** File name of the metallic-roughness map to be added to the web asset. */
     metallicRoughnessMapFile?: string;
+    /** File name of a separate roughness map, packed into the metallic-roughness map by the Blender tool. */
+    roughnessMapFile?: string;
+    /** File name of a separate metallic map, packed into the metallic-roughness map by the Blender tool. */
+    metallicMapFile?: string;
     /** File name of the normal map to be added to the web asset. */
     normalMapFile?: string;
     /** File name of the zone map to be added to the web asset. */
@@ -52,18 +56,33 @@ export interface IWebAssetTaskParameters extends ITaskParameters
     alignCenter?: boolean;
     /** Centers object and aligns it with y-origin if true. */
     alignFloor?: boolean;
+    /** Maximum width/height of maps in pixels, larger maps are downsampled (Blender only, default: 0, keeps original size). */
+    maxTextureSize?: number;
     /** True to use object space normals, false for tangent space normals. */
     objectSpaceNormals?: boolean;
     /** True if geometry should be compressed using the DRACO mesh compressor. */
     useCompression?: boolean;
     /** Compression level for DRACO mesh compression, range 0 - 10, default: 10. */
     compressionLevel?: number;
+    /** Geometry compression method if useCompression is true (Blender only, .glb only): "draco" (default), "quantize" for
+     * KHR_mesh_quantization or "meshopt" for quantization plus EXT_meshopt_compression. The last two use the built-in writer. */
+    compressionMethod?: "draco" | "quantize" | "meshopt";
     /** True if map data should be embedded in the asset file, false if maps are embedded by reference only. */
     embedMaps?: boolean;
     /** True if the asset should be written in binary format (.glb), false for a text .gltf file. */
     writeBinary?: boolean;
     /** True if the asset should interpret alpha channel data as opacity. */
     alphaBlend?: boolean;
+    /** True to write single-mesh .glb assets with the fast built-in writer instead of Blender's glTF exporter (Blender only, no DRACO compression). */
+    useNativeWriter?: boolean;
+    /** True to reorder triangles and vertices for vertex cache and fetch locality before export (Blender only). */
+    optimizeVertexCache?: boolean;
+    /** True to weld duplicate vertices and remove degenerate and duplicate faces before export (Blender only). */
+    cleanMesh?: boolean;
+    /** Vertices closer than this distance are welded if cleanMesh is true, default: 0, only identical positions. */
+    weldDistance?: number;
+    /** True to keep vertices on UV seams separate when welding. */
+    keepUVSeams?: boolean;
     /** Tool to use for generating web assets ("MeshSmith" or "Blender", default: "Blender"). */
     tool?: "MeshSmith" | "Blender";
 }
@@ -90,18 +109,27 @@ export default class WebAssetTask extends ToolTask
             occlusionMapFile: { type: "string", default: "" },
             emissiveMapFile: { type: "string", default: "" },
             metallicRoughnessMapFile: { type: "string", default: "" },
+            roughnessMapFile: { type: "string", default: "" },
+            metallicMapFile: { type: "string", default: "" },
             normalMapFile: { type: "string", default: "" },
             zoneMapFile: { type: "string", default: "" },
             metallicFactor: { type: "number", default: 0.0 },
             roughnessFactor: { type: "number", default: 0.6 },
             alignCenter: { type: "boolean", default: false },
             alignFloor: { type: "boolean", default: false },
+            maxTextureSize: { type: "integer", minimum: 0, default: 0 },
             objectSpaceNormals: { type: "boolean", default: false },
             useCompression: { type: "boolean", default: false },
             compressionLevel: { type: "integer", minimum: 0, maximum: 10, default: 10 },
+            compressionMethod: { type: "string", enum: [ "draco", "quantize", "meshopt" ], default: "draco" },
             embedMaps: { type: "boolean", default: false },
             writeBinary: { type: "boolean", default: false },
             alphaBlend: { type: "boolean", default: false },
+            useNativeWriter: { type: "boolean", default: false },
+            optimizeVertexCache: { type: "boolean", default: false },
+            cleanMesh: { type: "boolean", default: false },
+            weldDistance: { type: "number", minimum: 0, default: 0 },
+            keepUVSeams: { type: "boolean", default: false },
             tool: { type: "string", default: "Blender" }
         },
         required: [
@@ -162,13 +190,22 @@ export default class WebAssetTask extends ToolTask
                 occlusionMapFile: options.occlusionMapFile,
                 emissiveMapFile: options.emissiveMapFile,
                 metallicRoughnessMapFile: options.metallicRoughnessMapFile,
+                roughnessMapFile: options.roughnessMapFile,
+                metallicMapFile: options.metallicMapFile,
                 normalMapFile: options.normalMapFile,
+                maxTextureSize: options.maxTextureSize,
                 //zoneMapFile: options.zoneMapFile,
                 objectSpaceNormals: options.objectSpaceNormals,
                 useCompression: options.useCompression,
                 compressionLevel: options.compressionLevel,
+                compressionMethod: options.compressionMethod,
                 alphaBlend: options.alphaBlend,
-                embedMaps: options.embedMaps
+                embedMaps: options.embedMaps,
+                useNativeWriter: options.useNativeWriter,
+                optimizeVertexCache: options.optimizeVertexCache,
+                cleanMesh: options.cleanMesh,
+                weldDistance: options.weldDistance,
+                keepUVSeams: options.keepUVSeams
             };
 
             this.addTool("Blender", settings);
@@ -30,6 +30,22 @@ export interface IBlenderToolSettings extends IToolSettings
     inputBaseName?: string;
     scaleToMeters?: boolean;
 
+    //** Inspect specific settings */
+    streamInspection?: boolean;
+    inspectionWorkers?: number;
+    inspectGeometryOnly?: boolean;
+
+    //** Combine specific settings */
+    inputMeshFiles?: string[];
+    inputMeshNames?: string[];
+
+    //** Preview specific settings */
+    previewViews?: number;
+    previewTopBottom?: boolean;
+    previewEngine?: string;
+    previewResolution?: number;
+    previewSpriteSheet?: boolean;
+
     //** Web asset specific settings */
     format?: string;
     metallicFactor?: number;
@@ -38,12 +54,21 @@ export interface IBlenderToolSettings extends IToolSettings
     occlusionMapFile?: string;
     emissiveMapFile?: string;
     metallicRoughnessMapFile?: string;
+    roughnessMapFile?: string;
+    metallicMapFile?: string;
     normalMapFile?: string;
+    maxTextureSize?: number;
     objectSpaceNormals?: boolean;
     useCompression?: boolean;
     compressionLevel?: number;
+    compressionMethod?: string;
     alphaBlend?: boolean;
     embedMaps?: boolean;
+    useNativeWriter?: boolean;
+    optimizeVertexCache?: boolean;
+    cleanMesh?: boolean;
+    weldDistance?: number;
+    keepUVSeams?: boolean;
 }
 
 export type BlenderInstance = ToolInstance<BlenderTool, IBlenderToolSettings>;
@@ -63,6 +88,53 @@ export default class BlenderTool extends Tool<BlenderTool, IBlenderToolSettings>
             instance.report.execution.log.push({"time":event.time.toString(), "level":event.level, "message":"Unlinked material"});
         }
 
+        // preview session timings
+        if (message.startsWith("PREVIEW=")) {
+            const results = instance.report.execution.results = instance.report.execution.results || {};
+
+            try {
+                results["preview"] = JSON.parse(message.substr(8));
+            }
+            catch(e) {
+                const error = "failed to parse preview report";
+                results["preview"] = { error };
+            }
+
+            return true;
+        }
+
+        // streamed inspection records, one per mesh and a final scene record
+        if (message.startsWith("MESH=") || message.startsWith("SCENE=")) {
+            const results = instance.report.execution.results = instance.report.execution.results || {};
+            const inspection = results["inspection"] = results["inspection"] || { meshes: [], partial: true };
+
+            try {
+                if (message.startsWith("MESH=")) {
+                    const record = JSON.parse(message.substr(5));
+                    inspection.meshes[record.index] = record.mesh;
+                }
+                else {
+                    const record = JSON.parse(message.substr(6));
+                    inspection.scene = record.scene;
+                    inspection.type = record.type;
+                    if (record.decodedMeshFile) {
+                        inspection.decodedMeshFile = record.decodedMeshFile;
+                    }
+                    delete inspection.partial;
+
+                    if (inspection.meshes.filter(mesh => mesh).length !== record.numMeshes) {
+                        inspection.error = "incomplete mesh inspection report";
+                    }
+                    this.markUnlinkedMaterials(instance);
+                }
+            }
+            catch(e) {
+                inspection.error = "failed to parse mesh inspection report";
+            }
+
+            return true;
+        }
+
         // filter potential issue messages
         if (message.toLowerCase().includes("error") || message.toLowerCase().includes("warning") || message.toLowerCase().includes("invalid")
         || message.toLowerCase().includes("cannot") || message.toLowerCase().includes("fail") || message.toLowerCase().includes("missing")
@@ -85,16 +157,7 @@ export default class BlenderTool extends Tool<BlenderTool, IBlenderToolSettings>
 
         try {
             results["inspection"] = JSON.parse(message.substr(idx));
-
-            // catch unlinked materials and modify report accordingly
-            const badMaterial = instance.report.execution.log.some((elem) => {return elem.message.includes("Unlinked material");});
-            if(badMaterial) {
-                for(var key in results.inspection.scene.materials) {
-                    var name = results.inspection.scene.materials[key]["name"];
-                    results.inspection.scene.materials[key] = {"name":name, "error":"not found"};
-                }
-            }
-            
+            this.markUnlinkedMaterials(instance);
         }
         catch(e) {
             const error = "failed to parse mesh inspection report";
@@ -104,6 +167,20 @@ export default class BlenderTool extends Tool<BlenderTool, IBlenderToolSettings>
         return true;
     }
 
+    // catch unlinked materials and modify report accordingly
+    protected markUnlinkedMaterials(instance: BlenderInstance)
+    {
+        const results = instance.report.execution.results;
+
+        const badMaterial = instance.report.execution.log.some((elem) => {return elem.message.includes("Unlinked material");});
+        if(badMaterial) {
+            for(var key in results.inspection.scene.materials) {
+                var name = results.inspection.scene.materials[key]["name"];
+                results.inspection.scene.materials[key] = {"name":name, "error":"not found"};
+            }
+        }
+    }
+
     async setupInstance(instance: BlenderInstance): Promise<IToolSetup>
     {
         const settings = instance.settings;
@@ -119,10 +196,28 @@ export default class BlenderTool extends Tool<BlenderTool, IBlenderToolSettings>
         }
         else if(settings.mode === "inspect") {
             operation += ` --python "${instance.getFilePath("../../scripts/BlenderInspectMesh.py")}" -- "${inputFilePath}"`;
+
+            if(settings.streamInspection) {
+                operation += ` -s true`;
+            }
+            if(settings.inspectGeometryOnly) {
+                operation += ` -g true`;
+            }
+            if(settings.inspectionWorkers !== undefined) {
+                operation += ` -w ${settings.inspectionWorkers}`;
+            }
         }
         else if(settings.mode === "convert") {
             operation += ` --python "${instance.getFilePath("../../scripts/BlenderConvert.py")}" -- "${inputFilePath}" "${instance.getFilePath(settings.outputFile)}"`;
         }
+        else if(settings.mode === "combine" && settings.inputMeshFiles) {
+            const inputFiles = settings.inputMeshFiles.map(file => `"${instance.getFilePath(file)}"`).join(" ");
+            operation += ` --python "${instance.getFilePath("../../scripts/BlenderCombineMesh.py")}" -- -i ${inputFiles} -o "${instance.getFilePath(settings.outputFile)}"`;
+
+            if(settings.inputMeshNames && settings.inputMeshNames.length > 0) {
+                operation += ` -n ${settings.inputMeshNames.map(name => `"${name}"`).join(" ")}`;
+            }
+        }
         else if(settings.mode === "combine") {
             let combineFilePath = instance.getFilePath(settings.inputMeshFile2);
             if (combineFilePath && (combineFilePath == inputFilePath)) {
@@ -133,6 +228,18 @@ export default class BlenderTool extends Tool<BlenderTool, IBlenderToolSettings>
         else if(settings.mode === "merge") {
             operation += ` --python "${instance.getFilePath("../../scripts/BlenderMergeTextures.py")}" -- "${inputFilePath}" "${instance.getFilePath(settings.outputFile2)}" "${instance.getFilePath(settings.outputFile)}"`;
         }
+        else if(settings.mode === "screenshot" && settings.previewViews !== undefined) {
+            const inputFiles = (settings.inputMeshFiles || [ settings.inputMeshFile ]).map(file => `"${instance.getFilePath(file)}"`).join(" ");
+            operation += ` --python "${instance.getFilePath("../../scripts/BlenderScreenshot.py")}" -- -i ${inputFiles} -v ${settings.previewViews}`;
+            operation += ` -tb ${!!settings.previewTopBottom} -ss ${!!settings.previewSpriteSheet}`;
+
+            if(settings.previewEngine) {
+                operation += ` -e ${settings.previewEngine}`;
+            }
+            if(settings.previewResolution) {
+                operation += ` -r ${settings.previewResolution}`;
+            }
+        }
         else if(settings.mode === "screenshot") {
             operation += ` --python "${instance.getFilePath("../../scripts/BlenderScreenshot.py")}" -- "${inputFilePath}"`;
         }
@@ -148,11 +255,33 @@ export default class BlenderTool extends Tool<BlenderTool, IBlenderToolSettings>
             if(settings.metallicRoughnessMapFile) {
                 operation += ` -mrm "${instance.getFilePath(settings.metallicRoughnessMapFile)}"`;
             }
+            if(settings.roughnessMapFile) {
+                operation += ` -rm "${instance.getFilePath(settings.roughnessMapFile)}"`;
+            }
+            if(settings.metallicMapFile) {
+                operation += ` -mm "${instance.getFilePath(settings.metallicMapFile)}"`;
+            }
             if(settings.normalMapFile) {
                 operation += ` -nm "${instance.getFilePath(settings.normalMapFile)}"`;
             }
+            if(settings.maxTextureSize) {
+                operation += ` -ts ${settings.maxTextureSize}`;
+            }
 
             operation += ` -uc "${settings.useCompression}" -mb "${settings.embedMaps}" -mf "${settings.metallicFactor}" -rf "${settings.roughnessFactor}" -cl ${settings.compressionLevel} -ab ${settings.alphaBlend} -os ${settings.objectSpaceNormals}`;
+
+            if(settings.compressionMethod) {
+                operation += ` -cm ${settings.compressionMethod}`;
+            }
+            if(settings.useNativeWriter) {
+                operation += ` -nw "${settings.useNativeWriter}"`;
+            }
+            if(settings.optimizeVertexCache) {
+                operation += ` -vc "${settings.optimizeVertexCache}"`;
+            }
+            if(settings.cleanMesh) {
+                operation += ` -cu "${settings.cleanMesh}" -wd ${settings.weldDistance || 0} -ks "${!!settings.keepUVSeams}"`;
+            }
         }
 
         const command = `"${this.configuration.executable}" ${operation}`;
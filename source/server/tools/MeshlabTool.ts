@@ -15,6 +15,9 @@
  * limitations under the License.
  */
 
+import * as child_process from "child_process";
+import * as crypto from "crypto";
+
 import uniqueId from "../utils/uniqueId";
 
 import Tool, { IToolSettings, IToolSetup, IToolScript, ToolInstance, IToolMessageEvent } from "../app/Tool";
@@ -32,6 +35,15 @@ export interface MeshlabFilter
     params?: IMeshlabFilterParameters;
 }
 
+export interface IMeshlabLevel
+{
+    outputMeshFile: string;
+    writeNormals?: boolean;
+    writeTexCoords?: boolean;
+    /** Filters applied to the mesh of the previous level before this level is saved. */
+    filters: MeshlabFilter[];
+}
+
 export interface IMeshlabToolSettings extends IToolSettings
 {
     inputMeshFile: string;
@@ -39,33 +51,51 @@ export interface IMeshlabToolSettings extends IToolSettings
     writeNormals?: boolean;
     writeTexCoords?: boolean;
     filters: MeshlabFilter[];
+    /** PyMeshLab only: applies filters one at a time and reports time, memory and mesh size for each. */
+    profileFilters?: boolean;
+    /** PyMeshLab only: writes the filter profile to this file as a Chrome trace. */
+    profileTraceFile?: string;
+    /** PyMeshLab only: after the filters, saves a pyramid of levels from a single load, each level starting from the previous one. */
+    levels?: IMeshlabLevel[];
+    /** PyMeshLab only: processes the mesh out of core in spatial blocks, keeping memory use below this limit (MB). */
+    tileMemoryLimit?: number;
+    /** Overlap of the blocks as a fraction of the block size (default: 0.05). */
+    tileOverlap?: number;
+    /** Distance within which vertices along the block boundaries are welded (default: 0, identical positions only). */
+    tileWeldDistance?: number;
 }
 
 export type MeshlabInstance = ToolInstance<MeshlabTool, IMeshlabToolSettings>;
 
+// environment variable with the shared secret for worker connections, see MeshLabExecuteFilter.py
+const WORKER_KEY_VARIABLE = "COOK_MESHLAB_WORKER_KEY";
+
 export default class MeshlabTool extends Tool
 {
     static readonly toolName = "Meshlab";
 
     protected static readonly filters = {
-        "Simplification": { name: "Simplification: Quadric Edge Collapse Decimation" },
-        "RemoveUnreferencedVertices": { name: "Remove Unreferenced Vertices" },
-        "RemoveDuplicateVertices": { name: "Remove Duplicate Vertices" },
-        "RemoveZeroAreaFaces": { name: "Remove Zero Area Faces" },
-        "RemoveDuplicateFaces": { name: "Remove Duplicate Faces" },
-        "RemoveIsolatedFoldedFaces": { name: "Remove Isolated Folded Faces by Edge Flip" },
-        "RemoveIsolatedPieces": { name: "Remove Isolated pieces (wrt Diameter)" },
-        "ComputeFaceNormals": { name: "Re-Compute Face Normals" },
-        "ComputeVertexNormals": { name: "Re-Compute Vertex Normals" },
-        "SelectSmallComponents": { name: "Select small disconnected component"},
-        "DeleteSelected": { name: "Delete Selected Faces and Vertices"},
-        "CenterScene": { name: "Transform: Translate, Center, set Origin"},
-        "ConditionalFaceSelect": { name: "Conditional Face Selection"},
-        "SelectConnectedFaces": { name: "Select Connected Faces" },
-        "InvertSelection": { name: "Invert Selection" }
+        "Simplification": { name: "Simplification: Quadric Edge Collapse Decimation", pyName: "meshing_decimation_quadric_edge_collapse" },
+        "RemoveUnreferencedVertices": { name: "Remove Unreferenced Vertices", pyName: "meshing_remove_unreferenced_vertices" },
+        "RemoveDuplicateVertices": { name: "Remove Duplicate Vertices", pyName: "meshing_remove_duplicate_vertices" },
+        "RemoveZeroAreaFaces": { name: "Remove Zero Area Faces", pyName: "meshing_remove_null_faces" },
+        "RemoveDuplicateFaces": { name: "Remove Duplicate Faces", pyName: "meshing_remove_duplicate_faces" },
+        "RemoveIsolatedFoldedFaces": { name: "Remove Isolated Folded Faces by Edge Flip", pyName: "meshing_remove_folded_faces" },
+        "RemoveIsolatedPieces": { name: "Remove Isolated pieces (wrt Diameter)", pyName: "meshing_remove_connected_component_by_diameter" },
+        "ComputeFaceNormals": { name: "Re-Compute Face Normals", pyName: "compute_normal_per_face" },
+        "ComputeVertexNormals": { name: "Re-Compute Vertex Normals", pyName: "compute_normal_per_vertex" },
+        "SelectSmallComponents": { name: "Select small disconnected component", pyName: "compute_selection_by_small_disconnected_components_per_face" },
+        "DeleteSelected": { name: "Delete Selected Faces and Vertices", pyName: "meshing_remove_selected_vertices_and_faces" },
+        "CenterScene": { name: "Transform: Translate, Center, set Origin", pyName: "compute_matrix_from_translation",
+            pyParams: { "traslMethod": "Center on Scene BBox", "Freeze": true, "allLayers": false } },
+        "ConditionalFaceSelect": { name: "Conditional Face Selection", pyName: "compute_selection_by_condition_per_face" },
+        "SelectConnectedFaces": { name: "Select Connected Faces", pyName: "apply_selection_by_same_connected_component" },
+        "InvertSelection": { name: "Invert Selection", pyName: "apply_selection_inverse" }
         /*"MeshReport": { name: "Generate JSON Report", type: "xml" }*/
     };
 
+    private static worker: child_process.ChildProcess = null;
+
     inspectionReport: any = null;
 
 
@@ -80,11 +110,29 @@ export default class MeshlabTool extends Tool
 
         const outputMeshPath = instance.getFilePath(settings.outputMeshFile);
 
-        return this.writeFilterScript(instance)
-            .then(script => {
+        const isPyMeshLab = this.configuration.executable.toLowerCase().indexOf("meshlabserver") === -1;
+        const isTiled = !!settings.tileMemoryLimit;
+        const useWorker = isPyMeshLab && !!this.configuration.workerPort && !isTiled;
+        const hasLevels = !!settings.levels && settings.levels.length > 0;
+
+        if (hasLevels && !isPyMeshLab) {
+            throw new Error("level pyramids require PyMeshLab");
+        }
+        if (isTiled && (!isPyMeshLab || hasLevels || !outputMeshPath)) {
+            throw new Error("tiled processing requires PyMeshLab and a single output mesh file");
+        }
+
+        if (useWorker) {
+            this.startWorker(instance);
+        }
+
+        const writeScript = useWorker || hasLevels ? this.writeFilterList(instance) : this.writeFilterScript(instance);
+        const writeLevels = hasLevels ? this.writeLevelList(instance) : Promise.resolve(null);
+
+        return Promise.all([ writeScript, writeLevels ])
+            .then(([ script, levels ]) => {
 
                 let command = `"${this.configuration.executable}"`;
-                const isPyMeshLab = this.configuration.executable.toLowerCase().indexOf("meshlabserver") === -1;
 
                 if(isPyMeshLab) {
                     command += ` "${instance.getFilePath("../../scripts/MeshlabExecuteFilter.py")}"`;
@@ -110,8 +158,37 @@ export default class MeshlabTool extends Tool
                         command += ` -vn ${settings.writeNormals} -wt ${settings.writeTexCoords}`;
                     }
                 }
-                
-                command += ` -s "${instance.getFilePath(script.fileName)}"`;
+
+                if (isPyMeshLab && (settings.profileFilters || settings.profileTraceFile)) {
+                    command += " -p true";
+                    if (settings.profileTraceFile) {
+                        command += ` -t "${instance.getFilePath(settings.profileTraceFile)}"`;
+                    }
+                }
+
+                if (levels) {
+                    command += ` -l "${instance.getFilePath(levels.fileName)}"`;
+                }
+
+                if (isTiled) {
+                    command += ` -tm ${settings.tileMemoryLimit}`;
+                    if (settings.tileOverlap !== undefined) {
+                        command += ` -to ${settings.tileOverlap}`;
+                    }
+                    if (settings.tileWeldDistance !== undefined) {
+                        command += ` -tw ${settings.tileWeldDistance}`;
+                    }
+                }
+
+                if (useWorker || hasLevels) {
+                    command += ` -f "${instance.getFilePath(script.fileName)}"`;
+                }
+                if (useWorker) {
+                    command += ` -w localhost:${this.configuration.workerPort} -tl ${instance.timeout}`;
+                }
+                else if (!hasLevels) {
+                    command += ` -s "${instance.getFilePath(script.fileName)}"`;
+                }
 
                 return {
                     command,
@@ -124,12 +201,43 @@ export default class MeshlabTool extends Tool
     {
         const { instance, message } = event;
 
+        const report = instance.report.execution;
+
+        // filter profile data
+        if (message.startsWith("PROFILE={")) {
+            const results = report.results = report.results || {};
+
+            try {
+                results["profile"] = JSON.parse(message.substr(8));
+            }
+            catch(e) {
+                const error = "failed to parse filter profile";
+                results["profile"] = { error };
+            }
+
+            return true;
+        }
+
+        // tiled processing summary
+        if (message.startsWith("TILING={")) {
+            const results = report.results = report.results || {};
+
+            try {
+                results["tiling"] = JSON.parse(message.substr(7));
+            }
+            catch(e) {
+                const error = "failed to parse tiling report";
+                results["tiling"] = { error };
+            }
+
+            return true;
+        }
+
         // only handle JSON report data
         if (!message.startsWith("\nJSON={")) {
             return false;
         }
 
-        const report = instance.report.execution;
         const results = report.results = report.results || {};
 
         try {
@@ -143,6 +251,119 @@ export default class MeshlabTool extends Tool
         return true;
     }
 
+    /**
+     * Starts the persistent PyMeshLab worker (MeshLabWorker.py) unless it is already running.
+     * The worker is shared by all instances and stays alive until the server exits. It runs
+     * one process per instance slot, its output is written to the server log.
+     */
+    private startWorker(instance: MeshlabInstance)
+    {
+        if (MeshlabTool.worker) {
+            return;
+        }
+
+        if (!process.env[WORKER_KEY_VARIABLE]) {
+            process.env[WORKER_KEY_VARIABLE] = crypto.randomBytes(16).toString("hex");
+        }
+
+        const script = instance.getFilePath("../../scripts/MeshLabWorker.py");
+        const worker = child_process.spawn(this.configuration.executable,
+            [ script, "-p", this.configuration.workerPort.toString(), "-n", this.configuration.maxInstances.toString() ],
+            { stdio: [ "ignore", "pipe", "pipe" ], env: Object.assign({}, process.env, { PYTHONUNBUFFERED: "1" }) });
+
+        const log = (data: Buffer) => data.toString().split(/\r?\n/).forEach(line => {
+            line && console.log(`MeshlabTool.worker - ${line}`);
+        });
+        worker.stdout.on("data", log);
+        worker.stderr.on("data", log);
+
+        worker.on("exit", code => {
+            console.warn(`MeshlabTool.startWorker - worker exited with code ${code}`);
+            if (MeshlabTool.worker === worker) {
+                MeshlabTool.worker = null;
+            }
+        });
+        worker.on("error", err => console.warn(`MeshlabTool.startWorker - ${err.message}`));
+        process.on("exit", () => worker.kill());
+
+        MeshlabTool.worker = worker;
+    }
+
+    /**
+     * Writes the filters as a JSON list with PyMeshLab filter names and parameters,
+     * applied directly by PyMeshLab without a filter script.
+     */
+    private async writeFilterList(instance: MeshlabInstance): Promise<IToolScript>
+    {
+        let filters;
+
+        try {
+            filters = this.getFilterList(instance.settings.filters);
+        }
+        catch(e) {
+            return Promise.reject(e.message);
+        }
+
+        const script: IToolScript = {
+            fileName: "_meshlab_" + uniqueId() + ".json",
+            content: JSON.stringify(filters, null, 2),
+        };
+
+        return instance.writeFile(script.fileName, script.content).then(() => script);
+    }
+
+    /**
+     * Writes the levels of a pyramid as a JSON list with output file, output options
+     * and PyMeshLab filters for each level.
+     */
+    private async writeLevelList(instance: MeshlabInstance): Promise<IToolScript>
+    {
+        let levels;
+
+        try {
+            levels = instance.settings.levels.map(level => ({
+                output: instance.getFilePath(level.outputMeshFile),
+                writeNormals: !!level.writeNormals,
+                writeTexCoords: !!level.writeTexCoords,
+                filters: this.getFilterList(level.filters)
+            }));
+        }
+        catch(e) {
+            return Promise.reject(e.message);
+        }
+
+        const script: IToolScript = {
+            fileName: "_meshlab_levels_" + uniqueId() + ".json",
+            content: JSON.stringify(levels, null, 2),
+        };
+
+        return instance.writeFile(script.fileName, script.content).then(() => script);
+    }
+
+    /**
+     * Translates filters to PyMeshLab filter names and parameters.
+     */
+    private getFilterList(filters: MeshlabFilter[])
+    {
+        return filters.map(filter => {
+            const filterDef = MeshlabTool.filters[filter.name];
+            if (!filterDef || !filterDef.pyName) {
+                throw new Error(`unknown filter: ${filter.name}`);
+            }
+
+            const params = Object.assign({}, filterDef.pyParams);
+            for (const paramName in filter.params) {
+                const paramValue = filter.params[paramName];
+                if (paramValue === undefined) {
+                    throw new Error(`value for parameter ${paramName} is undefined`);
+                }
+                params[paramName] = this.getParameterValue(paramValue);
+            }
+
+            return { name: filterDef.pyName, params };
+        });
+    }
+
     private async writeFilterScript(instance: ToolInstance<MeshlabTool, IMeshlabToolSettings>): Promise<IToolScript>
     {
         const scriptLines = [
@@ -235,4 +456,23 @@ export default class MeshlabTool extends Tool
 
         return `<Param value="${value}" type="${type}" name="${name}"/>`;
     }
+
+    private getParameterValue(value: string | number | boolean)
+    {
+        if (typeof value !== "string") {
+            return value;
+        }
+
+        // percentages are passed on as strings, filter script XML entities are decoded
+        if (value.indexOf("%") > -1) {
+            return value;
+        }
+
+        const parsedValue = parseFloat(value);
+        if (!isNaN(parsedValue) && isFinite(Number(value))) {
+            return parsedValue;
+        }
+
+        return value.replace(/&lt;/g, "<").replace(/&gt;/g, ">").replace(/&amp;/g, "&");
+    }
 }
\ No newline at end of file